@@ -0,0 +1 @@
+"""Benchmarks on synthetic input: the build pipeline (benchmarks.pipeline) and the editor tokenizer (benchmarks.tokenizer)."""
@@ -0,0 +1,149 @@
+import sys
+from pathlib import Path
+from typing import Tuple
+
+# Reported versions: pandoc 2.x has no `pandoc server`, so every conversion
+# is a process (and pays the configured latency)
+FAKE_PANDOC_VERSION = "pandoc 2.19.2"
+FAKE_TYPST_VERSION = "typst 0.12.0 (fake)"
+
+FAKE_PANDOC = '''#!{python}
+# Stand-in for pandoc: a rough Markdown -> Typst pass, {latency}s per process + {per_kb}s per KB of input
+import re, sys, time
+args = sys.argv[1:]
+if "--version" in args:
+    print({version!r})
+    sys.exit(0)
+if "--list-output-formats" in args:
+    print("markdown\\ntypst")
+    sys.exit(0)
+if args[:1] == ["--print-default-data-file"] or args[:1] == ["server"]:
+    sys.exit(1)
+
+def option(name):
+    return args[args.index(name) + 1] if name in args else None
+
+text = sys.stdin.read()
+time.sleep({latency} + {per_kb} * len(text.encode("utf-8")) / 1024)
+
+citeproc = option("--bibliography") is not None
+cited = []
+def cite(match):
+    key = match.group(1)
+    if key not in cited:
+        cited.append(key)
+    return "[%d]" % (cited.index(key) + 1) if citeproc else "@" + key
+
+out = []
+raw = False
+for line in text.splitlines():
+    if raw:
+        if line.startswith("```"):
+            raw = False
+        else:
+            out.append(line)
+        continue
+    if line.startswith("```{{=typst}}"):
+        raw = True
+    elif line.startswith(":::"):
+        if citeproc and "#refs" in line:
+            out.extend("[%d] %s" % (i + 1, key) for i, key in enumerate(cited))
+    else:
+        heading = re.match(r"(#+)\\s+(.*)", line)
+        if heading:
+            line = "=" * len(heading.group(1)) + " " + heading.group(2)
+        out.append(re.sub(r"\\[?@([\\w:-]+)\\]?", cite, line))
+
+result = "\\n".join(out).strip("\\n") + "\\n"
+output = option("--output")
+if output:
+    open(output, "w", encoding="utf-8").write(result)
+else:
+    sys.stdout.write(result)
+'''
+
+FAKE_TYPST = '''#!{python}
+# Stand-in for typst: "compiles" by reading the sources, {latency}s per compilation + {per_kb}s per KB read
+import os, sys, time
+args = sys.argv[1:]
+if "--version" in args:
+    print({version!r})
+    sys.exit(0)
+if args[:1] == ["compile"] and "--help" in args:
+    print("  -f, --format <FORMAT>  [possible values: pdf, png, svg]")
+    sys.exit(0)
+if "--help" in args:
+    print("Commands:\\n  compile  Compiles an input file\\n  watch    Watches an input file")
+    sys.exit(0)
+
+command, source, output = args[0], args[1], args[2]
+root = args[args.index("--root") + 1] if "--root" in args else os.path.dirname(source)
+generated = os.path.join(root, ".thesis_data", "temp")
+
+def sources():
+    paths = [source]
+    if os.path.isdir(generated):
+        paths += [os.path.join(generated, n) for n in sorted(os.listdir(generated)) if n.endswith(".typ")]
+    return paths
+
+def compile_once():
+    size = 0
+    for path in sources():
+        try:
+            size += os.path.getsize(path)
+        except OSError:
+            pass
+    time.sleep({latency} + {per_kb} * size / 1024)
+    with open(output, "wb") as f:
+        f.write(b"%PDF-1.7\\n% fake\\n" + b"0" * (size // 10))
+
+if command == "compile":
+    compile_once()
+    sys.exit(0)
+
+def snapshot():
+    stamps = {{}}
+    for path in sources():
+        try:
+            stamps[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            pass
+    return stamps
+
+print("watching " + source, flush=True)
+seen = None
+while True:
+    current = snapshot()
+    if current != seen:
+        seen = current
+        start = time.perf_counter()
+        print("[00:00:00] compiling ...", flush=True)
+        compile_once()
+        print("[00:00:00] compiled successfully in %.2fms" % ((time.perf_counter() - start) * 1000), flush=True)
+    time.sleep(0.02)
+'''
+
+def install_fake_tools(bin_dir: Path, pandoc_latency: float = 0.05, typst_latency: float = 0.2,
+                       pandoc_per_kb: float = 0.0, typst_per_kb: float = 0.0) -> Tuple[Path, Path]:
+    """
+    Writes fake `pandoc` and `typst` executables into `bin_dir` and returns
+    their paths. Each process (or typst watch compilation) sleeps for its
+    latency plus the per-KB cost of its input, so builds are timed without
+    the real tools. Their output is only structurally close to the real
+    one: enough for batching, citeproc splitting and typst watch to work.
+    The scripts are Python with a shebang, so POSIX only.
+    """
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    scripts = {
+        "pandoc": FAKE_PANDOC.format(python=sys.executable, version=FAKE_PANDOC_VERSION,
+                                     latency=float(pandoc_latency), per_kb=float(pandoc_per_kb)),
+        "typst": FAKE_TYPST.format(python=sys.executable, version=FAKE_TYPST_VERSION,
+                                   latency=float(typst_latency), per_kb=float(typst_per_kb)),
+    }
+    paths = []
+    for name, script in scripts.items():
+        path = bin_dir / name
+        path.write_text(script, encoding="utf-8")
+        path.chmod(0o755)
+        paths.append(path)
+    return paths[0], paths[1]
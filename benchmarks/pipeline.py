@@ -0,0 +1,178 @@
+"""
+Times the build pipeline (ProjectManager.compile_project_async) on
+synthetic projects and prints the results as JSON:
+
+    python -m benchmarks.pipeline --chapters 30 --paragraphs 8 --citations 50 -o bench.json
+
+Scenarios: "cold" (fresh project, empty caches), "noop" (the same build
+again), "edit" (one paragraph changed) and "serial" (a cold build with one
+pandoc job, to compare with "cold"'s `--jobs`). By default pandoc and typst
+are fake executables with the given latencies (see fake_tools), so the
+numbers measure the engine rather than the tools; `--real-tools` uses the
+installed ones.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.fake_tools import install_fake_tools
+from benchmarks.synthetic import SyntheticSpec, generate_project
+
+SCENARIOS = ("cold", "noop", "edit", "serial")
+BUILD_TIMEOUT = 600
+
+def run_benchmarks(spec: SyntheticSpec, work_dir: Path, jobs: Optional[int] = None, use_watch: bool = True,
+                   repeat: int = 1, real_tools: bool = False, pandoc_latency: float = 0.05, typst_latency: float = 0.2,
+                   scenarios=SCENARIOS) -> dict:
+    """
+    Runs `scenarios` `repeat` times each in `work_dir` and returns the
+    results: config, environment and, per scenario, every run's wall time
+    and per-stage totals (BuildMetrics.summary) plus the median wall time.
+    """
+    from src.engine.compiler import AsyncCompiler
+    from src.engine.pandoc_server import PandocServer
+    from src.engine.toolchain import ToolchainRegistry, use_toolchain
+
+    search_dirs = []
+    if not real_tools:
+        bin_dir = work_dir / "bin"
+        install_fake_tools(bin_dir, pandoc_latency, typst_latency)
+        search_dirs.append(bin_dir)
+    registry = ToolchainRegistry(work_dir / "toolchain.json", search_dirs)
+    previous = use_toolchain(registry)
+
+    jobs = jobs or os.cpu_count() or 1
+    results = {
+        "benchmark": "pipeline",
+        "created_at": time.time(),
+        "config": {**spec.to_dict(), "jobs": jobs, "use_watch": use_watch, "repeat": repeat, "real_tools": real_tools,
+                   "pandoc_latency_s": None if real_tools else pandoc_latency,
+                   "typst_latency_s": None if real_tools else typst_latency},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pandoc": registry.get("pandoc").version,
+            "typst": registry.get("typst").version,
+        },
+        "scenarios": {name: {"runs": []} for name in scenarios},
+    }
+    try:
+        for i in range(repeat):
+            pm = generate_project(work_dir / "projects", f"bench-{i}", spec)
+            pm.use_daemon = False
+            _record(results, "cold", lambda: _timed_build(pm, jobs, use_watch))
+            _record(results, "noop", lambda: _timed_build(pm, jobs, use_watch))
+            _record(results, "edit", lambda: (_edit_paragraph(pm), _timed_build(pm, jobs, use_watch))[1])
+
+            if "serial" in scenarios:
+                serial = generate_project(work_dir / "projects", f"bench-{i}-serial", spec)
+                serial.use_daemon = False
+                _record(results, "serial", lambda: _timed_build(serial, 1, use_watch))
+            AsyncCompiler.shutdown_watchers()
+    finally:
+        AsyncCompiler.shutdown_watchers()
+        PandocServer.shutdown_all()
+        use_toolchain(previous)
+
+    for scenario in results["scenarios"].values():
+        walls = [run["wall_s"] for run in scenario["runs"] if run["status"] == "ok"]
+        scenario["median_wall_s"] = statistics.median(walls) if walls else None
+    return results
+
+def _record(results: dict, scenario: str, run):
+    if scenario in results["scenarios"]:
+        results["scenarios"][scenario]["runs"].append(run())
+
+def _timed_build(pm, jobs: int, use_watch: bool) -> dict:
+    """One compile_project_async build, waited for. Returns its timings."""
+    done = threading.Event()
+    outcome = {}
+
+    def on_success(pdf_path):
+        outcome["status"] = "ok"
+        done.set()
+
+    def on_error(error):
+        outcome.update(status="error", error=str(error))
+        done.set()
+
+    start = time.perf_counter()
+    job = pm.compile_project_async(on_success, on_error, jobs=jobs, use_watch=use_watch)
+    if not done.wait(BUILD_TIMEOUT):
+        job.cancel()
+        outcome.update(status="timeout")
+    run = {"wall_s": time.perf_counter() - start, **outcome}
+
+    metrics = getattr(job, "metrics", None)
+    if metrics is not None:
+        run["stages"] = metrics.summary()
+        for m in metrics.stages:
+            if m.stage in ("write", "typst"):
+                run[m.stage] = dict(m.extra)
+    return run
+
+def _edit_paragraph(pm):
+    """Appends a sentence to the last paragraph of the last chapter."""
+    chapter = pm.manifest.chapters[-1]
+    if chapter.paragraphs:
+        path = pm.current_project_path / "chapters" / chapter.id / chapter.paragraphs[-1].filename
+    else:
+        path = pm.current_project_path / "chapters" / chapter.filename
+    path.write_text(path.read_text(encoding="utf-8") + f"\nModifica {time.time_ns()}.\n", encoding="utf-8")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.pipeline", description="Build pipeline benchmarks")
+    parser.add_argument("--chapters", type=int, default=SyntheticSpec.chapters)
+    parser.add_argument("--paragraphs", type=int, default=SyntheticSpec.paragraphs, help="Paragraphs per chapter")
+    parser.add_argument("--words", type=int, default=SyntheticSpec.words, help="Words per paragraph")
+    parser.add_argument("--citations", type=int, default=SyntheticSpec.citations)
+    parser.add_argument("--images", type=int, default=SyntheticSpec.images)
+    parser.add_argument("--image-size", default="x".join(map(str, SyntheticSpec.image_size)), metavar="WxH")
+    parser.add_argument("--seed", type=int, default=SyntheticSpec.seed)
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Concurrent pandoc conversions (default: CPU count)")
+    parser.add_argument("--no-watch", action="store_true", help="Compile with typst compile instead of typst watch")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--real-tools", action="store_true", help="Use the installed pandoc and typst")
+    parser.add_argument("--pandoc-latency", type=float, default=0.05, help="Seconds per fake pandoc process")
+    parser.add_argument("--typst-latency", type=float, default=0.2, help="Seconds per fake typst compilation")
+    parser.add_argument("--work-dir", type=Path, default=None, help="Keep the projects here (default: a temporary directory)")
+    parser.add_argument("--output", "-o", default="-", help="JSON results path ('-' for stdout)")
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    width, height = (int(n) for n in args.image_size.lower().split("x"))
+    spec = SyntheticSpec(chapters=args.chapters, paragraphs=args.paragraphs, words=args.words, citations=args.citations,
+                         images=args.images, image_size=(width, height), seed=args.seed)
+    options = dict(jobs=args.jobs, use_watch=not args.no_watch, repeat=args.repeat, real_tools=args.real_tools,
+                   pandoc_latency=args.pandoc_latency, typst_latency=args.typst_latency, scenarios=args.scenarios)
+
+    if args.work_dir:
+        args.work_dir.mkdir(parents=True, exist_ok=True)
+        results = run_benchmarks(spec, args.work_dir.resolve(), **options)
+    else:
+        with tempfile.TemporaryDirectory(prefix="thesisflow-bench-") as tmp:
+            results = run_benchmarks(spec, Path(tmp), **options)
+
+    text = json.dumps(results, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    failed = [name for name, s in results["scenarios"].items() if any(run["status"] != "ok" for run in s["runs"])]
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import random
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Tuple
+
+WORDS = ("tesi analisi modello dati risultato metodo sistema processo valore struttura "
+         "rete funzione misura errore campione ipotesi teoria calcolo grafico tabella "
+         "progetto sviluppo prova confronto parametro variabile studio fonte").split()
+
+@dataclass
+class SyntheticSpec:
+    """Shape of a generated project: N chapters x M paragraphs, K citations, images."""
+    chapters: int = 10
+    paragraphs: int = 5            # Paragraph files per chapter
+    words: int = 200               # Words per paragraph
+    citations: int = 20            # Bibliography entries, each cited once
+    images: int = 0
+    image_size: Tuple[int, int] = (1600, 1200)
+    seed: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+def generate_project(projects_root: Path, name: str, spec: SyntheticSpec):
+    """
+    Creates the project `name` under `projects_root` with the shape of
+    `spec` and returns its (loaded) ProjectManager. The text is
+    pseudo-random but deterministic for a given seed; citations are spread
+    over the paragraphs and images over the chapters.
+    """
+    from PIL import Image
+    from src.engine.project_manager import ProjectManager
+
+    rng = random.Random(spec.seed)
+    pm = ProjectManager(projects_root=projects_root)
+    project_path = pm.create_project(name, "Benchmark")
+    pm.delete_chapter(pm.manifest.chapters[0])
+
+    keys = [f"ref{i:03d}" for i in range(spec.citations)]
+    entries = [f"@article{{{key},\n  title = {{Articolo {i}}},\n  author = {{Autore, A.}},\n  year = {{{2000 + i % 25}}}\n}}"
+               for i, key in enumerate(keys)]
+    (project_path / "references.bib").write_text("\n\n".join(entries) + "\n", encoding="utf-8")
+
+    images = []
+    for i in range(spec.images):
+        filename = f"figura_{i:03d}.png"
+        color = tuple(rng.randrange(256) for _ in range(3))
+        Image.new("RGB", spec.image_size, color).save(project_path / "assets" / filename)
+        images.append(filename)
+
+    slots = max(1, spec.chapters * spec.paragraphs)
+    for c in range(spec.chapters):
+        chapter = pm.create_chapter(f"Capitolo {c + 1}")
+        intro = [f"# Capitolo {c + 1}", "", _sentence(rng, spec.words // 2)]
+        for i in range(c, len(images), max(1, spec.chapters)):
+            intro += ["", f"![Figura {i + 1}](assets/{images[i]})"]
+        pm.save_file_content(project_path / "chapters" / chapter.filename, "\n".join(intro) + "\n")
+
+        for p in range(spec.paragraphs):
+            paragraph = pm.create_paragraph(chapter, f"Sezione {c + 1}.{p + 1}")
+            slot = c * spec.paragraphs + p
+            cites = [keys[k] for k in range(slot, len(keys), slots)]
+            text = _sentence(rng, spec.words)
+            if cites:
+                text += " " + " ".join(f"[@{key}]" for key in cites) + "."
+            path = project_path / "chapters" / chapter.id / paragraph.filename
+            pm.save_file_content(path, f"## {paragraph.title}\n\n{text}\n")
+
+    pm.load_project(project_path)
+    return pm
+
+def _sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(max(1, words)))
+    return text[0].upper() + text[1:] + "."
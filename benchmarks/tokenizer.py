@@ -0,0 +1,60 @@
+"""
+Times the editor's markdown tokenizer (src.utils.md_tokenizer) on a
+synthetic chapter and prints the result as JSON:
+
+    python -m benchmarks.tokenizer --paragraphs 2000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic import WORDS
+from src.utils.md_tokenizer import tokenize_lines
+
+def synthetic_chapter(paragraphs: int, words: int, seed: int = 0) -> List[str]:
+    """Chapter lines mixing headings, styled words, links and code blocks."""
+    rng = random.Random(seed)
+    decorate = [lambda w: f"**{w}**", lambda w: f"_{w}_", lambda w: f"[{w}](https://example.org/{w})"] + [lambda w: w] * 7
+    lines = []
+    for p in range(paragraphs):
+        if p % 10 == 0:
+            lines += [f"## Sezione {p // 10 + 1}", ""]
+        if p % 25 == 24:
+            lines += ["```python", "print('codice')", "```", ""]
+        lines += [" ".join(rng.choice(decorate)(rng.choice(WORDS)) for _ in range(words)), ""]
+    return lines
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.tokenizer", description="Markdown tokenizer benchmark")
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=80, help="Words per paragraph")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    lines = synthetic_chapter(args.paragraphs, args.words)
+    chars = sum(len(line) + 1 for line in lines)
+    walls = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        ranges, _ = tokenize_lines(lines)
+        walls.append(time.perf_counter() - start)
+    best = min(walls)
+    print(json.dumps({
+        "benchmark": "tokenizer",
+        "lines": len(lines),
+        "chars": chars,
+        "spans": sum(len(spans) for spans in ranges.values()),
+        "best_wall_s": best,
+        "lines_per_s": len(lines) / best if best else None,
+        "walls_s": walls,
+    }, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
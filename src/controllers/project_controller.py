@@ -1,6 +1,8 @@
+import threading
 from pathlib import Path
 from typing import List, Optional
 from src.engine.project_manager import ProjectManager
+from src.engine.pandoc_wrapper import PandocWrapper
 from src.controllers.session_manager import SessionManager
 
 class ProjectController:
@@ -21,6 +23,8 @@ class ProjectController:
     def load_project(self, path: Path):
         self.pm.load_project(path)
         self.session.set_active_project(path)
+        # Warm up pandoc server in background so the first compile doesn't pay for it
+        threading.Thread(target=PandocWrapper.warm_up_server, daemon=True).start()
 
     def export_project(self, project_path: Path, dest_zip: Path):
         self.pm.export_project(project_path, dest_zip)
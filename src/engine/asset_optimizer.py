@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+# ![caption](assets/file.ext) as written by add_asset / get_asset_markdown
+_IMAGE_REF_RE = re.compile(r"(!\[[^\]]*\]\()(assets/[^)\s]+)(\))")
+
+@dataclass(frozen=True)
+class AssetQuality:
+    """How images are prepared for typst: resolution at the text width and JPEG quality."""
+    name: str
+    dpi: int
+    jpeg_quality: int
+    text_width_in: float = 6.3 # A4 minus the templates' margins
+
+    @property
+    def max_width_px(self) -> int:
+        return int(self.dpi * self.text_width_in)
+
+QUALITY_PRESETS = {
+    "final": AssetQuality("final", dpi=300, jpeg_quality=88),
+    "draft": AssetQuality("draft", dpi=110, jpeg_quality=70),
+}
+
+class AssetOptimizer:
+    """
+    Pre-compile asset stage: oversized images in assets/ are downscaled to
+    the quality's DPI at the text width and recompressed into
+    .thesis_data/assets/<quality>/<stem>-<path hash>-<key><ext>, where the
+    path hash tells apart assets with the same name in different folders
+    and the key hashes the source content and the settings. Variants are made once, on a
+    thread pool (Pillow releases the GIL while decoding and resampling).
+
+    `rewrite` points the image references of a chapter's Markdown at the
+    variants (or at the originals, root-relative, when they are small
+    enough already), so the converted chapters embed the variants.
+    """
+
+    FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG"}
+
+    def __init__(self, project_path: Path, quality: AssetQuality, jobs: Optional[int] = None):
+        self.project_path = project_path
+        self.quality = quality
+        self.jobs = jobs
+        self.cache_dir = project_path / ".thesis_data" / "assets" / quality.name
+        self._index_path = project_path / ".thesis_data" / "assets" / "sources.json"
+        self._paths: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.written = 0 # Variants made by the last prepare()
+
+    @staticmethod
+    def find_references(markdown: str) -> list:
+        """The assets/... paths of the images in `markdown`."""
+        return [m.group(2) for m in _IMAGE_REF_RE.finditer(markdown)]
+
+    def prepare(self, references: Iterable[str]) -> Dict[str, str]:
+        """
+        Makes the variants for `references` (paths like "assets/foto.jpg")
+        and returns the typst path to use for each existing one.
+        """
+        todo = sorted({r for r in references if r not in self._paths and (self.project_path / r).is_file()})
+        self.written = 0
+        if not todo:
+            return dict(self._paths)
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        index = self._load_index()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.jobs or os.cpu_count() or 1, len(todo)))) as pool:
+            for ref, path in zip(todo, pool.map(lambda r: self._prepare_one(r, index), todo)):
+                self._paths[ref] = path
+        self._save_index(index)
+        return dict(self._paths)
+
+    def rewrite(self, markdown: str) -> str:
+        """Replaces prepared image references in `markdown` with their typst paths."""
+        return _IMAGE_REF_RE.sub(lambda m: m.group(1) + self._paths.get(m.group(2), m.group(2)) + m.group(3), markdown)
+
+    def _prepare_one(self, ref: str, index: dict) -> str:
+        from PIL import Image, ImageOps
+
+        source = self.project_path / ref
+        original = "/" + ref # Root-relative: chapters are compiled from .thesis_data/temp
+        fmt = self.FORMATS.get(source.suffix.lower())
+        if fmt is None:
+            return original # SVG, GIF, PDF...
+
+        digest = self._source_hash(source, index)
+        settings = f"{self.quality.dpi}:{self.quality.jpeg_quality}:{self.quality.text_width_in}"
+        key = hashlib.sha1(f"{digest}:{settings}".encode("utf-8")).hexdigest()[:12]
+        # Named after the whole path: same-named assets in other folders have their own variants
+        prefix = f"{source.stem}-{hashlib.sha1(ref.encode('utf-8')).hexdigest()[:8]}-"
+        variant = self.cache_dir / f"{prefix}{key}{source.suffix.lower()}"
+        relative = "/" + variant.relative_to(self.project_path).as_posix()
+        if variant.exists():
+            return relative
+
+        try:
+            with Image.open(source) as img: # Only reads the header until resized
+                if img.width <= self.quality.max_width_px:
+                    return original
+                img = ImageOps.exif_transpose(img)
+                if img.mode in ("P", "1"):
+                    img = img.convert("RGBA") # Palette images would be resized without filtering
+                height = max(1, round(img.height * self.quality.max_width_px / img.width))
+                img = img.resize((self.quality.max_width_px, height), Image.LANCZOS)
+                tmp = variant.with_name(variant.name + ".tmp")
+                if fmt == "JPEG":
+                    img.convert("RGB").save(tmp, "JPEG", quality=self.quality.jpeg_quality, optimize=True, progressive=True)
+                else:
+                    img.save(tmp, "PNG", optimize=True)
+        except OSError:
+            return original # Not an image Pillow can read: let typst deal with it
+        os.replace(tmp, variant)
+
+        # Variants of older versions of this file
+        pattern = re.compile(re.escape(prefix) + r"[0-9a-f]{12}" + re.escape(source.suffix.lower()) + "$")
+        for old in self.cache_dir.iterdir():
+            if old != variant and pattern.match(old.name):
+                old.unlink(missing_ok=True)
+        with self._lock:
+            self.written += 1
+        return relative
+
+    def _source_hash(self, source: Path, index: dict) -> str:
+        """Content hash of an asset, reused while its size and mtime don't change."""
+        ref = source.relative_to(self.project_path).as_posix()
+        stat = source.stat()
+        with self._lock:
+            entry = index.get(ref)
+            if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                return entry["sha1"]
+        sha = hashlib.sha1()
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+        with self._lock:
+            index[ref] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha1": sha.hexdigest()}
+        return sha.hexdigest()
+
+    def _load_index(self) -> dict:
+        try:
+            return json.loads(self._index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index: dict):
+        try:
+            self._index_path.write_text(json.dumps(index, indent=1), encoding="utf-8")
+        except OSError:
+            pass # Only costs a rehash next time
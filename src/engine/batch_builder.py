@@ -0,0 +1,125 @@
+import contextlib
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, List, Optional
+
+def build_project_worker(project_path: str, jobs: int = 1, incremental: bool = True) -> dict:
+    """
+    Builds one project and returns its report entry. Runs in a worker
+    process, so it must not raise: every failure is reported as status "error".
+    """
+    from src.engine.project_manager import ProjectManager
+    from src.engine.pandoc_server import PandocServer
+    from src.engine.compile_scheduler import CompileJob
+
+    path = Path(project_path)
+    result = {
+        "project": str(path),
+        "name": path.name,
+        "status": "error",
+        "duration_s": 0.0,
+        "pdf": None,
+        "error": None,
+        "chapters": 0,
+        "cache_hits": 0,
+        "cache_hit_ratio": None,
+    }
+    start = time.perf_counter()
+    job = CompileJob(path)
+    try:
+        # Keep library prints off the runner's stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            pm = ProjectManager(projects_root=path.parent)
+            pm.load_project(path)
+            pdf_path = pm.build_project(job, jobs=jobs, incremental=incremental)
+        result["status"] = "ok"
+        result["pdf"] = str(pdf_path)
+    except Exception as e:
+        result["error"] = str(e)
+        details = getattr(e, "details", None)
+        if details:
+            result["error"] += f"\n{details}"
+    finally:
+        PandocServer.shutdown_all()
+        result["duration_s"] = time.perf_counter() - start
+
+    if job.metrics:
+        stages = [m.stage for m in job.metrics.stages]
+        result["chapters"] = stages.count("resolve")
+        result["cache_hits"] = stages.count("cache")
+        if result["chapters"]:
+            result["cache_hit_ratio"] = result["cache_hits"] / result["chapters"]
+    return result
+
+class BatchBuilder:
+    """
+    Rebuilds every project under a projects root on a process pool.
+
+    At most `workers` projects build at once, each with up to
+    `jobs_per_project` pandoc conversions, so the global limit is
+    workers * jobs_per_project concurrent pandoc processes. Projects are
+    isolated: a failing (or crashing) build is reported and the batch goes on.
+    """
+
+    REPORT_NAME = "build_report.json"
+
+    def __init__(self, projects_root: Path, workers: int = 2, jobs_per_project: int = 1, incremental: bool = True):
+        self.projects_root = projects_root
+        self.workers = max(1, workers)
+        self.jobs_per_project = max(1, jobs_per_project)
+        self.incremental = incremental
+
+    def discover(self) -> List[Path]:
+        from src.engine.project_manager import ProjectManager
+        return sorted(ProjectManager(projects_root=self.projects_root).list_projects())
+
+    def run(self, projects: Optional[List[Path]] = None, report_path: Optional[Path] = None,
+            on_result: Optional[Callable[[dict], None]] = None) -> dict:
+        """
+        Builds the projects (default: all discovered ones), writes the
+        summary report (default: <projects_root>/build_report.json) and
+        returns it.
+        """
+        projects = self.discover() if projects is None else list(projects)
+        started_at = time.time()
+        start = time.perf_counter()
+        results = {}
+
+        if projects:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(projects))) as pool:
+                futures = {
+                    pool.submit(build_project_worker, str(p), self.jobs_per_project, self.incremental): p
+                    for p in projects
+                }
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # The worker died (e.g. BrokenProcessPool): still one entry per project
+                        result = {"project": str(path), "name": path.name, "status": "error",
+                                  "duration_s": None, "pdf": None, "error": f"Worker failed: {e!r}",
+                                  "chapters": 0, "cache_hits": 0, "cache_hit_ratio": None}
+                    results[str(path)] = result
+                    if on_result: on_result(result)
+
+        entries = [results[str(p)] for p in projects]
+        report = {
+            "projects_root": str(self.projects_root),
+            "started_at": started_at,
+            "duration_s": time.perf_counter() - start,
+            "workers": self.workers,
+            "jobs_per_project": self.jobs_per_project,
+            "incremental": self.incremental,
+            "ok": sum(1 for r in entries if r["status"] == "ok"),
+            "failed": sum(1 for r in entries if r["status"] != "ok"),
+            "projects": entries,
+        }
+
+        report_path = report_path or (self.projects_root / self.REPORT_NAME)
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        report_path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        return report
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+class BuildCache:
+    """
+    Persistent cache of chapter Markdown -> Typst conversions.
+
+    Entries are content-addressed: the key is a hash of the resolved chapter
+    markdown, the pandoc version and the conversion flags, so any change to
+    one of them produces a miss. The converted Typst is stored as
+    `<key>.typ` under `typst/`, and `index.json` keeps the size and last-use
+    time of each entry so the cache can be trimmed (LRU) to `max_bytes`.
+    Other processes (the build daemon, CLI builds) share the directory:
+    `reload_if_changed` picks up an index one of them saved.
+    """
+
+    DEFAULT_MAX_BYTES = 50 * 1024 * 1024  # 50 MB
+
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.blobs_dir = cache_dir / "typst"
+        self.index_path = cache_dir / "index.json"
+
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}  # key -> {"size": int, "last_used": float}
+        self._outputs: Dict[str, str] = {}   # chapter id -> key of its current <id>.typ
+
+        self.hits = 0
+        self.misses = 0
+        self._index_stamp = None # Stat of index.json as last read or written
+
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(markdown: str, pandoc_version: str, flags: List[str]) -> str:
+        """Builds the cache key for a conversion."""
+        h = hashlib.sha256()
+        h.update(pandoc_version.encode("utf-8"))
+        h.update(b"\0")
+        h.update("\0".join(flags).encode("utf-8"))
+        h.update(b"\0")
+        h.update(markdown.encode("utf-8"))
+        return h.hexdigest()
+
+    def is_current(self, chapter_id: str, key: str) -> bool:
+        """True if the chapter's existing output was produced from this key."""
+        with self._lock:
+            return self._outputs.get(chapter_id) == key and key in self._entries
+
+    def mark_current(self, chapter_id: str, key: str):
+        """Records that the chapter's output on disk now corresponds to key."""
+        with self._lock:
+            self._outputs[chapter_id] = key
+            if key in self._entries:
+                self._entries[key]["last_used"] = time.time()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached Typst for key, or None on a miss."""
+        blob = self.blobs_dir / f"{key}.typ"
+        with self._lock:
+            if key not in self._entries or not blob.exists():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries[key]["last_used"] = time.time()
+            self.hits += 1
+        return blob.read_text(encoding="utf-8")
+
+    def record_hit(self, key: str):
+        """Counts a hit for an output reused without reading the blob."""
+        with self._lock:
+            self.hits += 1
+            if key in self._entries:
+                self._entries[key]["last_used"] = time.time()
+
+    def put(self, key: str, typst: str):
+        """Stores a conversion result and evicts old entries if over the size cap."""
+        data = typst.encode("utf-8")
+        blob = self.blobs_dir / f"{key}.typ"
+        blob.write_bytes(data)
+        with self._lock:
+            self._entries[key] = {"size": len(data), "last_used": time.time()}
+            self._evict_locked()
+
+    def total_size(self) -> int:
+        with self._lock:
+            return sum(e["size"] for e in self._entries.values())
+
+    def save(self):
+        """Persists the index to disk (atomic write)."""
+        with self._lock:
+            data = {"entries": self._entries, "outputs": self._outputs}
+            temp_path = self.index_path.with_suffix(".tmp")
+            temp_path.write_text(json.dumps(data), encoding="utf-8")
+            temp_path.replace(self.index_path)
+            self._index_stamp = self._stat_index()
+
+    def clear(self):
+        """Removes every cached entry."""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove_locked(key)
+            self._outputs.clear()
+        self.save()
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reloads index.json if something else saved it since this cache last
+        read or wrote it, so outputs rewritten by another build are not
+        taken as current. Returns True if it was reloaded.
+        """
+        with self._lock:
+            if self._stat_index() == self._index_stamp:
+                return False
+            self._entries, self._outputs = {}, {}
+            self._load_index()
+            return True
+
+    def _stat_index(self):
+        try:
+            st = self.index_path.stat()
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _load_index(self):
+        self._index_stamp = self._stat_index()
+        if not self.index_path.exists():
+            return
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+            self._entries = dict(data.get("entries", {}))
+            self._outputs = dict(data.get("outputs", {}))
+        except (ValueError, OSError):
+            # Corrupted index: start fresh, stale blobs get overwritten/evicted
+            self._entries = {}
+            self._outputs = {}
+
+    def _evict_locked(self):
+        total = sum(e["size"] for e in self._entries.values())
+        if total <= self.max_bytes:
+            return
+        # Least recently used first
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= self._entries[key]["size"]
+            self._remove_locked(key)
+
+    def _remove_locked(self, key: str):
+        self._entries.pop(key, None)
+        for chapter_id in [c for c, k in self._outputs.items() if k == key]:
+            del self._outputs[chapter_id]
+        blob = self.blobs_dir / f"{key}.typ"
+        if blob.exists():
+            blob.unlink()
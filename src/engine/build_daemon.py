@@ -0,0 +1,320 @@
+import getpass
+import json
+import os
+import socket
+import socketserver
+import stat
+import tempfile
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from src.engine.compiler import CompilationError, CompilationCancelled
+
+# Build options a client can pass through to ProjectManager.build_project
+BUILD_OPTIONS = ("jobs", "use_watch", "incremental", "chapter_ids", "asset_quality")
+
+def daemon_supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+def default_socket_path() -> Path:
+    """
+    $THESISFLOW_DAEMON_SOCKET, else a per-user socket in the runtime
+    directory, else in a private (0700) directory under the temp directory.
+    Raises PermissionError if that directory belongs to someone else.
+    """
+    if os.environ.get("THESISFLOW_DAEMON_SOCKET"):
+        return Path(os.environ["THESISFLOW_DAEMON_SOCKET"])
+    user = os.getuid() if hasattr(os, "getuid") else getpass.getuser()
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return Path(os.environ["XDG_RUNTIME_DIR"]) / f"thesisflow-{user}.sock"
+    return _private_dir(Path(tempfile.gettempdir()) / f"thesisflow-{user}") / "daemon.sock"
+
+def _private_dir(path: Path) -> Path:
+    """Creates `path` readable by this user only; refuses one another user could have planted."""
+    path.mkdir(mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or (hasattr(os, "getuid") and (st.st_uid != os.getuid() or st.st_mode & 0o077)):
+        raise PermissionError(f"{path} is not a private directory of this user")
+    return path
+
+def _is_own_socket(path: Path) -> bool:
+    """Whether `path` is a socket of this user that nobody else can use."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    if not stat.S_ISSOCK(st.st_mode):
+        return False
+    return not hasattr(os, "getuid") or (st.st_uid == os.getuid() and not st.st_mode & 0o077)
+
+def _send(conn: socket.socket, message: dict):
+    conn.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+class BuildDaemon:
+    """
+    Local build server shared by GUI windows and CLI runs.
+
+    Listens on a Unix socket for newline-delimited JSON requests:
+    {"op": "build", "project": ..., <build options>} streams the build's
+    events ("job", "progress", "stage", "output") and ends with "done",
+    "error" or "cancelled"; {"op": "cancel", "job": id}, {"op": "status"}
+    and {"op": "shutdown"} get a single reply.
+
+    Builds go through one CompileScheduler (a newer build of a project
+    supersedes the running one, whoever asked for it) and one
+    ProjectManager per project, so the build caches stay in memory and the
+    pandoc server and typst watch processes stay warm between clients.
+    While a build runs, an "alive" event is sent every HEARTBEAT_S seconds.
+    """
+
+    HEARTBEAT_S = 5.0
+
+    def __init__(self, socket_path: Optional[Path] = None):
+        from src.engine.compile_scheduler import CompileScheduler
+        self.socket_path = socket_path or default_socket_path()
+        self.scheduler = CompileScheduler()
+        self.started_at = time.time()
+        self._managers: Dict[Path, object] = {}
+        self._jobs: Dict[int, object] = {} # Jobs not finished yet, by id
+        self._lock = threading.Lock()
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+
+    def serve_forever(self):
+        """Binds the socket and serves until a shutdown request. Raises RuntimeError if a daemon is already running."""
+        if BuildDaemonClient.connect(self.socket_path) is not None:
+            raise RuntimeError(f"A build daemon is already listening on {self.socket_path}")
+        self.socket_path.unlink(missing_ok=True) # Left over by a daemon that died
+
+        daemon = self
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                if line:
+                    daemon._handle(self.connection, line)
+
+        self._server = socketserver.ThreadingUnixStreamServer(str(self.socket_path), Handler)
+        self._server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self.socket_path.unlink(missing_ok=True)
+
+    def shutdown(self):
+        """Cancels the builds, stops the warm processes and the server."""
+        from src.engine.compiler import AsyncCompiler
+        from src.engine.pandoc_server import PandocServer
+        self.scheduler.cancel_all()
+        PandocServer.shutdown_all()
+        AsyncCompiler.shutdown_watchers()
+        if self._server:
+            # serve_forever() returns once the current request is handled
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def _handle(self, conn: socket.socket, line: bytes):
+        try:
+            request = json.loads(line)
+            op = request.get("op")
+            if op == "build":
+                self._build(conn, request)
+            elif op == "cancel":
+                with self._lock:
+                    job = self._jobs.get(request.get("job"))
+                if job:
+                    job.cancel()
+                _send(conn, {"ok": job is not None})
+            elif op == "status":
+                _send(conn, {"ok": True, **self.status()})
+            elif op == "shutdown":
+                _send(conn, {"ok": True})
+                self.shutdown()
+            else:
+                _send(conn, {"ok": False, "error": f"Unknown op: {op}"})
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            _send(conn, {"ok": False, "error": f"Bad request: {e}"})
+        except OSError:
+            pass # Client went away
+
+    def status(self) -> dict:
+        with self._lock:
+            jobs = [{"job": job.id, "project": str(job.project_path), "state": job.state} for job in self._jobs.values()]
+            projects = [str(path) for path in self._managers]
+        return {"pid": os.getpid(), "uptime_s": time.time() - self.started_at, "projects": projects, "jobs": jobs}
+
+    def _manager(self, project_path: Path):
+        from src.engine.project_manager import ProjectManager
+        with self._lock:
+            if project_path not in self._managers:
+                self._managers[project_path] = ProjectManager(projects_root=project_path.parent)
+            return self._managers[project_path]
+
+    def _build(self, conn: socket.socket, request: dict):
+        from src.engine.compile_scheduler import CompileJob
+        from src.engine.draft_master import DraftOptions
+
+        project_path = Path(request["project"]).resolve()
+        pm = self._manager(project_path)
+        options = {name: request[name] for name in BUILD_OPTIONS if name in request}
+        if request.get("draft") is not None:
+            options["draft"] = DraftOptions(**request["draft"])
+
+        send_lock = threading.Lock()
+        alive = True
+        def send(message: dict):
+            nonlocal alive
+            with send_lock:
+                if not alive:
+                    return
+                try:
+                    _send(conn, message)
+                except OSError:
+                    alive = False # The build goes on; its result is still cached
+
+        finished = threading.Event()
+        outcome = {}
+
+        def run(job):
+            # The scheduler runs one build per project at a time, so the manager is ours
+            pm.load_project(project_path)
+            return pm.build_project(job, on_progress=lambda status, fraction: send({"event": "progress", "status": status, "fraction": fraction}),
+                                    on_metrics=lambda stage: send({"event": "stage", "stage": stage.to_dict()}),
+                                    on_output=lambda line: send({"event": "output", "line": line}), **options)
+
+        def on_success(pdf_path):
+            outcome.update(event="done", pdf=str(pdf_path))
+            finished.set()
+
+        def on_error(error):
+            outcome.update(event="error", message=str(error), details=getattr(error, "details", None))
+            finished.set()
+
+        def on_state(job):
+            if job.state == CompileJob.CANCELLED:
+                outcome.setdefault("event", "cancelled")
+                finished.set()
+
+        job = self.scheduler.submit(project_path, run, on_success, on_error, on_state)
+        with self._lock:
+            self._jobs[job.id] = job
+        send({"event": "job", "job": job.id})
+        try:
+            while not finished.wait(self.HEARTBEAT_S):
+                send({"event": "alive"}) # Lets the client tell a long build from a hung daemon
+        finally:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+        send(outcome)
+
+class BuildDaemonClient:
+    """
+    Talks to a running BuildDaemon. Use `connect`, which returns None if
+    there is none, or if the socket isn't this user's alone.
+    """
+
+    CONNECT_TIMEOUT = 1.0
+    # Longest silence during a build (the daemon sends heartbeats) before giving up on it
+    READ_TIMEOUT = 30.0
+
+    def __init__(self, socket_path: Path):
+        self.socket_path = socket_path
+
+    @classmethod
+    def connect(cls, socket_path: Optional[Path] = None) -> Optional["BuildDaemonClient"]:
+        """A client if a daemon answers on the socket, else None."""
+        if not daemon_supported():
+            return None
+        try:
+            client = cls(socket_path or default_socket_path())
+        except OSError:
+            return None
+        if not _is_own_socket(client.socket_path):
+            return None
+        try:
+            client.status()
+        except (OSError, ValueError):
+            return None
+        return client
+
+    def status(self) -> dict:
+        return self._request({"op": "status"})
+
+    def cancel(self, job_id: int) -> bool:
+        return self._request({"op": "cancel", "job": job_id}).get("ok", False)
+
+    def shutdown(self):
+        self._request({"op": "shutdown"})
+
+    def build(self, project_path: Path, job=None, on_progress: Callable = None, on_metrics: Callable = None,
+              on_output: Callable = None, draft=None, **options) -> Path:
+        """
+        Builds the project in the daemon, with the arguments of
+        ProjectManager.build_project, and returns the PDF path. `job` (a
+        local CompileJob) gets the stage metrics, and cancelling it cancels
+        the remote build. Raises CompilationError like an in-process build,
+        CompilationCancelled if the build was cancelled or superseded.
+        """
+        from src.engine.build_metrics import BuildMetrics, StageMetrics
+
+        metrics = BuildMetrics(on_stage=on_metrics)
+        if job is not None:
+            job.metrics = metrics
+        request = {"op": "build", "project": str(Path(project_path).resolve()),
+                   "draft": asdict(draft) if draft is not None else None}
+        request.update({name: value for name, value in options.items() if name in BUILD_OPTIONS})
+
+        with self._open() as conn:
+            conn.settimeout(self.READ_TIMEOUT)
+            _send(conn, request)
+            lines = conn.makefile("r", encoding="utf-8")
+            while True:
+                try:
+                    line = lines.readline()
+                except TimeoutError:
+                    raise CompilationError("Il demone di compilazione non risponde")
+                if not line:
+                    break
+                event = json.loads(line)
+                kind = event.get("event")
+                if kind == "job" and job is not None:
+                    remote_id = event["job"]
+                    job.add_cancel_callback(lambda: self._cancel_quietly(remote_id))
+                elif kind == "progress" and on_progress:
+                    on_progress(event["status"], event["fraction"])
+                elif kind == "stage":
+                    metrics.add(StageMetrics(**event["stage"]))
+                elif kind == "output" and on_output:
+                    on_output(event["line"])
+                elif kind == "done":
+                    return Path(event["pdf"])
+                elif kind == "cancelled":
+                    raise CompilationCancelled()
+                elif kind == "error":
+                    raise CompilationError(event["message"], details=event.get("details"))
+        raise CompilationError("Il demone di compilazione si è interrotto")
+
+    def _cancel_quietly(self, job_id: int):
+        try:
+            self.cancel(job_id)
+        except (OSError, ValueError):
+            pass # Daemon gone: so is the build
+
+    def _open(self) -> socket.socket:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.settimeout(self.CONNECT_TIMEOUT)
+        try:
+            conn.connect(str(self.socket_path))
+        except OSError:
+            conn.close()
+            raise
+        return conn
+
+    def _request(self, message: dict) -> dict:
+        with self._open() as conn:
+            _send(conn, message)
+            line = conn.makefile("r", encoding="utf-8").readline()
+        if not line:
+            raise ConnectionError("No reply from the build daemon")
+        return json.loads(line)
@@ -0,0 +1,214 @@
+import contextvars
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource # Unix only
+except ImportError:
+    resource = None
+
+# StageMetrics of the stages measuring the children started in this context
+_child_stages: contextvars.ContextVar = contextvars.ContextVar("child_stages", default=())
+_child_lock = threading.Lock()
+
+def _maxrss_kb(usage) -> int:
+    # ru_maxrss is in bytes on macOS, KB elsewhere
+    return usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+
+def _record_child(usage):
+    """Adds the rusage of one reaped child to the stages tracking children."""
+    rss = _maxrss_kb(usage)
+    # A child's high-water mark starts from this process's memory at spawn
+    # (it carries over exec), so only a higher figure is the child's own
+    if resource is not None and rss <= _maxrss_kb(resource.getrusage(resource.RUSAGE_SELF)):
+        rss = None
+    with _child_lock:
+        for stage in _child_stages.get():
+            stage.child_cpu_s = (stage.child_cpu_s or 0.0) + usage.ru_utime + usage.ru_stime
+            if rss is not None:
+                stage.peak_child_rss_kb = max(stage.peak_child_rss_kb or 0, rss)
+
+class MeasuredPopen(subprocess.Popen):
+    """
+    A Popen that reaps its child with os.wait4, so the child's own CPU
+    time and peak RSS are charged to the stages measuring children in the
+    context that reaps it (see BuildMetrics.measure): wait(), communicate()
+    and poll() all do. A child reaped by anything else (e.g. os.waitpid
+    on its pid) is not measured.
+    """
+
+    def _try_wait(self, wait_flags):
+        # Popen.wait calls this with _waitpid_lock held, which keeps poll() from racing it
+        if not hasattr(os, "wait4"):
+            return super()._try_wait(wait_flags)
+        try:
+            pid, status, usage = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            return self.pid, 0 # Reaped elsewhere; Popen reports 0 as well
+        if pid == self.pid:
+            _record_child(usage)
+        return pid, status
+
+    def poll(self):
+        if not hasattr(os, "wait4"):
+            return super().poll()
+        # Like Popen.poll, but Popen's own would reap with waitpid
+        if self.returncode is None and self._waitpid_lock.acquire(False):
+            try:
+                if self.returncode is None:
+                    pid, status = self._try_wait(os.WNOHANG)
+                    if pid == self.pid:
+                        self._handle_exitstatus(status)
+            finally:
+                self._waitpid_lock.release()
+        return self.returncode
+
+def run_child(cmd, input=None, capture_output=False, **kwargs) -> subprocess.CompletedProcess:
+    """subprocess.run, through MeasuredPopen."""
+    if input is not None:
+        kwargs["stdin"] = subprocess.PIPE
+    if capture_output:
+        kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+    with MeasuredPopen(cmd, **kwargs) as process:
+        try:
+            stdout, stderr = process.communicate(input)
+        except BaseException:
+            process.kill()
+            raise
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+@dataclass
+class StageMetrics:
+    stage: str          # "resolve", "assets", "citeproc", "cache", "fast", "pandoc", "conversion", "write", "typst"
+    name: str = ""      # chapter title, if the stage is per chapter
+    wall_s: float = 0.0
+    cpu_s: float = 0.0  # CPU of the measuring thread
+    child_cpu_s: Optional[float] = None      # CPU of the stage's child processes
+    peak_child_rss_kb: Optional[int] = None  # Largest peak RSS among the stage's child processes, if above this process's
+    bytes_written: int = 0
+    extra: Dict[str, object] = field(default_factory=dict)
+
+    def to_dict(self):
+        return asdict(self)
+
+class BuildMetrics:
+    """
+    Collects per-stage timings of one build.
+
+    Stages measured with `track_children` add up the children started
+    through MeasuredPopen/run_child in their context (one-off pandoc and
+    typst runs, not the persistent pandoc server or typst watch), each
+    measured on its own with os.wait4, so concurrent builds and parallel
+    chapters don't share figures. Worker threads see the stages of the
+    thread that submitted them only if run in a copy of its context
+    (contextvars.copy_context). Without os.wait4 (Windows) they stay None.
+    """
+
+    LOG_NAME = "build_metrics.jsonl"
+
+    def __init__(self, on_stage: Optional[Callable[[StageMetrics], None]] = None):
+        self.on_stage = on_stage
+        self.stages: List[StageMetrics] = []
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, stage: str, name: str = "", track_children: bool = False):
+        """Times the enclosed block. The yielded StageMetrics can be given bytes_written/extra."""
+        metrics = StageMetrics(stage, name)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        token = None
+        if track_children and hasattr(os, "wait4"):
+            metrics.child_cpu_s = 0.0
+            token = _child_stages.set(_child_stages.get() + (metrics,))
+        try:
+            yield metrics
+        finally:
+            metrics.wall_s = time.perf_counter() - wall
+            metrics.cpu_s = time.thread_time() - cpu
+            if token is not None:
+                _child_stages.reset(token)
+            self.add(metrics)
+
+    def add(self, metrics: StageMetrics):
+        with self._lock:
+            self.stages.append(metrics)
+        if self.on_stage:
+            self.on_stage(metrics)
+
+    @property
+    def total_wall_s(self) -> float:
+        return time.perf_counter() - self._start
+
+    def summary(self) -> Dict[str, dict]:
+        """Totals per stage, in the order stages first appeared."""
+        totals: Dict[str, dict] = {}
+        with self._lock:
+            stages = list(self.stages)
+        for m in stages:
+            t = totals.setdefault(m.stage, {"count": 0, "wall_s": 0.0, "cpu_s": 0.0, "child_cpu_s": None, "bytes_written": 0})
+            t["count"] += 1
+            t["wall_s"] += m.wall_s
+            t["cpu_s"] += m.cpu_s
+            t["bytes_written"] += m.bytes_written
+            if m.child_cpu_s is not None:
+                t["child_cpu_s"] = (t["child_cpu_s"] or 0.0) + m.child_cpu_s
+        return totals
+
+    def to_record(self, status: str) -> dict:
+        with self._lock:
+            stages = [m.to_dict() for m in self.stages]
+        return {
+            "started_at": self.started_at,
+            "status": status,
+            "total_wall_s": self.total_wall_s,
+            "stages": stages,
+        }
+
+    def append_to_log(self, thesis_data_dir: Path, status: str):
+        """Appends this build as one JSON line to <thesis_data_dir>/build_metrics.jsonl."""
+        thesis_data_dir.mkdir(parents=True, exist_ok=True)
+        with open(thesis_data_dir / self.LOG_NAME, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.to_record(status)) + "\n")
+
+def format_size(num_bytes: int) -> str:
+    if num_bytes < 1024:
+        return f"{num_bytes} B"
+    if num_bytes < 1024 * 1024:
+        return f"{num_bytes / 1024:.1f} KB"
+    return f"{num_bytes / (1024 * 1024):.1f} MB"
+
+def format_stage(m: StageMetrics) -> str:
+    """One console line for a finished stage."""
+    label = f"{m.stage}: {m.name}" if m.name else m.stage
+    parts = [f"{m.wall_s * 1000:.0f} ms", f"CPU {m.cpu_s * 1000:.0f} ms"]
+    if m.child_cpu_s is not None:
+        parts.append(f"CPU processi {m.child_cpu_s * 1000:.0f} ms")
+    if m.peak_child_rss_kb:
+        parts.append(f"RSS max {m.peak_child_rss_kb / 1024:.0f} MB")
+    if m.bytes_written:
+        parts.append(f"scritti {format_size(m.bytes_written)}")
+    if "files_rewritten" in m.extra:
+        parts.append(f"file riscritti {m.extra['files_rewritten']}/{m.extra['files_rewritten'] + m.extra['files_unchanged']}")
+    return f"[{label}] " + ", ".join(parts)
+
+def format_summary(metrics: BuildMetrics) -> str:
+    """Multi-line per-stage breakdown of a build."""
+    lines = [f"Tempi di compilazione: {metrics.total_wall_s:.2f} s"]
+    for stage, t in metrics.summary().items():
+        line = f"  {stage:<11} {t['wall_s']:7.2f} s  x{t['count']}"
+        if t["child_cpu_s"] is not None:
+            line += f"  CPU processi {t['child_cpu_s']:.2f} s"
+        if t["bytes_written"]:
+            line += f"  {format_size(t['bytes_written'])}"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,180 @@
+import itertools
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from src.engine.compiler import CompilationCancelled
+
+class CompileJob:
+    """One build request. State goes queued -> running -> done, or cancelled at any point."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    CANCELLED = "cancelled"
+    DONE = "done"
+
+    _ids = itertools.count(1)
+
+    def __init__(self, project_path: Path, on_state: Optional[Callable[["CompileJob"], None]] = None):
+        self.id = next(CompileJob._ids)
+        self.project_path = project_path
+        self.state = CompileJob.QUEUED
+        self.result: Optional[Path] = None
+        self.error: Optional[Exception] = None
+        self.metrics = None # BuildMetrics of the build, set by the pipeline
+        self.on_state = on_state
+        self._cancel_event = threading.Event()
+        self._cancel_callbacks: List[Callable[[], None]] = []
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancel_event(self) -> threading.Event:
+        return self._cancel_event
+
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def is_finished(self) -> bool:
+        return self._finished.is_set()
+
+    def add_cancel_callback(self, callback: Callable[[], None]):
+        """Registers e.g. a subprocess terminate; runs it right away if already cancelled."""
+        with self._lock:
+            if not self._cancel_event.is_set():
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self._lock:
+            if self._cancel_event.is_set():
+                return
+            self._cancel_event.set()
+            callbacks = list(self._cancel_callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass # Best effort: the process may already be gone
+
+    def check_cancelled(self):
+        """Raises CompilationCancelled if the job was superseded."""
+        if self.is_cancelled():
+            raise CompilationCancelled()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the job is done or cancelled."""
+        return self._finished.wait(timeout)
+
+    def _set_state(self, state: str, finish: bool = True):
+        """Without `finish`, waiters are released later by the caller (see CompileScheduler._run)."""
+        self.state = state
+        if finish and state in (CompileJob.DONE, CompileJob.CANCELLED):
+            self._finished.set()
+        if self.on_state:
+            self.on_state(self)
+
+class CompileScheduler:
+    """
+    Keeps at most one running build per project.
+
+    A request made while a build is running cancels it (`cancel_running`)
+    and waits behind it in a single queued slot: further requests replace
+    the queued one, so only the latest state gets built.
+    """
+
+    def __init__(self, cancel_running: bool = True):
+        self.cancel_running = cancel_running
+        self._running: Dict[Path, CompileJob] = {}
+        self._queued: Dict[Path, tuple] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, project_path: Path, run: Callable[[CompileJob], Path],
+               on_success: Callable[[Path], None], on_error: Callable[[Exception], None],
+               on_state: Optional[Callable[[CompileJob], None]] = None) -> CompileJob:
+        """
+        Schedules run(job) for the project. on_success/on_error are only
+        called for jobs that were not cancelled.
+        """
+        job = CompileJob(project_path, on_state)
+        key = project_path.resolve()
+        # Every job starts queued; announce it before another thread can start it
+        job._set_state(CompileJob.QUEUED)
+
+        superseded = None
+        to_cancel = None
+        start_now = False
+
+        with self._lock:
+            if key in self._queued:
+                superseded = self._queued.pop(key)[0]
+            if key in self._running:
+                self._queued[key] = (job, run, on_success, on_error)
+                if self.cancel_running:
+                    to_cancel = self._running[key]
+            else:
+                self._running[key] = job
+                start_now = True
+
+        if superseded:
+            superseded.cancel()
+            superseded._set_state(CompileJob.CANCELLED)
+
+        if start_now:
+            self._start(key, job, run, on_success, on_error)
+        elif to_cancel:
+            to_cancel.cancel()
+        return job
+
+    def get_running(self, project_path: Path) -> Optional[CompileJob]:
+        with self._lock:
+            return self._running.get(project_path.resolve())
+
+    def cancel_all(self):
+        """Cancels queued and running builds of every project."""
+        with self._lock:
+            queued = [entry[0] for entry in self._queued.values()]
+            self._queued.clear()
+            running = list(self._running.values())
+        for job in queued:
+            job.cancel()
+            job._set_state(CompileJob.CANCELLED)
+        for job in running:
+            job.cancel()
+
+    def _start(self, key: Path, job: CompileJob, run, on_success, on_error):
+        job._set_state(CompileJob.RUNNING)
+        threading.Thread(target=self._run, args=(key, job, run, on_success, on_error), daemon=True).start()
+
+    def _run(self, key: Path, job: CompileJob, run, on_success, on_error):
+        next_entry = None
+        try:
+            try:
+                job.result = run(job)
+            except Exception as e:
+                job.error = e
+            finally:
+                with self._lock:
+                    self._running.pop(key, None)
+                    next_entry = self._queued.pop(key, None)
+                    if next_entry:
+                        self._running[key] = next_entry[0]
+
+            if job.is_cancelled():
+                job._set_state(CompileJob.CANCELLED)
+            else:
+                # wait() returns once the result has been delivered
+                job._set_state(CompileJob.DONE, finish=False)
+                try:
+                    if job.error is not None:
+                        on_error(job.error)
+                    else:
+                        on_success(job.result)
+                finally:
+                    job._finished.set()
+        finally:
+            # Even if run() raised e.g. KeyboardInterrupt: release waiters and start the next build
+            if not job.is_finished():
+                job._set_state(CompileJob.CANCELLED)
+            if next_entry:
+                self._start(key, *next_entry)
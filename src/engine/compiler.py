@@ -1,19 +1,42 @@
 import subprocess
 import threading
 import re
+import time
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Callable, Dict, Optional
 from src.utils.paths import get_typst_exe
+from src.engine.typst_watch import TypstWatchProcess
+from src.engine.build_metrics import MeasuredPopen
 
 class CompilationError(Exception):
     def __init__(self, message, details=None):
         super().__init__(message)
         self.details = details
 
+class CompilationCancelled(CompilationError):
+    """Raised when a build is cancelled (e.g. superseded by a newer one)."""
+    def __init__(self, message="Compilazione annullata"):
+        super().__init__(message)
+
+class ChapterConversionError(CompilationError):
+    """Raised when pandoc fails on a specific chapter."""
+    def __init__(self, chapter, cause: Exception):
+        super().__init__(f"Errore nella conversione del capitolo '{chapter.title}'", details=str(cause))
+        self.chapter = chapter
+        self.cause = cause
+
 class AsyncCompiler:
-    def __init__(self):
+    # Long-lived `typst watch` backends, one per open project
+    _watchers: Dict[Path, TypstWatchProcess] = {}
+    _watchers_lock = threading.Lock()
+
+    def __init__(self, use_watch: bool = False, on_output: Optional[Callable[[str], None]] = None):
         self._process: Optional[subprocess.Popen] = None
+        self._watcher: Optional[TypstWatchProcess] = None
         self._lock = threading.Lock()
+        self.use_watch = use_watch
+        # Gets typst's output as it is printed, one formatted line at a time
+        self.on_output = on_output
 
     def compile(self, project_path: Path, on_success: Callable[[Path], None], on_error: Callable[[Exception], None]):
         """
@@ -28,7 +51,89 @@ class AsyncCompiler:
 
         threading.Thread(target=_run, daemon=True).start()
 
-    def _compile_sync(self, project_path: Path) -> Path:
+    def compile_sync(self, project_path: Path, written_at: Optional[float] = None,
+                     input_file: Optional[Path] = None, output_file: Optional[Path] = None) -> Path:
+        """
+        Blocking compilation. In watch mode the project's persistent typst
+        process is reused and this waits for the first compilation started
+        after `written_at` (the time the last generated file was written).
+        `input_file`/`output_file` replace master.typ and <project>.pdf
+        (e.g. for draft builds); they always use a fresh `typst compile`.
+        """
+        if self.use_watch and input_file is None:
+            return self._compile_watch(project_path, written_at if written_at is not None else time.time())
+        return self._compile_sync(project_path, input_file, output_file)
+
+    def settled_output(self, project_path: Path) -> Optional[Path]:
+        """
+        The PDF of the project's typst watch process when it is idle after a
+        successful compilation, i.e. already reflects the files on disk.
+        None if there is no such process or it has work (or errors) pending.
+        """
+        with self._watchers_lock:
+            watcher = self._watchers.get(project_path.resolve())
+        if watcher is None:
+            return None
+        event = watcher.settled_event()
+        if event is None or not event.ok or not watcher.output_file.exists():
+            return None
+        return watcher.output_file
+
+    def _compile_watch(self, project_path: Path, written_at: float) -> Path:
+        input_file = project_path / "master.typ"
+        if not input_file.exists():
+            raise CompilationError("master.typ not found in project.")
+
+        watcher = self.get_watcher(project_path)
+        with self._lock:
+            self._watcher = watcher
+        watcher.on_output = self._emit if self.on_output else None
+        try:
+            event = watcher.wait_for_compile(written_at)
+        except InterruptedError:
+            raise CompilationCancelled()
+        except (OSError, RuntimeError, TimeoutError) as e:
+            raise CompilationError(f"typst watch: {e}")
+        finally:
+            watcher.on_output = None
+            with self._lock:
+                self._watcher = None
+
+        if not event.ok:
+            friendly_error = self.format_errors("\n".join(event.lines))
+            raise CompilationError("Errore durante la compilazione", details=friendly_error)
+        return watcher.output_file
+
+    @classmethod
+    def get_watcher(cls, project_path: Path) -> TypstWatchProcess:
+        """Returns (creating it if needed) the watch backend of a project."""
+        typst_exe = get_typst_exe()
+        if not typst_exe.exists():
+            raise CompilationError("Typst executable not found.")
+
+        key = project_path.resolve()
+        with cls._watchers_lock:
+            watcher = cls._watchers.get(key)
+            if watcher is None:
+                watcher = TypstWatchProcess(
+                    typst_exe,
+                    project_path / "master.typ",
+                    project_path / f"{project_path.name}.pdf",
+                    project_path
+                )
+                cls._watchers[key] = watcher
+        return watcher
+
+    @classmethod
+    def shutdown_watchers(cls):
+        """Stops every typst watch process (call on application exit)."""
+        with cls._watchers_lock:
+            watchers = list(cls._watchers.values())
+            cls._watchers.clear()
+        for watcher in watchers:
+            watcher.shutdown()
+
+    def _compile_sync(self, project_path: Path, input_file: Optional[Path] = None, output_file: Optional[Path] = None) -> Path:
         """
         Blocking compilation logic.
         """
@@ -36,32 +141,42 @@ class AsyncCompiler:
         if not typst_exe.exists():
             raise CompilationError("Typst executable not found.")
 
-        input_file = project_path / "master.typ"
-        output_file = project_path / f"{project_path.name}.pdf"
+        input_file = input_file or project_path / "master.typ"
+        output_file = output_file or project_path / f"{project_path.name}.pdf"
         
         # Ensure input exists
         if not input_file.exists():
              # Try to generate it if logic allows, or error
              # For now, error
-             raise CompilationError("master.typ not found in project.")
+             raise CompilationError(f"{input_file.name} not found in project.")
 
         cmd = [str(typst_exe), "compile", str(input_file), str(output_file), "--root", str(project_path)]
         
-        # Capture output for error parsing
+        # Output is read line by line as typst prints it, and kept for error parsing
         try:
             with self._lock:
-                self._process = subprocess.Popen(
+                self._process = MeasuredPopen(
                     cmd, 
                     stdout=subprocess.PIPE, 
                     stderr=subprocess.PIPE,
                     text=True,
+                    encoding='utf-8',
+                    errors='replace',
+                    bufsize=1,
                     cwd=project_path
                 )
+            process = self._process
+
+            reader = threading.Thread(target=self._stream, args=(process.stdout, []), daemon=True)
+            reader.start()
+            stderr_lines = []
+            self._stream(process.stderr, stderr_lines)
+            reader.join()
+            process.wait()
+            stderr = "".join(stderr_lines)
             
-            stdout, stderr = self._process.communicate()
-            
-            if self._process.returncode != 0:
-                friendly_error = self._parse_error(stderr)
+            if process.returncode != 0:
+                friendly_error = self.format_errors(stderr)
                 raise CompilationError("Errore durante la compilazione", details=friendly_error)
             
             return output_file
@@ -72,21 +187,37 @@ class AsyncCompiler:
              with self._lock:
                  self._process = None
 
-    def _parse_error(self, stderr: str) -> str:
+    def _stream(self, pipe, lines: list):
+        """Collects the lines of `pipe` until it closes, passing each to on_output."""
+        for line in pipe:
+            lines.append(line)
+            self._emit(line)
+
+    def _emit(self, line: str):
+        formatted = self._format_line(line)
+        if formatted and self.on_output:
+            self.on_output(formatted)
+
+    @staticmethod
+    def _format_line(line: str) -> Optional[str]:
+        """One line of typst output as shown to the user (None if blank)."""
+        if "error:" in line:
+            # Extract file and line info if possible
+            # Format: error: <msg> at <file>:<line>:<col>
+            return f"❌ {line.strip()}"
+        elif "warning:" in line:
+            return f"⚠️ {line.strip()}"
+        elif line.strip():
+            return line.strip()
+        return None
+
+    @staticmethod
+    def format_errors(stderr: str) -> str:
         """
         Parses Typst stderr to extract meaningful error messages.
         """
         lines = stderr.split('\n')
-        parsed = []
-        for line in lines:
-            if "error:" in line:
-                # Extract file and line info if possible
-                # Format: error: <msg> at <file>:<line>:<col>
-                parsed.append(f"❌ {line.strip()}")
-            elif "warning:" in line:
-                 parsed.append(f"⚠️ {line.strip()}")
-            elif line.strip():
-                 parsed.append(line.strip())
+        parsed = [f for f in map(AsyncCompiler._format_line, lines) if f]
         
         if not parsed:
             return stderr # Return raw if no pattern matched
@@ -97,3 +228,5 @@ class AsyncCompiler:
         with self._lock:
             if self._process:
                 self._process.terminate()
+            if self._watcher:
+                self._watcher.cancel()
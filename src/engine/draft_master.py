@@ -0,0 +1,47 @@
+from dataclasses import dataclass
+
+# The templates wrap their title page in these comment lines
+FRONT_PAGE_START = "// --- Front Page ---"
+FRONT_PAGE_END = "// ----------------"
+
+# Next to master.typ, so its relative paths still resolve
+DRAFT_MASTER_NAME = ".draft_master.typ"
+DRAFT_BODY_NAME = "draft_body.typ"
+
+BODY_INCLUDE = '#include ".thesis_data/temp/compiled_body.typ"'
+DRAFT_BODY_INCLUDE = f'#include ".thesis_data/temp/{DRAFT_BODY_NAME}"'
+
+# Hides the bibliography; typst still resolves the citations against it
+HIDE_BIBLIOGRAPHY = "#show bibliography: none"
+
+@dataclass
+class DraftOptions:
+    """What a draft build keeps of master.typ besides the selected chapters."""
+    front_page: bool = False
+    bibliography: bool = False
+    asset_quality: str = "draft" # See asset_optimizer.QUALITY_PRESETS
+
+def make_draft_master(master: str, options: DraftOptions) -> str:
+    """
+    Returns the text of a draft master: `master` (the project's master.typ)
+    including draft_body.typ instead of compiled_body.typ. Without
+    `options.front_page` the lines between the front page markers are
+    dropped, without `options.bibliography` the bibliography is hidden.
+    Raises ValueError if master.typ doesn't include the compiled body.
+    """
+    if BODY_INCLUDE not in master:
+        raise ValueError("master.typ does not include .thesis_data/temp/compiled_body.typ")
+    draft = master.replace(BODY_INCLUDE, DRAFT_BODY_INCLUDE)
+
+    if not options.front_page:
+        lines = draft.split("\n")
+        starts = [i for i, line in enumerate(lines) if line.strip() == FRONT_PAGE_START]
+        if starts:
+            ends = [i for i, line in enumerate(lines) if line.strip() == FRONT_PAGE_END and i > starts[0]]
+            if ends:
+                lines[starts[0]:ends[0] + 1] = []
+        draft = "\n".join(lines)
+
+    if not options.bibliography:
+        draft = HIDE_BIBLIOGRAPHY + "\n" + draft
+    return draft
@@ -26,6 +26,7 @@ class ProjectManifest:
     year: str = ""
     chapters: List[Chapter] = field(default_factory=list)
     citation_style: str = "ieee.csl" # Default style
+    citation_mode: str = "unified" # "unified": one citeproc pass per build; "typst": native Typst citations and bibliography; "none": citations left to the template
 
     def to_dict(self):
         return {
@@ -43,7 +44,8 @@ class ProjectManifest:
                 }
                 for c in self.chapters
             ],
-            "citation_style": self.citation_style
+            "citation_style": self.citation_style,
+            "citation_mode": self.citation_mode
         }
 
     @classmethod
@@ -64,5 +66,6 @@ class ProjectManifest:
             supervisor=data.get("supervisor", ""),
             year=data.get("year", ""),
             chapters=chapters,
-            citation_style=data.get("citation_style", "ieee.csl")
+            citation_style=data.get("citation_style", "ieee.csl"),
+            citation_mode=data.get("citation_mode", "unified")
         )
@@ -0,0 +1,63 @@
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+class OutputWriter:
+    """
+    Writes the generated files of a build (.thesis_data/temp, the draft
+    master). A file is only replaced when its bytes change, through a
+    temporary file and os.replace: unchanged outputs keep their mtime, so
+    typst watch and other incremental readers see no-op builds as such,
+    and nothing ever reads a half-written file.
+
+    Counts the files rewritten and left untouched; safe to share between
+    the conversion threads.
+    """
+
+    def __init__(self):
+        self.rewritten = 0
+        self.unchanged = 0
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+
+    def write(self, path: Path, text: str) -> bool:
+        """Makes `path` hold `text`. Returns False if it already did."""
+        data = text.encode("utf-8")
+        if _read_bytes(path) == data:
+            self._count(False)
+            return False
+        staged = self.staging_path(path)
+        staged.write_bytes(data)
+        os.replace(staged, path)
+        self._count(True, len(data))
+        return True
+
+    def staging_path(self, path: Path) -> Path:
+        """A temporary path next to `path`, for tools that write the output themselves (see `commit`)."""
+        return path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+
+    def commit(self, staged: Path, path: Path) -> bool:
+        """Moves `staged` over `path` unless their content is the same. Returns True if `path` changed."""
+        data = staged.read_bytes()
+        if _read_bytes(path) == data:
+            staged.unlink()
+            self._count(False)
+            return False
+        os.replace(staged, path)
+        self._count(True, len(data))
+        return True
+
+    def _count(self, rewritten: bool, size: int = 0):
+        with self._lock:
+            if rewritten:
+                self.rewritten += 1
+                self.bytes_written += size
+            else:
+                self.unchanged += 1
+
+def _read_bytes(path: Path) -> Optional[bytes]:
+    try:
+        return path.read_bytes()
+    except OSError:
+        return None
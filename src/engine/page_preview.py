@@ -0,0 +1,163 @@
+import hashlib
+import json
+import shutil
+import subprocess
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from src.utils.paths import get_typst_exe
+
+@dataclass
+class PreviewPage:
+    """One rendered page: its PNG is stored under the hash of its content."""
+    digest: str
+    width: int
+    height: int
+
+class PagePreviewCache:
+    """
+    Per-page PNG renders of a project for the in-app preview.
+
+    `render` rasterizes master.typ with `typst compile --format png` into
+    .thesis_data/preview/pages/<sha1>.png. Pages are stored by content hash,
+    so a page that looks the same as in the last render keeps its file (and
+    the decoded image the preview pane holds for it): only pages whose
+    content changed have to be reloaded. index.json keeps the page order.
+    With `first`, the pages on screen are rendered ahead of the others.
+    """
+
+    PPI = 96
+
+    def __init__(self, project_path: Path, ppi: int = PPI):
+        self.project_path = project_path
+        self.ppi = ppi
+        self.preview_dir = project_path / ".thesis_data" / "preview"
+        self.pages_dir = self.preview_dir / "pages"
+        self.index_path = self.preview_dir / "index.json"
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._render_lock = threading.Lock() # Renders share the staging directory
+        self._cancelled = False
+
+    def page_path(self, page: PreviewPage) -> Path:
+        return self.pages_dir / f"{page.digest}.png"
+
+    def load_index(self) -> List[PreviewPage]:
+        """Pages of the last render (empty if there is none or it is unreadable)."""
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+            if data.get("ppi") != self.ppi:
+                return []
+            return [PreviewPage(**p) for p in data["pages"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return []
+
+    def render(self, input_file: Optional[Path] = None, first: range = range(0),
+               on_first: Optional[Callable[[List[PreviewPage], List[int]], None]] = None) -> Tuple[List[PreviewPage], List[int]]:
+        """
+        Renders every page of `input_file` (default master.typ). Returns the
+        pages and the indices of those that differ from the previous render.
+        If typst has --pages, the pages in `first` (e.g. the ones on screen)
+        are rendered in a pass of their own and `on_first` gets the previous
+        pages with those replaced, before the rest is rendered.
+        Raises CompilationError if typst fails, CompilationCancelled if
+        `cancel` stopped it.
+        """
+        with self._render_lock:
+            with self._lock:
+                self._cancelled = False
+            return self._render(input_file, first, on_first)
+
+    def _render(self, input_file: Optional[Path], first: range, on_first) -> Tuple[List[PreviewPage], List[int]]:
+        from src.engine.compiler import CompilationError
+        from src.engine.toolchain import get_toolchain
+
+        typst_exe = get_typst_exe()
+        if not typst_exe.exists():
+            raise CompilationError("Typst executable not found.")
+        input_file = input_file or self.project_path / "master.typ"
+        self.pages_dir.mkdir(parents=True, exist_ok=True)
+        previous = self.load_index()
+
+        if first and get_toolchain().probe("typst", typst_exe).features.get("pages", False):
+            # --pages numbers from 1, ranges are inclusive and "n-" runs to the last page
+            rendered = self._rasterize(typst_exe, input_file, f"{first.start + 1}-{first.stop}")
+            if on_first:
+                partial = list(previous)
+                for index in sorted(rendered):
+                    if index > len(partial):
+                        break
+                    partial[index:index + 1] = [rendered[index]]
+                on_first(partial, _changed(previous, partial, rendered))
+            rest = ([f"1-{first.start}"] if first.start else []) + [f"{first.stop + 1}-"]
+            rendered.update(self._rasterize(typst_exe, input_file, ",".join(rest)))
+        else:
+            rendered = self._rasterize(typst_exe, input_file)
+        pages = [rendered[i] for i in sorted(rendered)]
+
+        # Renders no page refers to anymore
+        current = {p.digest for p in pages}
+        for png in self.pages_dir.glob("*.png"):
+            if png.stem not in current:
+                png.unlink(missing_ok=True)
+
+        self.index_path.write_text(json.dumps({"ppi": self.ppi, "pages": [p.__dict__ for p in pages]}), encoding="utf-8")
+        return pages, _changed(previous, pages, range(len(pages)))
+
+    def _rasterize(self, typst_exe: Path, input_file: Path, page_ranges: Optional[str] = None) -> Dict[int, PreviewPage]:
+        """Runs typst once; returns the pages it rendered by index, their PNGs moved to pages_dir."""
+        from src.engine.compiler import AsyncCompiler, CompilationError, CompilationCancelled
+
+        staging = self.preview_dir / "staging"
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+
+        cmd = [str(typst_exe), "compile", str(input_file), str(staging / "{p}.png"),
+               "--format", "png", "--ppi", str(self.ppi), "--root", str(self.project_path)]
+        if page_ranges:
+            cmd += ["--pages", page_ranges]
+        try:
+            with self._lock:
+                if self._cancelled:
+                    raise CompilationCancelled()
+                self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                                 text=True, cwd=self.project_path)
+            _, stderr = self._process.communicate()
+            if self._cancelled:
+                raise CompilationCancelled()
+            if self._process.returncode != 0:
+                raise CompilationError("Errore durante l'anteprima", details=AsyncCompiler.format_errors(stderr))
+        except OSError as e:
+            raise CompilationError(f"OS Error: {e}")
+        finally:
+            with self._lock:
+                self._process = None
+
+        rendered = {}
+        for png in staging.glob("*.png"):
+            data = png.read_bytes()
+            digest = hashlib.sha1(data).hexdigest()
+            target = self.pages_dir / f"{digest}.png"
+            if target.exists():
+                png.unlink()
+            else:
+                png.replace(target)
+            rendered[int(png.stem) - 1] = PreviewPage(digest, *_png_size(data))
+        shutil.rmtree(staging, ignore_errors=True)
+        return rendered
+
+    def cancel(self):
+        """Stops a running render (also between its passes)."""
+        with self._lock:
+            self._cancelled = True
+            if self._process:
+                self._process.terminate()
+
+def _changed(previous: List[PreviewPage], pages: List[PreviewPage], indices: Iterable[int]) -> List[int]:
+    """Which of `indices` differ between the two renders."""
+    return [i for i in sorted(indices) if i < len(pages) and (i >= len(previous) or previous[i].digest != pages[i].digest)]
+
+def _png_size(data: bytes) -> Tuple[int, int]:
+    # Width and height are the first fields of the IHDR chunk
+    return int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
@@ -0,0 +1,170 @@
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+# Never route localhost requests through an HTTP proxy from the environment
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class PandocServer:
+    """
+    Warm `pandoc server` process (pandoc >= 3), one per pandoc executable.
+
+    Conversions are sent as JSON over HTTP instead of forking a process per
+    call. pandoc server only listens on a TCP port (no Unix sockets), so a
+    random free port is used. It runs pandoc in its sandbox: requests
+    cannot read or write files.
+
+    pandoc server has no option to pick the interface, and its HTTP
+    server (Warp) listens on all of them by default: anyone on the
+    network could send it conversions. It is therefore opt-in, with
+    THESISFLOW_PANDOC_SERVER=1 (see `enabled`).
+    """
+
+    ENV_VAR = "THESISFLOW_PANDOC_SERVER"
+    STARTUP_TIMEOUT = 5.0
+    REQUEST_TIMEOUT = 120
+
+    _instances: Dict[str, "PandocServer"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, exe: Path):
+        self.exe = exe
+        self.port: Optional[int] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._supported: Optional[bool] = None
+
+    @classmethod
+    def enabled(cls) -> bool:
+        """Whether server mode was opted into ($THESISFLOW_PANDOC_SERVER=1)."""
+        return os.environ.get(cls.ENV_VAR, "") == "1"
+
+    @classmethod
+    def shared(cls, exe: Path) -> "PandocServer":
+        with cls._instances_lock:
+            server = cls._instances.get(str(exe))
+            if server is None:
+                server = cls(exe)
+                cls._instances[str(exe)] = server
+            return server
+
+    @classmethod
+    def shutdown_all(cls):
+        with cls._instances_lock:
+            servers = list(cls._instances.values())
+            cls._instances.clear()
+        for server in servers:
+            server.stop()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def start(self) -> bool:
+        """Starts the server if needed. Returns False if this pandoc has no server mode."""
+        with self._lock:
+            if self._supported is False:
+                return False
+            if self.is_running():
+                return True
+
+            self.port = _free_port()
+            try:
+                self._process = subprocess.Popen(
+                    [str(self.exe), "server", "--port", str(self.port), "--timeout", str(self.REQUEST_TIMEOUT)],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                )
+            except OSError:
+                self._supported = False
+                return False
+
+            if self._wait_ready():
+                self._supported = True
+                return True
+
+            # A pandoc built without server support treats "server" as an
+            # input file name and fails right away. One that is just slow to
+            # answer is tried again next time.
+            exited = self._process.poll() is not None
+            self._kill()
+            if exited and self._supported is None:
+                self._supported = False
+            return False
+
+    def stop(self):
+        with self._lock:
+            self._kill()
+
+    def convert(self, text: str, options: dict, on_message: Optional[Callable[[str, str], None]] = None) -> str:
+        """
+        Converts text with the given pandoc server options ("from", "to",
+        "citeproc", ...). `on_message` gets the (verbosity, message) of each
+        warning pandoc reports. Raises RuntimeError on conversion errors and
+        ConnectionError if the server can't be reached.
+        """
+        if not self.start():
+            raise ConnectionError("pandoc server not available")
+
+        payload = dict(options, text=text)
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Accept": "application/json"},
+            method="POST"
+        )
+        try:
+            with _opener.open(request, timeout=self.REQUEST_TIMEOUT) as response:
+                result = json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"Pandoc failed: {e.read().decode('utf-8', 'replace')}")
+        except (urllib.error.URLError, OSError) as e:
+            raise ConnectionError(f"pandoc server unreachable: {e}")
+
+        if "error" in result:
+            raise RuntimeError(f"Pandoc failed: {result['error']}")
+
+        if on_message:
+            for message in result.get("messages", []):
+                on_message(message.get("verbosity", "INFO"), message.get("message", ""))
+
+        output = result.get("output", "")
+        # The CLI always terminates the document with a newline; match it
+        return output if output.endswith("\n") else output + "\n"
+
+    def _wait_ready(self) -> bool:
+        deadline = time.monotonic() + self.STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                return False
+            try:
+                with _opener.open(f"{self.url}/version", timeout=0.5):
+                    return True
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.05)
+        return False
+
+    def _kill(self):
+        if self._process and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process = None
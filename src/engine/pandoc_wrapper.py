@@ -1,14 +1,170 @@
-
+import re
 import subprocess
 import shutil
+import threading
+import uuid
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
 from src.utils.paths import get_pandoc_exe
+from src.engine.pandoc_server import PandocServer
+from src.engine.build_metrics import run_child
+
+# Batched conversion separates documents with raw Typst blocks, which pandoc
+# copies verbatim to the output as standalone blocks: `// thesisflow-doc: <nonce> <id>`
+_BATCH_MARKER = "// thesisflow-doc:"
+
+# Constructs whose meaning leaks across documents once they are concatenated
+_REF_DEFINITION_RE = re.compile(r"^ {0,3}\[[^\]]+\]:", re.MULTILINE)  # [label]: url, [^note]: text
+_YAML_OR_SETEXT_RE = re.compile(r"^(?:-{3,}|={3,})\s*$", re.MULTILINE)
+_MACRO_RE = re.compile(r"\\(?:re)?newcommand|\\def\b")
+_CITATION_RE = re.compile(r"(?<![\w.])@[\w:.#$%&+?<>~/-]")
+# @key or @{key}; trailing punctuation is not part of a bare key
+_CITATION_KEY_RE = re.compile(r"(?<![\w.])@(?:\{([^}]+)\}|(\w(?:[\w:.#$%&+?<>~/-]*\w)?))")
+_ATX_HEADING_RE = re.compile(r"^ {0,3}#{1,6}\s+(.*?)\s*#*\s*$", re.MULTILINE)
+_FOOTNOTE_LABEL_RE = re.compile(r"\[\^([^\]\s]+)\]")
+
+# Document id of the bibliography in convert_cited's result
+REFS_ID = "refs"
+
+def has_citations(markdown: str) -> bool:
+    """True if the markdown may contain a pandoc citation (@key)."""
+    return bool(_CITATION_RE.search(markdown))
+
+def citation_keys(markdown: str) -> List[str]:
+    """The keys of the citations in the markdown, in order, repeats included."""
+    return [m.group(1) or m.group(2) for m in _CITATION_KEY_RE.finditer(markdown)]
 
 class PandocWrapper:
-    def __init__(self):
+    INPUT_FORMAT = "markdown+tex_math_dollars"
+    OUTPUT_FORMAT = "typst"
+
+    # Calibrated in-process converters per (executable, version, flags); None
+    # where the fast path can't reproduce that pandoc's output
+    _fast_converters: Dict[tuple, object] = {}
+    _fast_lock = threading.Lock()
+
+    def __init__(self, use_server: bool = False, use_fast_path: bool = False, citeproc: bool = True):
         self.exe = get_pandoc_exe()
         if not self.exe.exists():
              raise FileNotFoundError(f"Pandoc executable not found at {self.exe}")
+        self.use_fast_path = use_fast_path
+        # Without citeproc, citations stay native Typst @key for typst to resolve
+        self.citeproc = citeproc
+        # Gets pandoc's warnings ("[WARNING] ..."), one line at a time, as each conversion ends
+        self.on_output: Optional[Callable[[str], None]] = None
+
+        # Warm `pandoc server` backend, if opted into (see PandocServer) and this pandoc supports it
+        self.server: Optional[PandocServer] = None
+        if use_server and PandocServer.enabled() and self.supports_server():
+            server = PandocServer.shared(self.exe)
+            if server.start():
+                self.server = server
+
+    @classmethod
+    def warm_up_server(cls):
+        """
+        Starts the shared pandoc server and calibrates the fast path ahead of
+        the first conversion (e.g. on project open).
+        """
+        try:
+            cls(use_server=True, use_fast_path=True).get_fast_converter()
+        except FileNotFoundError:
+            pass
+
+    def supports_server(self) -> bool:
+        """Whether this pandoc has server mode (pandoc >= 3.0), from the toolchain registry."""
+        from src.engine.toolchain import get_toolchain
+        return get_toolchain().probe("pandoc", self.exe).features.get("server", False)
+
+    def get_conversion_flags(self) -> List[str]:
+        """Returns the pandoc arguments used for Markdown -> Typst conversion."""
+        flags = [
+            "--from", self.INPUT_FORMAT,
+            "--to", self.OUTPUT_FORMAT,
+        ]
+        if self.citeproc:
+            flags.append("--citeproc") # Pandoc renders citations as text with the project's CSL style
+        return flags
+
+    def get_server_options(self) -> dict:
+        """pandoc server equivalent of get_conversion_flags()."""
+        return {
+            "from": self.INPUT_FORMAT,
+            "to": self.OUTPUT_FORMAT,
+            "citeproc": "--citeproc" in self.get_conversion_flags(),
+        }
+
+    def get_version(self) -> str:
+        """
+        Returns the pandoc version string (e.g. 'pandoc 3.1.11'), from the
+        toolchain registry: probed once per executable and kept across runs.
+        """
+        from src.engine.toolchain import get_toolchain
+        return get_toolchain().probe("pandoc", self.exe).version or "unknown"
+
+    def get_abbreviations(self) -> Optional[List[str]]:
+        """
+        The abbreviations pandoc's smart extension ties to the next word with
+        a non-breaking space: the user data directory's file if there is one,
+        else pandoc's default. None if pandoc can't tell.
+        """
+        from src.engine.toolchain import get_toolchain
+        data_dir = get_toolchain().probe("pandoc", self.exe).data_dir
+        try:
+            if data_dir and (Path(data_dir) / "abbreviations").is_file():
+                return (Path(data_dir) / "abbreviations").read_text(encoding="utf-8").split()
+
+            process = subprocess.run(
+                [str(self.exe), "--print-default-data-file", "abbreviations"],
+                capture_output=True,
+                text=True,
+                encoding='utf-8'
+            )
+        except OSError:
+            return None
+        return process.stdout.split() if process.returncode == 0 else None
+
+    def get_fast_converter(self):
+        """
+        Returns the in-process FastTypstConverter calibrated against this
+        pandoc, or None: the fast path only stands in for the default flags
+        (citeproc without a bibliography renders citations as-is) and only
+        if it reproduces pandoc's output on the calibration document.
+        """
+        from src.engine.md_to_typst import FastTypstConverter
+
+        flags = self.get_conversion_flags()
+        key = (str(self.exe), self.get_version(), tuple(flags))
+        with PandocWrapper._fast_lock:
+            if key not in PandocWrapper._fast_converters:
+                converter = None
+                default_flags = {"--from", self.INPUT_FORMAT, "--to", self.OUTPUT_FORMAT, "--citeproc"}
+                abbreviations = self.get_abbreviations() if set(flags) <= default_flags else None
+                if abbreviations is not None:
+                    try:
+                        converter = FastTypstConverter.calibrate(self.convert_text, abbreviations)
+                    except (RuntimeError, OSError):
+                        pass # e.g. no Typst writer in this pandoc
+                PandocWrapper._fast_converters[key] = converter
+            return PandocWrapper._fast_converters[key]
+
+    def try_fast_convert(self, markdown: str) -> Optional[str]:
+        """
+        Converts in-process when the fast path is enabled and supports the
+        document, returning the Typst pandoc would produce. None means the
+        document has to go through pandoc.
+        """
+        from src.engine.md_to_typst import UnsupportedMarkdown
+
+        if not self.use_fast_path:
+            return None
+        converter = self.get_fast_converter()
+        if converter is None:
+            return None
+        try:
+            return converter.convert(markdown)
+        except UnsupportedMarkdown:
+            return None
 
     def convert_markdown_to_typst(self, input_text: str, output_path: Path):
         """
@@ -17,28 +173,172 @@ class PandocWrapper:
         """
         # Ensure output directory exists
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        cmd = [
-            str(self.exe),
-            "--from", "markdown+tex_math_dollars",
-            "--to", "typst",
-            "--citeproc", # Basic citation processing if needed here, usually handled by typst hayagura but pandoc can do it too.
-                          # Wait, SDD says "Pandoc transforms this...". 
-                          # Actually for Typst ecosystem, standard BibTeX is often handled by Typst packages (hayagura).
-                          # But let's stick to the prompt's implication: Pandoc generates Typst code.
-            "--output", str(output_path)
-        ]
+
+        if self.server is not None:
+            try:
+                output_path.write_text(self.server.convert(input_text, self.get_server_options(), self._server_message), encoding="utf-8")
+                return
+            except ConnectionError:
+                pass # Server went away: fall back to a one-off process
+
+        cmd = [str(self.exe)] + self.get_conversion_flags() + ["--output", str(output_path)]
 
         # In a real app we might want to feed input via stdin to avoid temp files for input,
-        
-        process = subprocess.run(
+
+        process = run_child(
             cmd,
             input=input_text,
             text=True,
             capture_output=True,
             encoding='utf-8'
         )
+        self._report(process.stderr)
 
         if process.returncode != 0:
             raise RuntimeError(f"Pandoc failed: {process.stderr}")
 
+    def _report(self, stderr: str):
+        """Passes the lines pandoc printed on stderr to on_output."""
+        if self.on_output and stderr:
+            for line in stderr.splitlines():
+                if line.strip():
+                    self.on_output(line.strip())
+
+    def _server_message(self, verbosity: str, message: str):
+        # Same form as the CLI's messages
+        self._report(f"[{verbosity}] {message}")
+
+    def convert_batch(self, documents: List[Tuple[str, str]]) -> Optional[Dict[str, str]]:
+        """
+        Converts several (doc_id, markdown) documents with a single pandoc
+        process and returns {doc_id: typst}. Each result matches what
+        convert_markdown_to_typst would write for that document alone, as
+        long as the documents passed `select_batchable`.
+        Returns None if the delimiters did not survive the conversion.
+        """
+        nonce = uuid.uuid4().hex[:12]
+        parts = []
+        for doc_id, markdown in documents:
+            parts.append(f"```{{=typst}}\n{_BATCH_MARKER} {nonce} {doc_id}\n```")
+            parts.append(markdown)
+        combined = "\n\n".join(parts) + "\n"
+
+        return self.split_batch_output(self.convert_text(combined), [doc_id for doc_id, _ in documents], nonce)
+
+    def convert_text(self, input_text: str) -> str:
+        """Converts Markdown to Typst and returns it, via the server when available."""
+        if self.server is not None:
+            try:
+                return self.server.convert(input_text, self.get_server_options(), self._server_message)
+            except ConnectionError:
+                pass
+
+        cmd = [str(self.exe)] + self.get_conversion_flags()
+        process = run_child(
+            cmd,
+            input=input_text,
+            text=True,
+            capture_output=True,
+            encoding='utf-8'
+        )
+        self._report(process.stderr)
+
+        if process.returncode != 0:
+            raise RuntimeError(f"Pandoc failed: {process.stderr}")
+        return process.stdout
+
+    def convert_cited(self, documents: List[Tuple[str, str]], bibliography: Path, csl: Optional[Path] = None) -> Dict[str, str]:
+        """
+        Resolves the citations of several (doc_id, markdown) documents with
+        one citeproc pass: the documents are converted as a single pandoc
+        document with `--bibliography` (and `--csl`), so the bibliography
+        and style are parsed once and numbering runs across all of them.
+        Returns {doc_id: typst}, plus the rendered bibliography under
+        REFS_ID. Footnote labels are made unique per document first; other
+        constructs behave as in one long document (e.g. heading identifiers
+        are de-duplicated across documents). Raises RuntimeError if pandoc
+        fails or the delimiters don't survive the conversion.
+        """
+        nonce = uuid.uuid4().hex[:12]
+        parts = []
+        for doc_id, markdown in documents:
+            parts.append(f"```{{=typst}}\n{_BATCH_MARKER} {nonce} {doc_id}\n```")
+            parts.append(_FOOTNOTE_LABEL_RE.sub(lambda m: f"[^{doc_id}-{m.group(1)}]", markdown))
+        parts.append(f"```{{=typst}}\n{_BATCH_MARKER} {nonce} {REFS_ID}\n```")
+        parts.append("::: {#refs}\n:::")
+        combined = "\n\n".join(parts) + "\n"
+
+        # The Typst writer keeps citations as native @key unless told to use citeproc's text
+        flags = [f"{f}-citations" if f == self.OUTPUT_FORMAT else f for f in self.get_conversion_flags()]
+        # One-off process: the server can't read the bibliography and style files
+        cmd = [str(self.exe)] + flags + ["--bibliography", str(bibliography)]
+        if csl is not None:
+            cmd += ["--csl", str(csl)]
+        process = run_child(cmd, input=combined, text=True, capture_output=True, encoding='utf-8')
+        self._report(process.stderr)
+        if process.returncode != 0:
+            raise RuntimeError(f"Pandoc failed: {process.stderr}")
+
+        results = self.split_batch_output(process.stdout, [doc_id for doc_id, _ in documents] + [REFS_ID], nonce)
+        if results is None:
+            raise RuntimeError("Pandoc failed: citation document delimiters were lost (unclosed code block?)")
+        return results
+
+    @staticmethod
+    def split_batch_output(output: str, doc_ids: List[str], nonce: str) -> Optional[Dict[str, str]]:
+        """Splits batched pandoc output back into per-document Typst."""
+        # A marker swallowed by an unclosed code fence is rendered as code,
+        # right below the literal "```{=typst}" line: don't split there
+        marker_re = re.compile(rf"(?<!```{{=typst}}\n)^{re.escape(_BATCH_MARKER)} {nonce} (\S+)$", re.MULTILINE)
+        pieces = marker_re.split(output)
+        # pieces = [preamble, id1, body1, id2, body2, ...]
+        if pieces[0].strip() or pieces[1::2] != doc_ids:
+            return None
+
+        results = {}
+        for doc_id, body in zip(pieces[1::2], pieces[2::2]):
+            # Same trailing newline as the pandoc CLI writes for a single document
+            results[doc_id] = body.strip("\n") + "\n"
+        return results
+
+    def select_batchable(self, documents: List[Tuple[str, str]]) -> List[bool]:
+        """
+        Flags the documents that can share a pandoc process without changing
+        their output: no reference/footnote definitions, YAML blocks or
+        setext headings, no heading identifiers shared with an earlier
+        document (pandoc would de-duplicate them), and no citations while
+        citeproc runs per document.
+        """
+        if any(_MACRO_RE.search(md) for _, md in documents):
+            # LaTeX macros defined in one document would apply to the next ones
+            return [False] * len(documents)
+
+        citeproc = "--citeproc" in self.get_conversion_flags()
+        seen_ids = set()
+        flags = []
+        for _, markdown in documents:
+            ok = not (_REF_DEFINITION_RE.search(markdown) or _YAML_OR_SETEXT_RE.search(markdown))
+            if ok and citeproc and _CITATION_RE.search(markdown):
+                ok = False
+
+            ids = {self._heading_id(h) for h in _ATX_HEADING_RE.findall(markdown)}
+            if ok and ids & seen_ids:
+                ok = False
+            if ok:
+                seen_ids |= ids
+            flags.append(ok)
+        return flags
+
+    @staticmethod
+    def _heading_id(heading: str) -> str:
+        """Approximates pandoc's auto identifier, ignoring de-duplication suffixes."""
+        explicit = re.search(r"\{[^}]*#([\w:.-]+)[^}]*\}\s*$", heading)
+        if explicit:
+            return explicit.group(1)
+        text = re.sub(r"[*_`\[\]()]", "", heading).lower()
+        text = "".join(c for c in text if c.isalnum() or c in " _-.")
+        text = re.sub(r"\s+", "-", text.strip())
+        text = re.sub(r"^[^a-z]+", "", text)
+        text = re.sub(r"-\d+$", "", text)
+        return text or "section"
+
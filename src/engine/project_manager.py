@@ -8,6 +8,7 @@ from src.engine.models import ProjectManifest, Chapter, Paragraph
 from src.utils.paths import get_templates_dir
 
 from src.engine.citation_service import BibliographyService
+from src.engine.compile_scheduler import CompileScheduler
 
 class ProjectManager:
     def __init__(self, projects_root: Path = None):
@@ -21,6 +22,10 @@ class ProjectManager:
         self.current_project_path: Optional[Path] = None
         self.manifest: Optional[ProjectManifest] = None
         self.bib_service = BibliographyService()
+        self._build_cache = None
+        self.compile_scheduler = CompileScheduler()
+        # Builds go through a running build daemon (see run_build)
+        self.use_daemon = True
 
     def list_projects(self) -> List[Path]:
         """Returns a list of valid project directories."""
@@ -34,12 +39,10 @@ class ProjectManager:
         return projects
 
     def check_system_health(self) -> List[str]:
-        """Checks for required external tools."""
-        from src.utils.paths import get_pandoc_exe, get_typst_exe
-        missing = []
-        if not get_pandoc_exe().exists(): missing.append("Pandoc")
-        if not get_typst_exe().exists(): missing.append("Typst")
-        return missing
+        """Checks for required external tools (resolving them if the toolchain registry hasn't yet)."""
+        from src.engine.toolchain import get_toolchain
+        toolchain = get_toolchain()
+        return [label for name, label in (("pandoc", "Pandoc"), ("typst", "Typst")) if not toolchain.get(name).exists]
 
     def get_citation_keys(self) -> List[str]:
         """Extracts citation keys from the project's bibliography."""
@@ -509,83 +512,560 @@ class ProjectManager:
                 zf.extractall(new_project_path)
                 return new_project_path
 
-    def compile_project_async(self, on_success: Callable[[Path], None], on_error: Callable[[Exception], None], on_progress: Callable[[str], None] = None):
-        """Compiles the project asynchronously, including MD->Typst conversion."""
+    def compile_project_async(self, on_success: Callable[[Path], None], on_error: Callable[[Exception], None], on_progress: Callable[[str], None] = None, jobs: Optional[int] = None, use_watch: bool = True, on_state: Callable = None, on_metrics: Callable = None,
+                              on_output: Callable[[str], None] = None):
+        """
+        Compiles the project asynchronously, including MD->Typst conversion.
+        `jobs` bounds the number of concurrent pandoc processes (default: CPU count).
+        With `use_watch` the PDF is produced by the project's persistent
+        `typst watch` process instead of a fresh `typst compile`.
+        Builds go through the compile scheduler: a request made while one is
+        running cancels it and only the latest one is built. `on_state` gets
+        the returned CompileJob on every state change.
+        Each stage is timed: `on_metrics` gets every StageMetrics as it ends,
+        the job keeps the BuildMetrics (job.metrics) and the build is appended
+        to .thesis_data/build_metrics.jsonl. `on_output` gets the output of
+        pandoc and typst line by line, as they print it (from worker threads).
+        """
         if not self.current_project_path or not self.manifest:
              on_error(RuntimeError("No project loaded."))
-             return
+             return None
 
+        # We need to run the whole pipeline in a thread, 
+        # because conversion is also blocking/slow.
+        def _pipeline(job):
+            return self.run_build(job, on_progress=on_progress, jobs=jobs, use_watch=use_watch, on_metrics=on_metrics, on_output=on_output)
+
+        return self.compile_scheduler.submit(self.current_project_path, _pipeline, on_success, on_error, on_state)
+
+    def compile_draft_async(self, chapter_ids: List[str], on_success: Callable[[Path], None], on_error: Callable[[Exception], None],
+                            on_progress: Callable[[str], None] = None, draft=None, on_state: Callable = None, on_metrics: Callable = None,
+                            on_output: Callable[[str], None] = None):
+        """
+        Like compile_project_async, but builds a draft of only `chapter_ids`
+        into <project>.draft.pdf (see build_project). `draft` is a
+        DraftOptions; by default the front page and bibliography are left out.
+        """
+        from src.engine.draft_master import DraftOptions
+
+        if not self.current_project_path or not self.manifest:
+             on_error(RuntimeError("No project loaded."))
+             return None
+
+        draft = draft or DraftOptions()
+
+        def _pipeline(job):
+            return self.run_build(job, on_progress=on_progress, on_metrics=on_metrics, chapter_ids=chapter_ids, draft=draft, on_output=on_output)
+
+        return self.compile_scheduler.submit(self.current_project_path, _pipeline, on_success, on_error, on_state)
+
+    def run_build(self, job=None, **options) -> Path:
+        """
+        Runs build_project(job, **options) in the local build daemon when one
+        is running (and `use_daemon`), so the build shares its warm
+        processes and caches with other windows and CLI runs; in-process
+        otherwise.
+        """
+        from src.engine.build_daemon import BuildDaemonClient
+
+        client = BuildDaemonClient.connect() if self.use_daemon else None
+        if client is None:
+            return self.build_project(job, **options)
+        try:
+            return client.build(self.current_project_path, job, **options)
+        finally:
+            # The daemon rewrote the outputs our cache index may describe
+            self._build_cache = None
+
+    def build_project(self, job=None, on_progress: Callable = None, jobs: Optional[int] = None, use_watch: bool = False,
+                      on_metrics: Callable = None, incremental: bool = True, chapter_ids: Optional[List[str]] = None,
+                      draft=None, asset_quality: Optional[str] = None, on_output: Callable[[str], None] = None) -> Path:
+        """
+        Runs the whole build (MD->Typst conversion, then typst) in the
+        calling thread and returns the PDF path. This is the pipeline behind
+        compile_project_async and the headless CLI (main_cli).
+        `job` is the CompileJob used for cancellation; without `incremental`
+        the build cache is not read; `chapter_ids` limits the build to those
+        chapters.
+        With `draft` (a DraftOptions) the chapters are compiled through a
+        temporary master generated from master.typ (.draft_master.typ,
+        including draft_body.typ) into <project>.draft.pdf, leaving
+        compiled_body.typ and the full PDF alone. Drafts share the
+        conversion cache with full builds and never use typst watch.
+        `asset_quality` names the QUALITY_PRESETS entry images are optimized
+        with (default "final", or the draft's); "" embeds the originals.
+        `on_output` gets the tools' output lines, tagged [pandoc] or [typst].
+        """
+        if not self.current_project_path or not self.manifest:
+            raise RuntimeError("No project loaded.")
+
+        from src.engine.compile_scheduler import CompileJob
+        from src.engine.build_metrics import BuildMetrics
+
+        project_path = self.current_project_path
+        job = job or CompileJob(project_path)
+        metrics = BuildMetrics(on_stage=on_metrics)
+        job.metrics = metrics
+        status = "error"
+        try:
+            if asset_quality is None:
+                asset_quality = draft.asset_quality if draft else "final"
+            from src.engine.asset_optimizer import QUALITY_PRESETS
+            if asset_quality and asset_quality not in QUALITY_PRESETS:
+                raise ValueError(f"Unknown asset quality: {asset_quality}")
+            pdf_path = self._run_build_stages(job, metrics, on_progress, jobs, use_watch, incremental, chapter_ids, draft, asset_quality, on_output)
+            status = "ok"
+            return pdf_path
+        finally:
+            if job.is_cancelled(): status = "cancelled"
+            try:
+                metrics.append_to_log(project_path / ".thesis_data", status)
+            except OSError:
+                pass # Metrics must never fail the build
+
+    def _run_build_stages(self, job, metrics, on_progress, jobs, use_watch, incremental, chapter_ids, draft=None, asset_quality=None, on_output=None) -> Path:
+        import time
         from src.engine.compiler import AsyncCompiler, CompilationError
         from src.engine.pandoc_wrapper import PandocWrapper
+        from src.engine.draft_master import DRAFT_MASTER_NAME, DRAFT_BODY_NAME, make_draft_master
+        from src.engine.asset_optimizer import AssetOptimizer, QUALITY_PRESETS
+        from src.engine.output_writer import OutputWriter
+
+        project_path = self.current_project_path
+        if on_progress: on_progress("Preparazione...", 0.1)
         
-        # We need to run the whole pipeline in a thread, 
-        # because conversion is also blocking/slow.
-        import threading
+        # 1. Conversion Phase
+        # In the "typst" citation mode citations stay native and typst resolves them
+        pandoc = PandocWrapper(use_server=True, use_fast_path=True, citeproc=self.manifest.citation_mode != "typst")
+        if on_output:
+            pandoc.on_output = lambda line: on_output(f"[pandoc] {line}")
+        temp_dir = project_path / ".thesis_data" / "temp"
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        
+        compiled_body_path = temp_dir / (DRAFT_BODY_NAME if draft else "compiled_body.typ")
+        # Every generated file is only rewritten when it changes
+        writer = OutputWriter()
+        
+        # Logic to convert chapters
+        # We build a single body file or multiple files?
+        # Let's build individual typst files and include them.
+        # Chapters are converted in parallel; includes keep manifest order.
+        # A superseded build stops at the next chapter.
+        with metrics.measure("conversion", track_children=True):
+            includes = self._convert_chapters(pandoc, temp_dir, on_progress, jobs, cancel_event=job.cancel_event, metrics=metrics,
+                                              use_cache=incremental, chapter_ids=chapter_ids,
+                                              assets=AssetOptimizer(project_path, QUALITY_PRESETS[asset_quality], jobs) if asset_quality else None,
+                                              with_bibliography=not draft or draft.bibliography, writer=writer)
+        job.check_cancelled()
+
+        # Write compiled_body.typ
+        with metrics.measure("write", track_children=True) as m:
+            written_before = writer.bytes_written
+            writer.write(compiled_body_path, "\n\n".join(includes))
+            self._write_metadata(temp_dir, writer)
+            if draft:
+                master_path = project_path / "master.typ"
+                if not master_path.exists():
+                    raise CompilationError("master.typ not found in project.")
+                try:
+                    draft_master = make_draft_master(master_path.read_text(encoding="utf-8"), draft)
+                except ValueError as e:
+                    raise CompilationError("Impossibile generare la bozza", details=str(e))
+                writer.write(project_path / DRAFT_MASTER_NAME, draft_master)
+            m.bytes_written = writer.bytes_written - written_before
+            m.extra["files_rewritten"] = writer.rewritten
+            m.extra["files_unchanged"] = writer.unchanged
+        written_at = time.time()
+        
+        if on_progress: on_progress("Compilazione PDF...", 0.7)
         
-        def _pipeline():
+        # 2. Compilation Phase
+        # The pipeline already runs in a worker thread, so the compiler is
+        # called synchronously. compile_sync runs typst, or waits on the
+        # persistent typst watch process.
+        from src.engine.toolchain import get_toolchain
+        use_watch = use_watch and not draft and get_toolchain().get("typst").features.get("watch", True)
+        compiler = AsyncCompiler(use_watch=use_watch,
+                                 on_output=(lambda line: on_output(f"[typst] {line}")) if on_output else None)
+        # Cancelling the job terminates typst
+        job.add_cancel_callback(compiler.cancel)
+        job.check_cancelled()
+        
+        with metrics.measure("typst", track_children=True) as m:
+            m.extra["watch"] = compiler.use_watch
+            if draft:
+                m.extra["draft"] = True
+                pdf_path = compiler.compile_sync(project_path, written_at, input_file=project_path / DRAFT_MASTER_NAME,
+                                                 output_file=project_path / f"{project_path.name}.draft.pdf")
+            else:
+                # Nothing generated changed: an idle typst watch already has this PDF
+                pdf_path = compiler.settled_output(project_path) if compiler.use_watch and not writer.rewritten else None
+                m.extra["reused"] = pdf_path is not None
+                if pdf_path is None:
+                    pdf_path = compiler.compile_sync(project_path, written_at)
+            m.bytes_written = pdf_path.stat().st_size if pdf_path.exists() else 0
+        
+        if on_progress: on_progress("Completato!", 1.0)
+        return pdf_path
+
+    def get_build_cache(self):
+        """Returns the conversion cache of the current project (.thesis_data/cache)."""
+        from src.engine.build_cache import BuildCache
+        if not self.current_project_path:
+            raise RuntimeError("No project loaded.")
+
+        cache_dir = self.current_project_path / ".thesis_data" / "cache"
+        if self._build_cache is None or self._build_cache.cache_dir != cache_dir:
+            self._build_cache = BuildCache(cache_dir)
+        else:
+            # Another process (daemon, CLI, other window) may have built since
+            self._build_cache.reload_if_changed()
+        return self._build_cache
+
+    def _convert_chapters(self, pandoc, temp_dir: Path, on_progress: Callable = None, jobs: Optional[int] = None, batch: bool = True, cancel_event=None, metrics=None,
+                          use_cache: bool = True, chapter_ids: Optional[List[str]] = None, assets=None,
+                          with_bibliography: bool = True, writer=None) -> List[str]:
+        """
+        Converts every chapter to <id>.typ on a bounded worker pool.
+        Cached chapters are reused as-is, and chapters the in-process fast
+        path supports (see PandocWrapper.try_fast_convert) skip pandoc. With
+        `batch`, the remaining chapters that can safely share a pandoc process
+        are converted in one invocation per worker instead of one process each.
+        Returns the #include lines in manifest order. The first chapter that
+        fails cancels the pending ones and is raised as ChapterConversionError.
+        Setting `cancel_event` stops the conversion before the next chapter.
+        Markdown resolution, cache restores and pandoc runs are timed per
+        chapter into `metrics` (a BuildMetrics). Without `use_cache` every
+        chapter is converted again; `chapter_ids` restricts the conversion
+        (and the returned includes) to those chapters. With `assets` (an
+        AssetOptimizer) the images of the chapters are prepared first, as
+        one "assets" stage, and the chapters reference the optimized variants.
+        When the project has a bibliography, chapters with citations are
+        converted together in one citeproc pass (see _convert_cited_chapters)
+        and, with `with_bibliography`, bibliography.typ is included last. In
+        the "typst" citation mode bibliography.typ holds the #bibliography
+        call instead and is included whenever a chapter cites something.
+        Outputs go through `writer` (an OutputWriter), so chapters whose
+        Typst didn't change are not rewritten.
+        """
+        import contextvars
+        import os
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        from src.engine.compiler import ChapterConversionError
+        from src.engine.build_metrics import BuildMetrics, StageMetrics
+        from src.engine.output_writer import OutputWriter
+        from src.engine.pandoc_wrapper import has_citations
+
+        metrics = metrics or BuildMetrics()
+        writer = writer or OutputWriter()
+
+        chapters = list(self.manifest.chapters)
+        if chapter_ids is not None:
+            unknown = set(chapter_ids) - {c.id for c in chapters}
+            if unknown:
+                raise ValueError(f"Unknown chapter ids: {', '.join(sorted(unknown))}")
+            chapters = [c for c in chapters if c.id in chapter_ids]
+        if not chapters:
+            return []
+
+        cache = self.get_build_cache()
+        progress_lock = threading.Lock()
+        done = 0
+
+        def _report(chapter: Chapter):
+            nonlocal done
+            with progress_lock:
+                done += 1
+                if on_progress: on_progress(f"Convertito {chapter.title} ({done}/{len(chapters)})", 0.1 + (0.5 * done / len(chapters)))
+
+        citation_files = self._citation_files()
+        # Citation numbering runs over the whole thesis, also when only some chapters are built
+        sources = []
+        for chapter in (self.manifest.chapters if citation_files else chapters):
+            with metrics.measure("resolve", chapter.title):
+                sources.append((chapter, self._resolve_chapter_markdown(chapter)))
+
+        if assets is not None:
+            with metrics.measure("assets", assets.quality.name) as m:
+                assets.prepare(ref for _, markdown in sources for ref in assets.find_references(markdown))
+                m.extra["variants_written"] = assets.written
+            sources = [(chapter, assets.rewrite(markdown)) for chapter, markdown in sources]
+
+        includes = [f'#include "{c.id}.typ"' for c in chapters]
+        if self.manifest.citation_mode == "typst" and self._has_bibliography() and any(has_citations(md) for _, md in sources):
+            # Native citations need the #bibliography call, also in drafts (which hide it)
+            self._write_native_bibliography(temp_dir, writer)
+            includes.append('#include "bibliography.typ"')
+        if citation_files:
+            sources, has_bibliography = self._convert_cited_chapters(pandoc, cache, temp_dir, sources, chapters, citation_files,
+                                                                      metrics, use_cache, _report, writer)
+            if has_bibliography and with_bibliography:
+                includes.append('#include "bibliography.typ"')
+
+        # 1. Cache lookups, no pandoc involved
+        pending = []
+        for chapter, markdown in sources:
+            key = cache.make_key(markdown, pandoc.get_version(), pandoc.get_conversion_flags())
+            typ_path = temp_dir / f"{chapter.id}.typ"
+            start = time.perf_counter()
+            if use_cache and self._restore_cached(cache, chapter, key, typ_path, writer):
+                metrics.add(StageMetrics("cache", chapter.title, wall_s=time.perf_counter() - start))
+                _report(chapter)
+            else:
+                pending.append((chapter, markdown, key))
+
+        # 2. Plain-prose chapters are converted in-process, without pandoc
+        remaining = []
+        for chapter, markdown, key in pending:
+            start = time.perf_counter()
+            typst = pandoc.try_fast_convert(markdown)
+            if typst is None:
+                remaining.append((chapter, markdown, key))
+                continue
+            self._store_converted(cache, chapter, key, temp_dir / f"{chapter.id}.typ", writer, typst)
+            metrics.add(StageMetrics("fast", chapter.title, wall_s=time.perf_counter() - start,
+                                     bytes_written=len(typst.encode("utf-8"))))
+            _report(chapter)
+        pending = remaining
+
+        if not pending:
+            cache.save()
+            return includes
+
+        # 3. Group the misses: one batch per worker for chapters that can share a process
+        workers = max(1, min(jobs or os.cpu_count() or 1, len(pending)))
+        tasks = [[item] for item in pending]
+        if batch and len(pending) > 1:
+            flags = pandoc.select_batchable([(c.id, md) for c, md, _ in pending])
+            batchable = [item for item, ok in zip(pending, flags) if ok]
+            size = max(1, -(-len(batchable) // workers))
+            tasks = [batchable[i:i + size] for i in range(0, len(batchable), size)]
+            tasks += [[item] for item, ok in zip(pending, flags) if not ok]
+
+        abort = threading.Event()
+
+        def _stopped() -> bool:
+            return abort.is_set() or (cancel_event is not None and cancel_event.is_set())
+
+        def _convert(task):
+            if _stopped(): return
+            if len(task) > 1:
+                with metrics.measure("pandoc", ", ".join(c.title for c, _, _ in task), track_children=True) as m:
+                    m.extra["batch"] = len(task)
+                    try:
+                        outputs = pandoc.convert_batch([(c.id, md) for c, md, _ in task])
+                    except RuntimeError:
+                        outputs = None # Convert one by one below to find the broken chapter
+                    if outputs is not None:
+                        for chapter, _, key in task:
+                            self._store_converted(cache, chapter, key, temp_dir / f"{chapter.id}.typ", writer, outputs[chapter.id])
+                            m.bytes_written += len(outputs[chapter.id].encode("utf-8"))
+                if outputs is not None:
+                    for chapter, _, _ in task:
+                        _report(chapter)
+                    return
+
+            for chapter, markdown, key in task:
+                if _stopped(): return
+                typ_path = temp_dir / f"{chapter.id}.typ"
+                with metrics.measure("pandoc", chapter.title, track_children=True) as m:
+                    staged = writer.staging_path(typ_path)
+                    try:
+                        pandoc.convert_markdown_to_typst(markdown, staged)
+                    except Exception as e:
+                        staged.unlink(missing_ok=True)
+                        raise ChapterConversionError(chapter, e) from e
+                    m.bytes_written = staged.stat().st_size
+                    self._store_converted(cache, chapter, key, typ_path, writer, staged=staged)
+                _report(chapter)
+
+        # 4. Run the tasks
+        with ThreadPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            # In a copy of this context, so pandoc runs count towards the enclosing stages
+            futures = [pool.submit(contextvars.copy_context().run, _convert, task) for task in tasks]
             try:
-                if on_progress: on_progress("Preparazione...", 0.1)
-                
-                # 1. Conversion Phase
-                pandoc = PandocWrapper()
-                temp_dir = self.current_project_path / ".thesis_data" / "temp"
-                temp_dir.mkdir(parents=True, exist_ok=True)
-                
-                compiled_body_path = temp_dir / "compiled_body.typ"
-                
-                # Logic to convert chapters
-                # We build a single body file or multiple files?
-                # Let's build individual typst files and include them.
-                
-                includes = []
-                
-                total_chapters = len(self.manifest.chapters)
-                
-                for i, chapter in enumerate(self.manifest.chapters):
-                    if on_progress: on_progress(f"Conversione {chapter.title}...", 0.1 + (0.5 * (i / total_chapters)))
-                    
-                    # 1.1 Read and Resolve Chapter Content
-                    full_md = self._resolve_chapter_markdown(chapter)
-                    
-                    # 1.2 Convert to Typst
-                    typ_filename = f"{chapter.id}.typ"
-                    typ_path = temp_dir / typ_filename
-                    pandoc.convert_markdown_to_typst(full_md, typ_path)
-                    
-                    # 1.3 Add to master body
-                    includes.append(f'#include "{typ_filename}"')
-                
-                # Write compiled_body.typ
-                compiled_body_path.write_text("\n\n".join(includes), encoding="utf-8")
-                
-                if on_progress: on_progress("Compilazione PDF...", 0.7)
-                
-                # 2. Compilation Phase
-                # Use AsyncCompiler synchronously inside this thread?
-                # AsyncCompiler.compile is async. 
-                # We can use _compile_sync if we had access, or just use subprocess directly here since we are ALREADY in a thread.
-                # Reuse AsyncCompiler logic? 
-                # Let's instantiate it and call its internal sync method if possible or just replicate.
-                # Better: AsyncCompiler is designed to be called from UI. 
-                # ProjectManager._pipeline IS the async worker here.
-                # So let's re-implement the call or make AsyncCompiler have a sync method.
-                
-                compiler = AsyncCompiler()
-                # We can't call compile() because it spawns ANOTHER thread and returns.
-                # We want to wait.
-                # Let's use compiler._compile_sync (it's protected but we are internal friend-ish).
-                # Or make it public.
-                # Let's assume we can call _compile_sync.
-                
-                pdf_path = compiler._compile_sync(self.current_project_path)
-                
-                if on_progress: on_progress("Completato!", 1.0)
-                on_success(pdf_path)
-                
-            except Exception as e:
-                on_error(e)
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                # Stop the other workers: queued chapters are dropped, running ones bail out early
+                abort.set()
+                for f in futures: f.cancel()
+                raise
+            finally:
+                cache.save()
+
+        return includes
+
+    def _citation_files(self):
+        """
+        (references.bib, CSL style or None) when the build resolves citations
+        with citeproc: the project has a non-empty bibliography and its
+        citation mode is "unified". None otherwise.
+        """
+        if self.manifest.citation_mode != "unified" or not self._has_bibliography():
+            return None
+        return self.current_project_path / "references.bib", self._citation_style_file()
+
+    def _has_bibliography(self) -> bool:
+        """Whether references.bib has any entry."""
+        try:
+            return "@" in (self.current_project_path / "references.bib").read_text(encoding="utf-8")
+        except OSError:
+            return False
+
+    def _citation_style_file(self) -> Optional[Path]:
+        """The CSL file of manifest.citation_style (project root first, then the bundled styles)."""
+        from src.utils.paths import get_resource_path
+        style = self.manifest.citation_style
+        if style and style != "Default":
+            for candidate in (self.current_project_path / style, get_resource_path("templates/styles") / style):
+                if candidate.is_file():
+                    return candidate
+        return None
+
+    def _write_metadata(self, temp_dir: Path, writer):
+        """
+        Writes metadata.typ, which the templates import: the manifest's
+        front page fields. The bibliography is in bibliography.typ (see
+        _write_native_bibliography).
+        """
+        fields = {
+            "title": self.manifest.title,
+            "author": self.manifest.author,
+            "candidate": self.manifest.candidate,
+            "supervisor": self.manifest.supervisor,
+            "year": self.manifest.year,
+        }
+        lines = ["// Generated at build time from the project settings"]
+        lines += [f"#let {name} = {_typst_string(value or '')}" for name, value in fields.items()]
+        writer.write(temp_dir / "metadata.typ", "\n".join(lines) + "\n")
+
+    def _write_native_bibliography(self, temp_dir: Path, writer):
+        """
+        Writes bibliography.typ for the "typst" citation mode: the
+        #bibliography call that native @key citations resolve against,
+        with references.bib and the style. The CSL is copied next to it,
+        since typst only reads files under the project root.
+        """
+        style = '"ieee"' # Typst's own default style
+        csl = self._citation_style_file()
+        if csl:
+            writer.write(temp_dir / "citation_style.csl", csl.read_text(encoding="utf-8"))
+            style = f'"/{(temp_dir / "citation_style.csl").relative_to(self.current_project_path).as_posix()}"'
+        writer.write(temp_dir / "bibliography.typ",
+                     f'#bibliography("/references.bib", title: "Bibliografia", style: {style})\n')
 
-        threading.Thread(target=_pipeline, daemon=True).start()
+    def _convert_cited_chapters(self, pandoc, cache, temp_dir: Path, sources, chapters, citation_files, metrics, use_cache, on_done, writer):
+        """
+        Converts the chapters of `sources` that cite something with citeproc
+        (PandocWrapper.convert_cited), so numbering is consistent across
+        chapters. Each chapter's output is cached on its markdown, the
+        bibliography, the style and the citations it depends on: the order
+        in which earlier chapters first cite entries, the citation right
+        before it and the set of every cited entry. An edit that leaves the
+        citations alone only misses the edited chapter. The misses then go
+        through one pass where every other citing chapter is replaced by a
+        stand-in citing the same keys in the same order, so the numbering
+        and the bibliography still cover the whole thesis.
+        Writes the outputs of the citing chapters among `chapters`, and
+        bibliography.typ. Returns the (chapter, markdown) pairs of `chapters`
+        left to convert and whether there is a bibliography to include.
+        """
+        import time
+        from src.engine.build_metrics import StageMetrics
+        from src.engine.compiler import CompilationError
+        from src.engine.pandoc_wrapper import REFS_ID, citation_keys, has_citations
+
+        selected = {c.id for c in chapters}
+        cited = [(c, md, citation_keys(md)) for c, md in sources if has_citations(md)]
+        rest = [(c, md) for c, md in sources if c.id in selected and not has_citations(md)]
+        if not cited:
+            return rest, False
+
+        bib, csl = citation_files
+        context = bib.read_text(encoding="utf-8") + "\0" + (csl.read_text(encoding="utf-8") if csl else "")
+        version, flags = pandoc.get_version(), pandoc.get_conversion_flags() + ["--bibliography", "--csl"]
+        order = list(dict.fromkeys(k for _, _, keys in cited for k in keys))
+        # Disambiguation (e.g. "2020a") can depend on any cited entry
+        everything = " ".join(sorted(order))
+
+        plan = []  # (chapter, markdown, keys, cache key)
+        first_cited = {}  # Keys in order of first citation
+        previous = ""
+        for chapter, markdown, keys in cited:
+            deps = "\0".join([chapter.id, markdown, context, " ".join(first_cited), previous, everything])
+            plan.append((chapter, markdown, keys, cache.make_key(deps, version, flags)))
+            first_cited.update(dict.fromkeys(keys))
+            previous = keys[-1] if keys else previous
+        refs_key = cache.make_key("\0".join([REFS_ID, context, " ".join(order)]), version, flags)
+
+        missed = set()
+        for chapter, _, _, key in plan:
+            if chapter.id not in selected:
+                continue
+            start = time.perf_counter()
+            if use_cache and self._restore_cached(cache, chapter, key, temp_dir / f"{chapter.id}.typ", writer):
+                metrics.add(StageMetrics("cache", chapter.title, wall_s=time.perf_counter() - start))
+                on_done(chapter)
+            else:
+                missed.add(chapter.id)
+
+        refs = cache.get(refs_key) if use_cache else None
+        if missed or refs is None:
+            documents = []
+            for chapter, markdown, keys, _ in plan:
+                if chapter.id in missed:
+                    documents.append((chapter.id, markdown))
+                elif keys:
+                    documents.append((f"{chapter.id}-citations", " ".join(f"[@{{{k}}}]" for k in keys)))
+            with metrics.measure("citeproc", f"{len(missed)} capitoli", track_children=True) as m:
+                m.extra["chapters"] = len(missed)
+                try:
+                    outputs = pandoc.convert_cited(documents, bib, csl)
+                except RuntimeError as e:
+                    raise CompilationError("Errore nella risoluzione delle citazioni", details=str(e)) from e
+                m.bytes_written = sum(len(outputs[c.id].encode("utf-8")) for c, _, _, _ in plan if c.id in missed)
+            refs = outputs[REFS_ID]
+            cache.put(refs_key, refs)
+            for chapter, _, _, key in plan:
+                if chapter.id in missed:
+                    self._store_converted(cache, chapter, key, temp_dir / f"{chapter.id}.typ", writer, outputs[chapter.id])
+                    on_done(chapter)
+
+        if refs.strip():
+            bibliography = "#heading(numbering: none)[Bibliografia]\n\n" + refs
+            writer.write(temp_dir / "bibliography.typ", bibliography)
+        return rest, bool(refs.strip())
+
+    def _restore_cached(self, cache, chapter: Chapter, key: str, typ_path: Path, writer) -> bool:
+        """Makes typ_path hold the cached output for key. Returns False on a miss."""
+        # Output on disk already comes from this exact input: nothing to do
+        if typ_path.exists() and cache.is_current(chapter.id, key):
+            cache.record_hit(key)
+            return True
+
+        cached = cache.get(key)
+        if cached is None:
+            return False
+        writer.write(typ_path, cached)
+        cache.mark_current(chapter.id, key)
+        return True
+
+    def _store_converted(self, cache, chapter: Chapter, key: str, typ_path: Path, writer, typst: Optional[str] = None,
+                         staged: Optional[Path] = None):
+        """
+        Records a fresh conversion in the cache and writes it to typ_path:
+        either the text, or the file pandoc wrote at `staged`.
+        """
+        if staged is not None:
+            typst = staged.read_text(encoding="utf-8")
+            writer.commit(staged, typ_path)
+        else:
+            writer.write(typ_path, typst)
+        cache.put(key, typst)
+        cache.mark_current(chapter.id, key)
 
     def _resolve_chapter_markdown(self, chapter: Chapter) -> str:
         """Concatenates chapter content with its structured paragraphs."""
@@ -666,6 +1146,7 @@ class ProjectManager:
         if "supervisor" in settings: self.manifest.supervisor = settings["supervisor"]
         if "year" in settings: self.manifest.year = settings["year"]
         if "citation_style" in settings: self.manifest.citation_style = settings["citation_style"]
+        if "citation_mode" in settings: self.manifest.citation_mode = settings["citation_mode"]
         
         self.save_settings()
 
@@ -762,3 +1243,6 @@ class ProjectManager:
         except Exception as e:
             raise RuntimeError(f"Failed to delete project: {e}")
 
+def _typst_string(value: str) -> str:
+    """A Typst string literal for value."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
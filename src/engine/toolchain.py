@@ -0,0 +1,192 @@
+import json
+import re
+import shutil
+import subprocess
+import sys
+import threading
+from dataclasses import dataclass, asdict, field, fields
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+from src.utils.paths import get_bin_dir, get_cache_dir
+
+TOOLS = ("pandoc", "typst")
+TYPST_FORMATS = ("pdf", "png", "svg", "html")
+
+@dataclass
+class ToolInfo:
+    """A resolved external tool: where it is, its version and what it supports."""
+    name: str
+    path: str
+    mtime_ns: Optional[int] = None # None if the binary doesn't exist
+    version: str = ""              # First line of `--version`, "" if unknown
+    features: Dict[str, bool] = field(default_factory=dict)
+    data_dir: str = ""             # pandoc's user data directory, "" if unknown
+
+    @property
+    def exe(self) -> Path:
+        return Path(self.path)
+
+    @property
+    def exists(self) -> bool:
+        return self.mtime_ns is not None
+
+def pandoc_supports_server(version: str) -> bool:
+    """pandoc server exists since pandoc 3.0."""
+    match = re.match(r"pandoc(?:\.exe)? (\d+)\.", version)
+    return bool(match) and int(match.group(1)) >= 3
+
+def find_tool(name: str, search_dirs: Iterable[Path] = ()) -> Path:
+    """
+    The binary in the first of `search_dirs` that has it, else the bundled
+    one in bin/, else the one on PATH, else the (missing) bundled path.
+    """
+    filename = f"{name}.exe" if sys.platform == "win32" else name
+    for directory in search_dirs:
+        if (Path(directory) / filename).exists():
+            return Path(directory) / filename
+    bundled = get_bin_dir() / filename
+    if bundled.exists():
+        return bundled
+    system_path = shutil.which(name)
+    if system_path:
+        return Path(system_path)
+    return bundled
+
+class ToolchainRegistry:
+    """
+    Resolves pandoc and typst once per process and probes their version
+    and features (pandoc server and Typst writer; typst's output formats,
+    watch and --pages). Probes are persisted in toolchain.json, in the
+    user's cache dir, keyed on the binary's path and mtime, so later
+    starts only stat the binaries.
+    `resolve_async` does the first resolution off the UI thread.
+    `search_dirs` are looked into before bin/ and PATH (see find_tool).
+    """
+
+    CACHE_NAME = "toolchain.json"
+
+    def __init__(self, cache_path: Optional[Path] = None, search_dirs: Iterable[Path] = ()):
+        self.cache_path = cache_path or get_cache_dir() / self.CACHE_NAME
+        self.search_dirs = list(search_dirs)
+        self._tools: Dict[str, ToolInfo] = {}    # Resolved tools by name
+        self._probed: Dict[tuple, ToolInfo] = {} # Probes by (name, path)
+        self._lock = threading.RLock()
+
+    def get(self, name: str) -> ToolInfo:
+        """The resolved tool `name`, resolving and probing it on first use."""
+        with self._lock:
+            if name not in self._tools:
+                self._tools[name] = self.probe(name, find_tool(name, self.search_dirs))
+            return self._tools[name]
+
+    def exe(self, name: str) -> Path:
+        return self.get(name).exe
+
+    def probe(self, name: str, path: Path) -> ToolInfo:
+        """Version and features of the binary at `path`, from the persisted probes when it hasn't changed."""
+        key = (name, str(path))
+        with self._lock:
+            if key in self._probed:
+                return self._probed[key]
+            try:
+                mtime_ns = path.stat().st_mtime_ns
+            except OSError:
+                info = ToolInfo(name, str(path))
+            else:
+                info = self._saved_info(name, path, mtime_ns)
+                if info is None:
+                    info = ToolInfo(name, str(path), mtime_ns)
+                    self._run_probes(info)
+                    self._save(info)
+            self._probed[key] = info
+            return info
+
+    def resolve_async(self, on_done: Optional[Callable[[Dict[str, ToolInfo]], None]] = None) -> threading.Thread:
+        """Resolves every tool in a background thread; `on_done` gets {name: ToolInfo} (from that thread)."""
+        def _run():
+            tools = {name: self.get(name) for name in TOOLS}
+            if on_done:
+                on_done(tools)
+        thread = threading.Thread(target=_run, daemon=True)
+        thread.start()
+        return thread
+
+    def refresh(self):
+        """Forgets the resolved tools (e.g. after installing one); the next get resolves again."""
+        with self._lock:
+            self._tools.clear()
+            self._probed.clear()
+
+    def _saved_info(self, name: str, path: Path, mtime_ns: int) -> Optional[ToolInfo]:
+        """The persisted probe of this binary, or None (also for an entry from another version of the schema)."""
+        saved = self._load().get(name)
+        if not isinstance(saved, dict) or set(saved) != {f.name for f in fields(ToolInfo)}:
+            return None
+        if saved["path"] != str(path) or saved["mtime_ns"] != mtime_ns:
+            return None
+        try:
+            return ToolInfo(**saved)
+        except TypeError:
+            return None
+
+    def _run_probes(self, info: ToolInfo):
+        version_text = _run([info.path, "--version"])
+        info.version = _first_line(version_text)
+        if info.name == "pandoc":
+            data_dir = re.search(r"^User data directory: (.+)$", version_text, re.MULTILINE)
+            info.data_dir = data_dir.group(1).strip() if data_dir else ""
+            info.features["server"] = pandoc_supports_server(info.version)
+            info.features["typst"] = "typst" in _run([info.path, "--list-output-formats"]).split()
+        elif info.name == "typst":
+            info.features["watch"] = bool(re.search(r"^\s+watch\b", _run([info.path, "--help"]), re.MULTILINE))
+            # "[possible values: pdf, png, svg]" or one "- png: ..." line per format
+            help_text = _run([info.path, "compile", "--help"])
+            values = re.search(r"possible values:?(.*?)(?:\n\s*\n|\Z)", help_text, re.IGNORECASE | re.DOTALL)
+            listed = set(re.findall(r"\w+", values.group(1))) if values else set()
+            for fmt in TYPST_FORMATS:
+                info.features[fmt] = fmt in listed
+            info.features["pages"] = "--pages" in help_text
+
+    def _load(self) -> dict:
+        try:
+            data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _save(self, info: ToolInfo):
+        data = self._load()
+        data[info.name] = asdict(info)
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self.cache_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        except OSError:
+            pass # Only costs a probe next time
+
+def _run(cmd) -> str:
+    try:
+        return subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="replace").stdout
+    except OSError:
+        return ""
+
+def _first_line(text: str) -> str:
+    lines = text.splitlines()
+    return lines[0].strip() if lines else ""
+
+_registry: Optional[ToolchainRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_toolchain() -> ToolchainRegistry:
+    """The process-wide registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ToolchainRegistry()
+        return _registry
+
+def use_toolchain(registry: ToolchainRegistry) -> ToolchainRegistry:
+    """Makes `registry` the process-wide one (e.g. to build with other binaries); returns the previous one."""
+    global _registry
+    with _registry_lock:
+        previous, _registry = _registry, registry
+        return previous
@@ -0,0 +1,194 @@
+import os
+import re
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+# Strips ANSI colour/cursor sequences typst may emit around its status lines
+_ANSI_RE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+_STATUS_RE = re.compile(r"compil(?:ing|ed (successfully|with warnings|with errors))")
+
+class WatchEvent:
+    """One finished compilation reported by `typst watch`."""
+    def __init__(self, started_at: float, status: str):
+        self.started_at = started_at
+        self.status = status  # "successfully", "with warnings" or "with errors"
+        self.lines: List[str] = []
+
+    @property
+    def ok(self) -> bool:
+        return self.status != "with errors"
+
+class TypstWatchProcess:
+    """
+    Long-lived `typst watch` process for one project.
+
+    Typst keeps its memoized layout and font state between compilations, so
+    after the pipeline rewrites the generated .typ files the new PDF is ready
+    much sooner than with a cold `typst compile`. `wait_for_compile` blocks
+    until a compilation that started after the given time has finished.
+    The process is restarted transparently if it dies.
+    """
+
+    # Seconds to wait for typst to notice changes before forcing a rebuild
+    TRIGGER_TIMEOUT = 1.0
+    # Seconds to keep collecting diagnostics printed after a failed status line
+    DIAGNOSTICS_GRACE = 0.2
+    MAX_RESTARTS = 3
+
+    def __init__(self, typst_exe: Path, input_file: Path, output_file: Path, root: Path):
+        self.typst_exe = typst_exe
+        self.input_file = input_file
+        self.output_file = output_file
+        self.root = root
+
+        self._process: Optional[subprocess.Popen] = None
+        self._cond = threading.Condition()
+        self._events: List[WatchEvent] = []
+        self._compiling_since: Optional[float] = None
+        self._cancelled = False
+        self._closed = False
+        # Gets every output line as typst prints it (from the reader thread)
+        self.on_output: Optional[Callable[[str], None]] = None
+
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def ensure_running(self):
+        """Starts (or restarts) the watch process if it isn't alive."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Watch process has been shut down.")
+            if self.is_running():
+                return
+            cmd = [str(self.typst_exe), "watch", str(self.input_file), str(self.output_file),
+                   "--root", str(self.root)]
+            self._process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding='utf-8',
+                errors='replace',
+                cwd=self.root
+            )
+            self._events.clear()
+            self._compiling_since = None
+            threading.Thread(target=self._read_output, args=(self._process,), daemon=True).start()
+
+    def wait_for_compile(self, written_at: float, timeout: float = 300) -> WatchEvent:
+        """
+        Waits for the first compilation started at or after `written_at`.
+        Raises TimeoutError, or InterruptedError if cancel() is called.
+        """
+        self._cancelled = False
+        self.ensure_running()
+        deadline = time.monotonic() + timeout
+        triggered = False
+        restarts = 0
+
+        with self._cond:
+            while True:
+                if self._cancelled:
+                    raise InterruptedError("Compilation cancelled.")
+
+                event = next((e for e in self._events if e.started_at >= written_at), None)
+                if event is not None:
+                    break
+
+                if not self.is_running():
+                    if restarts >= self.MAX_RESTARTS:
+                        raise RuntimeError("typst watch keeps exiting unexpectedly.")
+                    restarts += 1
+                    self._cond.release()
+                    try:
+                        # A fresh process compiles once on startup
+                        self.ensure_running()
+                    finally:
+                        self._cond.acquire()
+                    continue
+
+                now = time.monotonic()
+                if now >= deadline:
+                    raise TimeoutError("Timed out waiting for typst watch.")
+
+                # Typst may have read every file before our last write (or
+                # nothing changed at all): touch the entry point to force a build.
+                idle = self._compiling_since is None or self._compiling_since < written_at
+                if not triggered and idle and time.time() - written_at > self.TRIGGER_TIMEOUT:
+                    triggered = True
+                    try:
+                        os.utime(self.input_file)
+                    except OSError:
+                        pass
+
+                self._cond.wait(timeout=min(0.1, deadline - now))
+
+        if not event.ok:
+            time.sleep(self.DIAGNOSTICS_GRACE)
+        with self._cond:
+            return event
+
+    def settled_event(self) -> Optional[WatchEvent]:
+        """
+        The last compilation if the process is running and idle since: typst
+        watches every file the document reads, so its output is up to date.
+        """
+        with self._cond:
+            if self.is_running() and self._compiling_since is None and self._events:
+                return self._events[-1]
+            return None
+
+    def cancel(self):
+        """Aborts a pending wait_for_compile (the process keeps running)."""
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+
+    def shutdown(self):
+        """Stops the watch process."""
+        with self._cond:
+            self._closed = True
+            self._cancelled = True
+            process = self._process
+            self._process = None
+            self._cond.notify_all()
+
+        if process and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def _read_output(self, process: subprocess.Popen):
+        for raw in process.stdout:
+            line = _ANSI_RE.sub("", raw).strip()
+            if not line:
+                continue
+            with self._cond:
+                if process is not self._process:
+                    return
+                match = _STATUS_RE.search(line)
+                if match and match.group(1) is None:
+                    # "compiling ..."
+                    self._compiling_since = time.time()
+                elif match:
+                    started = self._compiling_since if self._compiling_since is not None else time.time()
+                    self._events.append(WatchEvent(started, match.group(1)))
+                    self._compiling_since = None
+                    # Keep only recent history
+                    del self._events[:-20]
+                elif self._events:
+                    # Diagnostics belong to the last reported compilation
+                    self._events[-1].lines.append(line)
+                self._cond.notify_all()
+            on_output = self.on_output
+            if on_output:
+                on_output(line)
+
+        with self._cond:
+            self._cond.notify_all()
@@ -1,40 +1,193 @@
 
 import sys
 import os
+import json
+import shutil
+import argparse
+import contextlib
 from pathlib import Path
 
 # Add src to path so we can import modules
 sys.path.append(str(Path(__file__).parent.parent))
 
-from src.engine.compiler import CompilerEngine
+# Headless: only engine modules here, never src.ui (Tk / customtkinter)
+from src.engine.project_manager import ProjectManager
+from src.engine.pandoc_server import PandocServer
+from src.engine.compiler import CompilationError
+from src.engine.compile_scheduler import CompileJob
+from src.engine.draft_master import DraftOptions
 
 def create_sample_project(path: Path):
     path.mkdir(parents=True, exist_ok=True)
     (path / "chapters").mkdir(exist_ok=True)
     (path / "assets").mkdir(exist_ok=True)
     (path / ".thesis_data").mkdir(exist_ok=True)
-    
+
     # Create dummy chapter
     (path / "chapters" / "01_intro.md").write_text("# Introduzione\n\nQuesta è una tesi di prova generata da **ThesisFlow**.\n\nEcco una formula: $E=mc^2$.", encoding="utf-8")
-    
+
     print(f"Sample project created at {path}")
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python main_cli.py [init|build] <project_path>")
-        return
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="main_cli.py", description="ThesisFlow headless tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    init = sub.add_parser("init", help="Create a sample project")
+    init.add_argument("project_path", type=Path)
+
+    build = sub.add_parser("build", help="Build a project's PDF (same pipeline as the GUI)")
+    build.add_argument("project_path", type=Path)
+    build.add_argument("--jobs", "-j", type=int, default=None,
+                       help="Concurrent pandoc conversions (default: CPU count)")
+    build.add_argument("--incremental", action="store_true",
+                       help="Reuse cached chapter conversions instead of converting everything")
+    build.add_argument("--only", nargs="+", metavar="CHAPTER_ID", default=None,
+                       help="Build only these chapters (ids from manifest.json)")
+    build.add_argument("--draft", action="store_true",
+                       help="Draft build into <project>.draft.pdf, without front page and bibliography")
+    build.add_argument("--asset-quality", choices=["final", "draft", "original"], default=None,
+                       help="Image optimization level (default: final, or draft with --draft)")
+    build.add_argument("--output", "-o", type=Path, default=None,
+                       help="Copy the generated PDF here")
+    build.add_argument("--timings", metavar="PATH", default=None,
+                       help="Write a JSON timing summary to PATH ('-' for stdout)")
+    build.add_argument("--no-daemon", action="store_true",
+                       help="Build in this process even if a build daemon is running")
+
+    build_all = sub.add_parser("build-all", help="Build every project under a projects root")
+    build_all.add_argument("--root", type=Path, default=None,
+                           help="Projects root (default: the GUI's ThesisFlow_Projects folder)")
+    build_all.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1,
+                           help="Projects built at the same time (default: CPU count)")
+    build_all.add_argument("--jobs", "-j", type=int, default=1,
+                           help="Concurrent pandoc conversions per project (default: 1)")
+    build_all.add_argument("--full", action="store_true",
+                           help="Ignore the build caches and convert every chapter")
+    build_all.add_argument("--report", type=Path, default=None,
+                           help="Summary report path (default: <root>/build_report.json)")
+
+    daemon = sub.add_parser("daemon", help="Run the local build daemon shared by the GUI and CLI builds")
+    daemon.add_argument("action", choices=["start", "status", "stop"], nargs="?", default="start")
+    daemon.add_argument("--socket", type=Path, default=None,
+                        help="Unix socket path (default: $THESISFLOW_DAEMON_SOCKET or a per-user socket)")
+    return parser
+
+def run_build(args) -> int:
+    """Builds one project. Returns the process exit code."""
+    project_path = args.project_path.resolve()
+    pm = ProjectManager(projects_root=project_path.parent)
+
+    def on_progress(status, fraction):
+        print(f"[{fraction * 100:3.0f}%] {status}", file=sys.stderr)
+
+    job = CompileJob(project_path)
+    pdf_path = None
+    error = None
+    try:
+        # stdout is reserved for the result (PDF path or timings JSON)
+        with contextlib.redirect_stdout(sys.stderr):
+            pm.load_project(project_path)
+            pm.use_daemon = not args.no_daemon
+            pdf_path = pm.run_build(job, on_progress=on_progress, jobs=args.jobs,
+                                    incremental=args.incremental, chapter_ids=args.only,
+                                    draft=DraftOptions() if args.draft else None,
+                                    asset_quality="" if args.asset_quality == "original" else args.asset_quality)
+        if args.output:
+            args.output.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(pdf_path, args.output)
+            pdf_path = args.output.resolve()
+    except (CompilationError, FileNotFoundError, RuntimeError, ValueError, OSError) as e:
+        error = e
+        print(f"Error: {e}", file=sys.stderr)
+        details = getattr(e, "details", None)
+        if details:
+            print(details, file=sys.stderr)
+    finally:
+        PandocServer.shutdown_all()
 
-    command = sys.argv[1]
-    project_path = Path(sys.argv[2]).resolve()
+    if args.timings:
+        summary = {
+            "project": str(project_path),
+            "status": "ok" if error is None else "error",
+            "pdf": str(pdf_path) if pdf_path else None,
+            "error": str(error) if error else None,
+        }
+        if job.metrics:
+            record = job.metrics.to_record(summary["status"])
+            summary["total_wall_s"] = record["total_wall_s"]
+            summary["by_stage"] = job.metrics.summary()
+            summary["stages"] = record["stages"]
+        text = json.dumps(summary, indent=2)
+        if args.timings == "-":
+            print(text)
+        else:
+            Path(args.timings).write_text(text + "\n", encoding="utf-8")
+    elif pdf_path:
+        print(pdf_path)
 
-    if command == "init":
-        create_sample_project(project_path)
-    elif command == "build":
-        engine = CompilerEngine(project_path)
+    return 0 if error is None else 1
+
+def run_build_all(args) -> int:
+    """Builds every project under the root. Returns 1 if any build failed."""
+    from src.engine.batch_builder import BatchBuilder
+
+    root = (args.root or ProjectManager().projects_root).resolve()
+    builder = BatchBuilder(root, workers=args.workers, jobs_per_project=args.jobs, incremental=not args.full)
+
+    def on_result(result):
+        ratio = result["cache_hit_ratio"]
+        cache = f", cache {ratio * 100:.0f}%" if ratio is not None else ""
+        duration = f"{result['duration_s']:.1f} s" if result["duration_s"] is not None else "-"
+        print(f"[{result['status']}] {result['name']} ({duration}{cache})", file=sys.stderr)
+        if result["error"]:
+            print(f"    {result['error']}", file=sys.stderr)
+
+    report_path = args.report or root / BatchBuilder.REPORT_NAME
+    report = builder.run(report_path=report_path, on_result=on_result)
+    print(f"{report['ok']} ok, {report['failed']} failed in {report['duration_s']:.1f} s", file=sys.stderr)
+    print(report_path.resolve())
+    return 0 if report["failed"] == 0 else 1
+
+def run_daemon(args) -> int:
+    """Runs the build daemon in the foreground, or queries/stops a running one."""
+    from src.engine.build_daemon import BuildDaemon, BuildDaemonClient, daemon_supported, default_socket_path
+
+    if not daemon_supported():
+        print("Error: the build daemon needs Unix sockets", file=sys.stderr)
+        return 1
+    socket_path = args.socket or default_socket_path()
+    if args.action == "start":
         try:
-            engine.compile()
-        except Exception as e:
-            print(f"Error: {e}")
+            print(f"Build daemon listening on {socket_path}", file=sys.stderr)
+            BuildDaemon(socket_path).serve_forever()
+        except RuntimeError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    client = BuildDaemonClient.connect(socket_path)
+    if client is None:
+        print(f"No build daemon on {socket_path}", file=sys.stderr)
+        return 1
+    if args.action == "status":
+        print(json.dumps(client.status(), indent=2))
+    else:
+        client.shutdown()
+    return 0
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.command == "init":
+        create_sample_project(args.project_path.resolve())
+        return 0
+    if args.command == "build-all":
+        return run_build_all(args)
+    if args.command == "daemon":
+        return run_daemon(args)
+    return run_build(args)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
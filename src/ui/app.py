@@ -11,11 +11,14 @@ from src.ui.sidebar import SidebarFrame
 from src.ui.bibliography import BibliographyFrame
 from src.ui.console import ConsolePanel
 from src.ui.outline import OutlinePanel
+from src.ui.pdf_preview import PdfPreviewPanel
 from src.ui.theme import Theme
 from src.ui.router import ViewRouter
 from src.ui.components.breadcrumb import Breadcrumb
 
-from src.engine.compiler import CompilationError
+from src.engine.compiler import CompilationError, AsyncCompiler
+from src.engine.compile_scheduler import CompileJob
+from src.engine.pandoc_server import PandocServer
 from src.controllers.project_controller import ProjectController
 from src.controllers.session_manager import SessionManager
 from src.utils.logger import setup_logger
@@ -47,6 +50,9 @@ class ThesisFlowApp(ctk.CTk):
         self.current_file_path = None
         self.view_mode = "editor"
         self.is_dirty = False
+        self._compile_job = None
+        self._preview_cache = None
+        self._preview_generation = 0
         
         # State to restore after reload
         self._saved_project_path = None
@@ -116,9 +122,10 @@ class ThesisFlowApp(ctk.CTk):
         self.content_area.grid_rowconfigure(2, weight=1) # Editor expands
         self.content_area.grid_columnconfigure(0, weight=1) # Editor column
         self.content_area.grid_columnconfigure(1, weight=0) # Outline column
+        self.content_area.grid_columnconfigure(2, weight=0) # PDF preview column
 
         self.header_frame = ctk.CTkFrame(self.content_area, height=60, fg_color="transparent")
-        self.header_frame.grid(row=0, column=0, columnspan=2, sticky="ew", padx=20, pady=(10, 0))
+        self.header_frame.grid(row=0, column=0, columnspan=3, sticky="ew", padx=20, pady=(10, 0))
         
         self.breadcrumb = Breadcrumb(self.header_frame)
         self.breadcrumb.pack(side="left", pady=10)
@@ -131,9 +138,19 @@ class ThesisFlowApp(ctk.CTk):
                                          command=self.on_compile)
         self.btn_compile.pack(side="right")
 
+        self.btn_preview = ctk.CTkButton(self.header_frame, text="ANTEPRIMA", width=110,
+                                         font=("Segoe UI", 12, "bold"),
+                                         fg_color="transparent", border_width=1, border_color=Theme.COLOR_ACCENT,
+                                         hover_color=Theme.COLOR_PANEL_HOVER,
+                                         image=IconFactory.get_icon("eye", size=(16,16)),
+                                         compound="right",
+                                         command=self.toggle_pdf_preview)
+        self.btn_preview.pack(side="right", padx=(0, 10))
+
         # Toolbar
-        self.toolbar = ToolbarFrame(self.content_area, command_compile=self.on_compile, command_focus=self.toggle_focus_mode)
-        self.toolbar.grid(row=1, column=0, columnspan=2, sticky="ew", padx=20, pady=(10, 0))
+        self.toolbar = ToolbarFrame(self.content_area, command_compile=self.on_compile, command_focus=self.toggle_focus_mode,
+                                    command_compile_draft=self.on_compile_draft)
+        self.toolbar.grid(row=1, column=0, columnspan=3, sticky="ew", padx=20, pady=(10, 0))
 
         # Editor
         self.editor = EditorFrame(self.content_area, on_change=self.mark_dirty, get_citations_callback=self.get_citation_keys)
@@ -146,11 +163,15 @@ class ThesisFlowApp(ctk.CTk):
         self.outline = OutlinePanel(self.content_area, on_navigate=self.editor.scroll_to, height=500)
         self.outline.grid(row=2, column=1, sticky="nsew", padx=(0, 10), pady=10)
 
+        # PDF preview (Right, hidden until toggled): builds then refresh it instead of opening a viewer
+        self.pdf_preview = PdfPreviewPanel(self.content_area)
+        self.preview_visible = False
+
         self.bib_editor = None
         
         # Console (Bottom)
         self.console_panel = ConsolePanel(self.content_area)
-        self.console_panel.grid(row=3, column=0, columnspan=2, sticky="ew", padx=10, pady=(0, 10))
+        self.console_panel.grid(row=3, column=0, columnspan=3, sticky="ew", padx=10, pady=(0, 10))
         self.console_panel.expand() 
         self.console_panel.toggle_collapse()
         
@@ -169,6 +190,7 @@ class ThesisFlowApp(ctk.CTk):
             self.header_frame.grid_remove() # Hide Header
             self.console_panel.grid_remove() # Hide Console
             self.outline.grid_remove() # Hide Outline
+            self.pdf_preview.grid_remove()
             
             # Maximize content area
             self.content_area.grid_configure(padx=0, pady=0)
@@ -180,6 +202,7 @@ class ThesisFlowApp(ctk.CTk):
             self.header_frame.grid()
             self.console_panel.grid()
             self.outline.grid()
+            if self.preview_visible: self.pdf_preview.grid()
             
             # Restore margins
             self.content_area.grid_configure(padx=0)
@@ -213,16 +236,23 @@ class ThesisFlowApp(ctk.CTk):
         self.autosave_service.start()
 
     def check_dependencies(self):
-        missing = self.pm.check_system_health()
-        
+        # Resolving and probing pandoc/typst spawns processes: keep it off the UI thread
+        from src.engine.toolchain import get_toolchain
+        get_toolchain().resolve_async(lambda tools: self._on_toolchain_resolved(self.pm.check_system_health()))
+
+    def _on_toolchain_resolved(self, missing):
         if missing:
              self.logger.warning(f"Missing dependencies: {', '.join(missing)}")
              self.after(500, lambda: msg.showwarning("Dipendenze Mancanti", f"Attenzione, i seguenti eseguibili non sono stati trovati:\n{', '.join(missing)}\n\nLa compilazione potrebbe fallire."))
 
     def open_project(self, path: Path):
         try:
+            # Only the open project keeps a typst watch process alive
+            if self.pm.current_project_path != path:
+                AsyncCompiler.shutdown_watchers()
             self.project_controller.load_project(path)
             self.show_editor_interface()
+            if self.preview_visible: self.load_cached_preview()
             self.refresh_sidebar()
             if self.pm.manifest.chapters:
                 # If we have a saved chapter to restore
@@ -346,7 +376,14 @@ class ThesisFlowApp(ctk.CTk):
         # since it's nested inside the main interface.
         self.bib_editor.grid(row=2, column=0, sticky="nsew", padx=10, pady=(0, 10))
 
-    def on_compile(self, fmt="pdf"):
+    def on_compile_draft(self):
+        """Draft build of the chapter open in the editor (no front page, no bibliography)."""
+        if self.view_mode != "editor" or not self.current_chapter:
+            self.show_toast("Apri un capitolo per compilarne la bozza")
+            return
+        self.on_compile(chapter=self.current_chapter)
+
+    def on_compile(self, fmt="pdf", chapter=None):
         if self.view_mode == "editor":
             self.save_current_chapter()
         elif self.view_mode == "bibliography" and self.bib_editor:
@@ -354,30 +391,59 @@ class ThesisFlowApp(ctk.CTk):
         
         if not self.pm.current_project_path: return
         
-        self.btn_compile.configure(state="disabled", text="Compilazione...")
-        self.show_toast("Compilazione avviata...")
+        # A build already running is cancelled and replaced by this one
+        self.show_toast(f"Bozza di '{chapter.title}' avviata..." if chapter else "Compilazione avviata...")
         self.logger.info(f"Compiling project: {self.pm.current_project_path}")
         
         if self.console_panel.is_collapsed:
             self.console_panel.toggle_collapse()
             
         def on_success(pdf_path):
-            self.after(0, lambda: self._on_compile_success(pdf_path))
-            self.after(0, lambda: self._on_compile_finished())
+            self.after(0, lambda: self._on_compile_success(pdf_path, draft=chapter is not None))
 
         def on_error(error):
             self.after(0, lambda: self._on_compile_error(error))
-            self.after(0, lambda: self._on_compile_finished())
             
         def on_progress(status, fraction):
             # Update UI with progress? For now just log or toast updates
             # self.after(0, lambda: self.show_toast(status, 1000))
             pass
 
-        self.pm.compile_project_async(on_success, on_error, on_progress)
+        def on_state(job):
+            state = job.state
+            self.after(0, lambda: self._on_compile_state(job, state))
 
+        def on_metrics(stage):
+            self.after(0, lambda: self.console_panel.show_stage(stage))
 
-    def _on_compile_success(self, pdf_path):
+        if chapter:
+            self._compile_job = self.pm.compile_draft_async([chapter.id], on_success, on_error, on_progress,
+                                                            on_state=on_state, on_metrics=on_metrics,
+                                                            on_output=self.console_panel.post_output)
+        else:
+            self._compile_job = self.pm.compile_project_async(on_success, on_error, on_progress, on_state=on_state, on_metrics=on_metrics,
+                                                              on_output=self.console_panel.post_output)
+
+    def _on_compile_state(self, job, state):
+        if state == CompileJob.CANCELLED:
+            self.logger.info("Compilazione annullata: sostituita da una più recente")
+        if state in (CompileJob.DONE, CompileJob.CANCELLED) and job.metrics:
+            self.console_panel.show_build_summary(job.metrics)
+        # Only the latest request drives the button
+        if job is not self._compile_job:
+            return
+        if state == CompileJob.QUEUED:
+            self.btn_compile.configure(text="In coda...")
+        elif state == CompileJob.RUNNING:
+            self.btn_compile.configure(text="Compilazione...")
+        else:
+            self._on_compile_finished()
+
+    def _on_compile_success(self, pdf_path, draft=False):
+        if self.preview_visible:
+            self.show_toast("PDF generato: aggiornamento anteprima...")
+            self.refresh_pdf_preview(draft)
+            return
         msg.showinfo("Compilazione", f"PDF generato con successo:\n{pdf_path}")
         try:
             self.pm.open_generated_pdf(pdf_path)
@@ -396,6 +462,59 @@ class ThesisFlowApp(ctk.CTk):
     def _on_compile_finished(self):
         self.btn_compile.configure(state="normal", text="PUBBLICA PDF")
 
+    def toggle_pdf_preview(self):
+        self.preview_visible = not self.preview_visible
+        if self.preview_visible:
+            self.pdf_preview.grid(row=2, column=2, sticky="nsew", padx=(0, 10), pady=10)
+            self.load_cached_preview()
+        else:
+            self.pdf_preview.grid_remove()
+
+    def _get_preview_cache(self):
+        from src.engine.page_preview import PagePreviewCache
+        project_path = self.pm.current_project_path
+        if self._preview_cache is None or self._preview_cache.project_path != project_path:
+            self._preview_cache = PagePreviewCache(project_path)
+        return self._preview_cache
+
+    def load_cached_preview(self):
+        """Shows the pages of the last render without running typst."""
+        if not self.pm.current_project_path: return
+        cache = self._get_preview_cache()
+        pages = cache.load_index()
+        self.pdf_preview.set_pages([cache.page_path(p) for p in pages], [(p.width, p.height) for p in pages])
+
+    def refresh_pdf_preview(self, draft=False):
+        """
+        Renders the pages in the background, those on screen first; a newer
+        refresh supersedes a running one.
+        """
+        from src.engine.draft_master import DRAFT_MASTER_NAME
+        if not self.pm.current_project_path: return
+        cache = self._get_preview_cache()
+        input_file = self.pm.current_project_path / DRAFT_MASTER_NAME if draft else None
+        cache.cancel()
+        self._preview_generation += 1
+        generation = self._preview_generation
+        visible = self.pdf_preview.visible_pages()
+
+        def _show(pages):
+            if generation != self._preview_generation: return
+            self.pdf_preview.set_pages([cache.page_path(p) for p in pages], [(p.width, p.height) for p in pages])
+
+        def _render():
+            try:
+                pages, changed = cache.render(input_file, first=visible,
+                                              on_first=lambda pages, changed: self.after(0, _show, pages))
+            except CompilationError as e:
+                if generation == self._preview_generation:
+                    self.logger.error(f"Anteprima non disponibile: {e} {e.details or ''}")
+                return
+            self.logger.info(f"Anteprima: {len(pages)} pagine, {len(changed)} aggiornate")
+            self.after(0, _show, pages)
+
+        threading.Thread(target=_render, daemon=True).start()
+
     def show_toast(self, message, duration=3000):
         toast = ctk.CTkFrame(self, fg_color=Theme.COLOR_PANEL, border_width=1, border_color=Theme.COLOR_ACCENT, corner_radius=25)
         toast.place(relx=0.98, rely=0.95, anchor="se", x=-20, y=-20)
@@ -470,4 +589,7 @@ class ThesisFlowApp(ctk.CTk):
         if hasattr(self, 'autosave_service'):
             self.autosave_service.stop()
         if self.is_dirty: self.save_current_file()
+        self.pm.compile_scheduler.cancel_all()
+        AsyncCompiler.shutdown_watchers()
+        PandocServer.shutdown_all()
         self.destroy()
@@ -0,0 +1,123 @@
+import threading
+from typing import Optional, Tuple
+
+class DirtyLines:
+    """
+    Lines touched by edits since the last `take`, in current line numbers:
+    every edit shifts the pending range like the text below it. Edits
+    that insert or remove a backtick may open or close a code fence, so
+    they flag the block structure as changed (see `take`). `revision`
+    counts the edits, so work based on older text can tell it's stale.
+    """
+
+    def __init__(self):
+        self.first: Optional[int] = None
+        self.last: Optional[int] = None
+        self.blocks_changed = False
+        self.revision = 0
+        self._lock = threading.Lock()
+
+    def inserted(self, line: int, text: str):
+        """`text` was inserted at `line`."""
+        added = text.count("\n")
+        with self._lock:
+            if self.first is not None:
+                # Lines below the insertion point move down
+                self.first = self.first if self.first <= line else self.first + added
+                self.last = self.last if self.last < line else self.last + added
+            self._extend(line, line + added)
+            self.blocks_changed |= "`" in text
+            self.revision += 1
+
+    def deleted(self, first: int, last: int, text: str):
+        """`text`, spanning lines `first` to `last`, was deleted."""
+        removed = last - first
+        with self._lock:
+            if self.first is not None:
+                # Lines inside the deletion collapse onto `first`, lines below move up
+                shift = lambda n: n if n <= first else (first if n <= last else n - removed)
+                self.first, self.last = shift(self.first), shift(self.last)
+            self._extend(first, first)
+            self.blocks_changed |= "`" in text
+            self.revision += 1
+
+    def mark_all(self, last_line: int):
+        """Everything up to `last_line` needs highlighting again."""
+        with self._lock:
+            self._extend(1, last_line)
+            self.blocks_changed = True
+            self.revision += 1
+
+    def take(self) -> Optional[Tuple[int, int, bool]]:
+        """(first, last, blocks_changed) of the pending edits, or None; resets them."""
+        with self._lock:
+            if self.first is None:
+                return None
+            pending = (self.first, self.last, self.blocks_changed)
+            self.first = self.last = None
+            self.blocks_changed = False
+            return pending
+
+    def clear(self):
+        self.take()
+
+    def _extend(self, first: int, last: int):
+        self.first = first if self.first is None else min(self.first, first)
+        self.last = last if self.last is None else max(self.last, last)
+
+class EditTracker:
+    """
+    Reports every insert/delete/replace of a tk.Text to a DirtyLines, at
+    the Tcl level: the widget command is renamed and replaced by a proxy,
+    so typing, pasting, undo and programmatic edits are all seen.
+    """
+
+    def __init__(self, text_widget, dirty: DirtyLines):
+        self.text = text_widget
+        self.dirty = dirty
+        self._widget = str(text_widget)
+        self._original = self._widget + "_orig"
+        self._edits = 0
+        text_widget.tk.call("rename", self._widget, self._original)
+        text_widget.tk.createcommand(self._widget, self._dispatch)
+
+    def _call(self, *args):
+        return self.text.tk.call((self._original,) + args)
+
+    def _line(self, index: str) -> int:
+        # Insertions at "end" land before the final newline
+        return min(int(str(self._call("index", index)).split(".")[0]), self._last_line())
+
+    def _last_line(self) -> int:
+        return int(str(self._call("index", "end-1c")).split(".")[0])
+
+    def _dispatch(self, *args):
+        op = args[0] if args else ""
+        if op == "insert" and len(args) >= 3:
+            line = self._line(args[1])
+            result = self._call(*args)
+            self._edits += 1
+            self.dirty.inserted(line, "".join(args[2::2]))
+            return result
+        if op in ("delete", "replace") and len(args) >= 2:
+            start = args[1]
+            end = args[2] if len(args) >= 3 else f"{start}+1c"
+            first, last = self._line(start), self._line(end)
+            removed = str(self._call("get", start, end))
+            result = self._call(*args)
+            self._edits += 1
+            if op == "delete" and len(args) > 3:
+                self.dirty.mark_all(self._last_line()) # Several ranges at once
+            else:
+                self.dirty.deleted(first, last, removed)
+            if op == "replace":
+                self.dirty.inserted(first, "".join(args[3::2]))
+            return result
+        if op == "edit" and len(args) >= 2 and args[1] in ("undo", "redo"):
+            before = self._edits
+            result = self._call(*args)
+            if self._edits == before:
+                # This Tk replayed the change without going through the widget command
+                self.dirty.mark_all(self._last_line())
+            return result
+        return self._call(*args)
@@ -0,0 +1,116 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from src.utils.md_tokenizer import FENCE_RE, TAGS, extract_headings, tokenize_lines
+
+LineRange = Tuple[int, int]  # First and last line, 1-based, inclusive
+
+@dataclass
+class HighlightRequest:
+    """A snapshot of the editor text to tokenize, at edit `revision`."""
+    revision: int
+    text: str
+    lines: List[LineRange]       # Lines to tokenize
+    outline: bool = False        # Also extract the headings and count the words
+
+@dataclass
+class HighlightResult:
+    revision: int
+    lines: List[LineRange]
+    spans: Dict[str, List[Tuple[int, int, int]]] = field(default_factory=dict) # See tokenize_lines
+    headings: Optional[List[Tuple[int, str, str]]] = None
+    words: Optional[int] = None
+
+def analyze(request: HighlightRequest) -> HighlightResult:
+    """Tokenizes the requested lines of the snapshot (and builds the outline, if asked)."""
+    lines = request.text.split("\n")
+    result = HighlightResult(request.revision, request.lines, {tag: [] for tag in TAGS})
+
+    # One scan for the code block state, in line order
+    in_code, scanned = False, 0
+    for first, last in sorted(request.lines):
+        for line in lines[scanned:first - 1]:
+            if FENCE_RE.match(line):
+                in_code = not in_code
+        scanned = max(scanned, first - 1)
+        spans, _ = tokenize_lines(lines[first - 1:last], first, in_code)
+        for tag, tag_spans in spans.items():
+            result.spans[tag].extend(tag_spans)
+
+    if request.outline:
+        result.headings = extract_headings(request.text)
+        result.words = len(request.text.split())
+    return result
+
+def plan_batch(pending: List[LineRange], viewport: LineRange, budget: int) -> List[LineRange]:
+    """
+    The pending lines to tokenize next: the visible ones first, then the
+    others from the top, up to `budget` lines (the visible ones always).
+    """
+    top, bottom = viewport
+    visible = [(max(first, top), min(last, bottom)) for first, last in pending if first <= bottom and last >= top]
+    batch = list(visible)
+    left = budget - sum(last - first + 1 for first, last in visible)
+    for first, last in pending:
+        # The parts above and below the viewport
+        for part in ((first, min(last, top - 1)), (max(first, bottom + 1), last)):
+            if left <= 0:
+                return batch
+            if part[0] <= part[1]:
+                part = (part[0], min(part[1], part[0] + left - 1))
+                batch.append(part)
+                left -= part[1] - part[0] + 1
+    return batch
+
+class HighlightWorker:
+    """
+    Tokenizes editor snapshots on a background thread. Only the latest
+    request is kept: one submitted while another is being tokenized
+    replaces any queued one, and a result whose revision is already
+    superseded by a queued request is dropped. `on_result` is called from
+    the worker thread.
+    """
+
+    def __init__(self, on_result: Callable[[HighlightResult], None]):
+        self.on_result = on_result
+        self._request: Optional[HighlightRequest] = None
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def submit(self, request: HighlightRequest):
+        with self._cond:
+            if self._closed:
+                return
+            # A queued outline request stays one when a plain batch replaces it
+            if self._request is not None and self._request.outline and self._request.revision == request.revision:
+                request.outline = True
+            self._request = request
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._request = None
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._request is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                request, self._request = self._request, None
+
+            result = analyze(request)
+
+            with self._cond:
+                if self._closed:
+                    return
+                if self._request is not None and self._request.revision != result.revision:
+                    continue # The text changed meanwhile
+            self.on_result(result)
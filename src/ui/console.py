@@ -1,9 +1,52 @@
 import customtkinter as ctk
 import logging
+import threading
 import tkinter as tk
+from collections import deque
 from src.utils.icons import IconFactory
+from src.engine.build_metrics import format_stage, format_summary
+
+class OutputBuffer:
+    """
+    Bounded queue of tool output lines between worker threads and the UI.
+    Past `max_lines` the oldest pending lines are dropped (and counted), so
+    a chatty process can't pile up work for the UI thread.
+    """
+
+    def __init__(self, max_lines: int = 2000):
+        self._lines = deque(maxlen=max_lines)
+        self._dropped = 0
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def push(self, line: str) -> bool:
+        """Queues a line. Returns True if the caller has to schedule a drain."""
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen:
+                self._dropped += 1
+            self._lines.append(line)
+            if self._scheduled:
+                return False
+            self._scheduled = True
+            return True
+
+    def drain(self) -> list:
+        """Takes the pending lines, led by a note if some were dropped."""
+        with self._lock:
+            lines = list(self._lines)
+            if self._dropped:
+                lines.insert(0, f"... {self._dropped} righe omesse ...")
+            self._lines.clear()
+            self._dropped = 0
+            self._scheduled = False
+        return lines
 
 class ConsolePanel(ctk.CTkFrame):
+    # Tool output is inserted at most every FLUSH_MS, in one batch
+    FLUSH_MS = 100
+    # Lines kept in the textbox; older ones are trimmed
+    MAX_LINES = 5000
+
     def __init__(self, master, logger_name="ThesisFlow", **kwargs):
         super().__init__(master, height=150, **kwargs)
         
@@ -29,6 +72,7 @@ class ConsolePanel(ctk.CTkFrame):
         
         self.textbox = ctk.CTkTextbox(self, font=("Consolas", 10), state="disabled", fg_color=("white", "gray10"))
         self.textbox.grid(row=1, column=0, sticky="nsew", padx=5, pady=5)
+        self.output_buffer = OutputBuffer()
     
     def toggle_collapse(self, event=None):
         self.is_collapsed = not self.is_collapsed
@@ -57,6 +101,38 @@ class ConsolePanel(ctk.CTkFrame):
         self.textbox.delete("1.0", "end")
         self.textbox.configure(state="disabled")
 
+    def append_text(self, text: str):
+        """Appends raw lines (main thread only)."""
+        self.textbox.configure(state="normal")
+        self.textbox.insert("end", text + "\n")
+        excess = int(self.textbox.index("end-1c").split(".")[0]) - self.MAX_LINES
+        if excess > 0:
+            self.textbox.delete("1.0", f"{excess + 1}.0")
+        self.textbox.see("end")
+        self.textbox.configure(state="disabled")
+
+    def post_output(self, line: str):
+        """Queues a line of pandoc/typst output (any thread); see OutputBuffer."""
+        if self.output_buffer.push(line):
+            self.after(self.FLUSH_MS, self._flush_output)
+
+    def _flush_output(self):
+        lines = self.output_buffer.drain()
+        if not lines:
+            return
+        self.append_text("\n".join(lines))
+        # Auto-expand on error
+        if any(line.startswith("[typst] ❌") for line in lines) and self.is_collapsed:
+            self.toggle_collapse()
+
+    def show_stage(self, stage):
+        """Live line for a finished build stage (StageMetrics)."""
+        self.append_text(format_stage(stage))
+
+    def show_build_summary(self, metrics):
+        """Per-stage breakdown of a finished build (BuildMetrics)."""
+        self.append_text(format_summary(metrics))
+
 class ConsoleUiHandler(logging.Handler):
     def __init__(self, textbox):
         super().__init__()
@@ -1,15 +1,22 @@
 import customtkinter as ctk
 import tkinter as tk
-from typing import List, Callable
-import re
+from typing import List, Callable, Optional
 from src.ui.theme import Theme
 from src.ui.components.line_numbers import LineNumbers
 from src.ui.components.find_replace import FindReplaceDialog
 from src.ui.components.citation_popup import CitationPopup
+from src.ui.components.edit_tracker import DirtyLines, EditTracker
 from src.utils.html_renderer import HTMLRenderer
+from src.ui.components.highlight_worker import HighlightRequest, HighlightWorker, plan_batch
+from src.utils.md_tokenizer import FENCE_RE, TAGS, code_state_before, extract_headings as parse_headings, tokenize_lines
 from tkhtmlview import HTMLLabel
 
 class EditorFrame(ctk.CTkFrame):
+    # Lines not highlighted yet carry this tag; Tk keeps it in place across edits
+    PENDING_TAG = "hl_pending"
+    # Lines tokenized per worker round trip, besides the visible ones
+    BATCH_LINES = 1000
+
     def __init__(self, master, on_change: Callable = None, get_citations_callback: Callable[[], List[str]] = None, **kwargs):
         super().__init__(master, fg_color="transparent", **kwargs)
         self.on_change = on_change
@@ -45,6 +52,16 @@ class EditorFrame(ctk.CTkFrame):
         self.textbox._textbox.configure(yscrollcommand=self._on_scroll)
         
         self.setup_tags()
+
+        # Edits are recorded as they happen, so highlighting only redoes the lines they touched
+        self._dirty = DirtyLines()
+        self._edit_tracker = EditTracker(self.textbox._textbox, self._dirty)
+        self._revealed_line = None
+        # Tokenizing runs on a worker thread; the UI thread only applies the tags
+        self._worker = HighlightWorker(self._post_result)
+        self._snapshot = (None, "") # (revision, text) last sent to the worker
+        self._viewport_scheduled = False
+        self._headings = None
         
         self.textbox.bind("<<Modified>>", self._on_text_change)
         self.textbox.bind("<KeyRelease>", self.on_key_release)
@@ -64,6 +81,20 @@ class EditorFrame(ctk.CTkFrame):
 
     def _on_scroll(self, *args):
         self.line_numbers.redraw()
+        # Lines scrolled into view are highlighted before the background pass gets to them.
+        # Tk also calls this after edits: while typing, perform_updates makes the request
+        if not self._viewport_scheduled and self._debounce_timer is None:
+            self._viewport_scheduled = True
+            self.after_idle(self._on_viewport_change)
+
+    def _on_viewport_change(self):
+        self._viewport_scheduled = False
+        if self._debounce_timer is None:
+            self._request_highlight()
+
+    def destroy(self):
+        self._worker.shutdown()
+        super().destroy()
 
     def setup_tags(self):
         tb = self.textbox._textbox
@@ -112,12 +143,13 @@ class EditorFrame(ctk.CTkFrame):
     def set_text(self, text):
         self.textbox.delete("1.0", "end")
         self.textbox.insert("1.0", text)
+        self._revealed_line = None
         self.highlight_syntax()
         self.line_numbers.redraw()
 
     def insert_at_cursor(self, text):
         self.textbox.insert("insert", text)
-        self.highlight_syntax()
+        self.highlight_dirty()
         self.line_numbers.redraw()
         
     def insert_around_cursor(self, prefix, suffix):
@@ -129,6 +161,7 @@ class EditorFrame(ctk.CTkFrame):
             self.textbox.insert(sel_start, f"{prefix}{selection}{suffix}")
         except tk.TclError:
             self.textbox.insert("insert", prefix + suffix)
+        self.highlight_dirty()
         self.line_numbers.redraw()
 
     def insert_image(self, path):
@@ -148,14 +181,20 @@ class EditorFrame(ctk.CTkFrame):
 
     def on_click(self, event):
         # When clicking, we might change lines, so we need to update elision
-        self.highlight_syntax()
+        self.reveal_syntax()
 
     def perform_updates(self):
-        self.highlight_syntax()
-        self.update_status()
+        self._debounce_timer = None
+        # Word count and outline come back with the worker's result (see _apply_result)
+        self.highlight_dirty(outline=True)
         if self.preview_visible: self.update_preview()
         self.line_numbers.redraw()
-        
+
+    def update_outline(self, headings):
+        """Shows `headings` in the outline panel next to the editor, if they changed."""
+        if headings == self._headings:
+            return
+        self._headings = headings
         outline_panel = None
         for child in self.master.winfo_children():
             from src.ui.outline import OutlinePanel
@@ -163,79 +202,142 @@ class EditorFrame(ctk.CTkFrame):
                 outline_panel = child
                 break
         if outline_panel:
-            headings = self.extract_headings()
             outline_panel.update_outline(headings)
 
     def extract_headings(self):
-        headings = []
-        text = self.get_text()
-        for idx, line in enumerate(text.split('\\n')):
-            match = re.match(r"^(#{1,3})\s+(.*)", line)
-            if match:
-                level = len(match.group(1))
-                title = match.group(2)
-                index = f"{idx + 1}.0"
-                headings.append((level, title, index))
-        return headings
+        return parse_headings(self.get_text())
 
     def scroll_to(self, index):
         self.textbox.see(index)
         self.line_numbers.redraw()
 
     def highlight_syntax(self):
+        """
+        Highlights the whole document (on set_text; edits go through
+        highlight_dirty). Every line is marked pending and tokenized on the
+        worker thread in batches, the visible lines first.
+        """
+        self._dirty.clear()
+        self.textbox._textbox.tag_add(self.PENDING_TAG, "1.0", "end")
+        self._request_highlight(outline=True)
+        self.reveal_syntax()
+
+    def highlight_dirty(self, outline: bool = False):
+        """
+        Queues the lines edited since the last pass for highlighting. An
+        edit that may open or close a code fence changes the meaning of
+        every line below it: those are queued too. With `outline` the word
+        count and the outline are refreshed as well.
+        """
+        pending = self._dirty.take()
+        if pending is not None:
+            first, last, blocks_changed = pending
+            end_line = self._last_line()
+            first, last = min(first, end_line), min(last, end_line)
+            if blocks_changed or FENCE_RE.search(self.textbox._textbox.get(f"{first}.0", f"{last}.end")):
+                last = end_line
+            self.textbox._textbox.tag_add(self.PENDING_TAG, f"{first}.0", f"{last}.end+1c")
+        self._request_highlight(outline)
+        self.reveal_syntax()
+
+    def _last_line(self) -> int:
+        return int(self.textbox._textbox.index("end-1c").split(".")[0])
+
+    def _pending_lines(self):
+        """The (first, last) line ranges still tagged PENDING_TAG."""
         tb = self.textbox._textbox
-        # Clear all markdown tags
-        for tag in ["h1", "h2", "h3", "md_marker", "bold", "italic", "link"]:
-            tb.tag_remove(tag, "1.0", "end")
-            
-        text = self.get_text()
-        lines = text.split('\n')
-        
-        for i, line in enumerate(lines):
-            line_idx = i + 1
-            
-            # 1. Headers
-            h_match = re.match(r"^(#{1,3})\s+(.*)", line)
-            if h_match:
-                level = len(h_match.group(1))
-                tag = f"h{level}"
-                tb.tag_add(tag, f"{line_idx}.0", f"{line_idx}.end")
-                # Mark only the '#' and the space after it for elision
-                tb.tag_add("md_marker", f"{line_idx}.0", f"{line_idx}.{level + 1}")
-                
-            # 2. Bold / Italic
-            def tag_markers(pattern, styling_tag, group_num=2):
-                for m in re.finditer(pattern, line):
-                    # Whole match
-                    start_char = m.start()
-                    end_char = m.end()
-                    
-                    # Style the content
-                    tb.tag_add(styling_tag, f"{line_idx}.{m.start(group_num)}", f"{line_idx}.{m.end(group_num)}")
-                    
-                    # Elide the markers
-                    # Pattern must have 3 groups: [prefix, content, suffix]
-                    tb.tag_add("md_marker", f"{line_idx}.{m.start(1)}", f"{line_idx}.{m.end(1)}")
-                    tb.tag_add("md_marker", f"{line_idx}.{m.start(3)}", f"{line_idx}.{m.end(3)}")
-
-            tag_markers(r"(\*\*)(.+?)(\*\*)", "bold")
-            tag_markers(r"(\_)(.+?)(\_)", "italic")
-            
-            # 3. Links [text](url)
-            for m in re.finditer(r"(\[)(.+?)(\]\(.+?\))", line):
-                 tb.tag_add("link", f"{line_idx}.{m.start(2)}", f"{line_idx}.{m.end(2)}")
-                 tb.tag_add("md_marker", f"{line_idx}.{m.start(1)}", f"{line_idx}.{m.end(1)}")
-                 tb.tag_add("md_marker", f"{line_idx}.{m.start(3)}", f"{line_idx}.{m.end(3)}")
+        bounds = [str(index) for index in tb.tag_ranges(self.PENDING_TAG)]
+        end_line = self._last_line()
+        ranges = []
+        for start, end in zip(bounds[::2], bounds[1::2]):
+            first = int(start.split(".")[0])
+            line, column = (int(n) for n in end.split("."))
+            last = min(line if column > 0 else line - 1, end_line)
+            if first <= last:
+                ranges.append((first, last))
+        return ranges
+
+    def _request_highlight(self, outline: bool = False):
+        """Sends the next batch of pending lines (visible ones first) to the worker."""
+        pending = self._pending_lines()
+        if not pending and not outline:
+            return
+        tb = self.textbox._textbox
+        top = int(tb.index("@0,0").split(".")[0])
+        bottom = int(tb.index(f"@0,{tb.winfo_height()}").split(".")[0])
+        # Every edit bumps the revision, so an unchanged revision means an unchanged text
+        revision = self._dirty.revision
+        if self._snapshot[0] != revision:
+            self._snapshot = (revision, self.get_text())
+        self._worker.submit(HighlightRequest(revision, self._snapshot[1], plan_batch(pending, (top, bottom), self.BATCH_LINES), outline))
+
+    def _post_result(self, result):
+        # Worker thread: hand the result to the Tk thread
+        try:
+            self.after(0, self._apply_result, result)
+        except (RuntimeError, tk.TclError):
+            pass # Editor closed
+
+    def _apply_result(self, result):
+        """Applies a worker result, unless the text changed since its snapshot."""
+        if result.revision != self._dirty.revision or not self.winfo_exists():
+            return # Its lines are still pending: the next request covers them
+        tb = self.textbox._textbox
+        for first, last in result.lines:
+            for tag in TAGS:
+                tb.tag_remove(tag, f"{first}.0", f"{last}.end")
+            tb.tag_remove(self.PENDING_TAG, f"{first}.0", f"{last}.end+1c")
+        self._add_spans(result.spans)
 
+        if result.words is not None:
+            self.update_status(result.words)
+            self.update_outline(result.headings)
         self.reveal_syntax()
+        self._request_highlight()
+
+    def _add_spans(self, spans):
+        """Applies tokenize_lines spans with one `tag add` per tag."""
+        tb = self.textbox._textbox
+        for tag, tag_spans in spans.items():
+            if tag_spans:
+                indices = [index for line, start, end in tag_spans for index in (f"{line}.{start}", f"{line}.{end}")]
+                tb.tag_add(tag, *indices)
+
+    def _highlight_lines(self, first: int, last: int, in_code: Optional[bool] = None) -> bool:
+        """
+        Re-tags lines `first` to `last` (1-based, inclusive) right away, on
+        the Tk thread: for the few lines that can't wait for the worker.
+        `in_code` is whether line `first` starts inside a code block, if
+        known. Returns the same for the line after `last`.
+        """
+        tb = self.textbox._textbox
+        if in_code is None:
+            in_code = code_state_before(tb.get("1.0", f"{first}.0"))
+        ranges, in_code = tokenize_lines(tb.get(f"{first}.0", f"{last}.end").split('\n'), first, in_code)
+
+        # Clear all markdown tags
+        for tag in TAGS:
+            tb.tag_remove(tag, f"{first}.0", f"{last}.end")
+        tb.tag_remove(self.PENDING_TAG, f"{first}.0", f"{last}.end+1c")
+        self._add_spans(ranges)
+        return in_code
 
     def reveal_syntax(self):
-        """Removes the md_marker tag from the current line so the user can edit markdown."""
+        """
+        Removes the md_marker tag from the current line so the user can edit
+        markdown, and hides the markers again on the line revealed before.
+        """
         tb = self.textbox._textbox
         try:
-            cursor_pos = tb.index("insert")
-            line_num = cursor_pos.split('.')[0]
+            line_num = int(tb.index("insert").split('.')[0])
+            previous = self._revealed_line
+            if previous is not None and previous != line_num and previous <= self._last_line():
+                # Pending lines get their markers from the worker, code lines have none
+                names = tb.tag_names(f"{previous}.0")
+                if self.PENDING_TAG not in names and "code" not in names:
+                    self._highlight_lines(previous, previous, in_code=False)
             tb.tag_remove("md_marker", f"{line_num}.0", f"{line_num}.end")
+            self._revealed_line = line_num
         except:
             pass
 
@@ -243,9 +345,9 @@ class EditorFrame(ctk.CTkFrame):
         # Deprecated by new highlight_syntax logic but kept for safety if used elsewhere
         pass
 
-    def update_status(self):
-        text = self.get_text()
-        words = len(text.split())
+    def update_status(self, words: Optional[int] = None):
+        if words is None:
+            words = len(self.get_text().split())
         self.status_bar.configure(text=f"{words} parole")
 
     def open_find_dialog(self, event=None):
@@ -0,0 +1,162 @@
+import tkinter as tk
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import customtkinter as ctk
+from PIL import Image, ImageTk
+
+from src.ui.theme import Theme
+
+class PdfPreviewPanel(ctk.CTkFrame):
+    """
+    Scrollable in-app preview of the rendered pages (see PagePreviewCache).
+
+    Every page gets a placeholder of its size; images are only decoded for
+    the pages around the viewport, and at most MAX_IMAGES of them are kept
+    (least recently shown first out), so a 200-page thesis scrolls without
+    loading 200 images.
+    """
+
+    PAGE_GAP = 12
+    MAX_IMAGES = 24
+    # Pages loaded beyond the viewport, in viewport heights
+    PRELOAD = 1.0
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, width=420, fg_color=Theme.COLOR_PANEL, **kwargs)
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.canvas = tk.Canvas(self, highlightthickness=0, bg="#525659", yscrollincrement=20)
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+
+        self.canvas.bind("<Configure>", self._on_resize)
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-4>", lambda e: self._scroll(-3))
+        self.canvas.bind("<Button-5>", lambda e: self._scroll(3))
+
+        self._paths: List[Path] = []
+        self._sizes: List[Tuple[int, int]] = []
+        self._layout: List[Tuple[int, int, int]] = [] # (top, width, height) on the canvas
+        self._shown: Dict[int, tuple] = {} # page -> (canvas image item, image it shows)
+        self._images: "OrderedDict[Tuple[Path, int], ImageTk.PhotoImage]" = OrderedDict()
+        self._width = 0
+
+    def set_pages(self, paths: List[Path], sizes: List[Tuple[int, int]]):
+        """
+        Shows a new render: `paths` are the page PNGs, `sizes` their pixel
+        sizes. Page files are named after their content, so images already
+        decoded for unchanged pages are kept and only new pages are loaded.
+        """
+        current = set(paths)
+        for key in [k for k in self._images if k[0] not in current]:
+            del self._images[key]
+
+        self._paths, self._sizes = list(paths), list(sizes)
+        self._relayout()
+
+    def clear(self):
+        self.set_pages([], [])
+
+    def visible_pages(self) -> range:
+        """The pages in the viewport, so a refresh can render them first."""
+        if not self._layout:
+            return range(0)
+        top = self.canvas.canvasy(0)
+        return self.visible_range(self._layout, top, top + max(1, self.canvas.winfo_height()))
+
+    def _relayout(self):
+        self.canvas.delete("all")
+        self._shown.clear()
+        self._layout = self.compute_layout(self._sizes, self._width, self.PAGE_GAP)
+        bottom = self._layout[-1][0] + self._layout[-1][2] + self.PAGE_GAP if self._layout else 0
+        self.canvas.configure(scrollregion=(0, 0, self._width, bottom))
+        for top, width, height in self._layout:
+            x = (self._width - width) // 2
+            self.canvas.create_rectangle(x, top, x + width, top + height, fill="white", outline="")
+        self._refresh_visible()
+
+    @staticmethod
+    def compute_layout(sizes: List[Tuple[int, int]], width: int, gap: int) -> List[Tuple[int, int, int]]:
+        """Stacks the pages scaled to fit `width`; returns (top, width, height) per page."""
+        layout = []
+        top = gap
+        avail = max(1, width - 2 * gap)
+        for w, h in sizes:
+            scale = min(1.0, avail / w) if w else 1.0
+            sw, sh = max(1, int(w * scale)), max(1, int(h * scale))
+            layout.append((top, sw, sh))
+            top += sh + gap
+        return layout
+
+    @staticmethod
+    def visible_range(layout: List[Tuple[int, int, int]], top: float, bottom: float) -> range:
+        """Indices of the pages that intersect [top, bottom] on the canvas."""
+        import bisect
+        tops = [t for t, _, _ in layout]
+        first = max(0, bisect.bisect_right(tops, top) - 1)
+        last = bisect.bisect_right(tops, bottom)
+        while first < last and layout[first][0] + layout[first][2] < top:
+            first += 1
+        return range(first, last)
+
+    def _refresh_visible(self):
+        if not self._layout:
+            return
+        height = max(1, self.canvas.winfo_height())
+        view_top = self.canvas.canvasy(0)
+        margin = height * self.PRELOAD
+        wanted = self.visible_range(self._layout, view_top - margin, view_top + height + margin)
+
+        for page in [p for p in self._shown if p not in wanted]:
+            self.canvas.delete(self._shown.pop(page)[0])
+        for page in wanted:
+            if page in self._shown:
+                continue
+            image = self._get_image(page)
+            if image is None:
+                continue
+            top, width, _ = self._layout[page]
+            item = self.canvas.create_image((self._width - width) // 2, top, image=image, anchor="nw")
+            self._shown[page] = (item, image)
+
+    def _get_image(self, page: int):
+        top, width, height = self._layout[page]
+        key = (self._paths[page], width)
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+            return image
+        try:
+            with Image.open(self._paths[page]) as img:
+                image = ImageTk.PhotoImage(img.resize((width, height), Image.LANCZOS))
+        except OSError:
+            return None
+        self._images[key] = image
+        # Pages on screen hold their own reference, so eviction never blanks them
+        while len(self._images) > self.MAX_IMAGES:
+            self._images.popitem(last=False)
+        return image
+
+    def _on_resize(self, event):
+        if event.width != self._width:
+            self._width = event.width
+            self._images.clear() # Sized for the old width
+            self._relayout()
+        else:
+            self._refresh_visible()
+
+    def _on_scrollbar(self, *args):
+        self.canvas.yview(*args)
+        self._refresh_visible()
+
+    def _on_wheel(self, event):
+        self._scroll(-3 if event.delta > 0 else 3)
+
+    def _scroll(self, units: int):
+        self.canvas.yview_scroll(units, "units")
+        self._refresh_visible()
@@ -1,11 +1,18 @@
 
 import customtkinter as ctk
 
+# ProjectManifest.citation_mode values and their labels
+CITATION_MODES = {
+    "unified": "Pandoc (citeproc)",
+    "typst": "Typst (nativo)",
+    "none": "Nessuna",
+}
+
 class SettingsDialog(ctk.CTkToplevel):
     def __init__(self, master, current_manifest, citation_styles: list[str]):
         super().__init__(master)
         self.title("Impostazioni Progetto")
-        self.geometry("400x450")
+        self.geometry("400x500")
         self.result = None
         self.manifest = current_manifest
 
@@ -42,9 +49,16 @@ class SettingsDialog(ctk.CTkToplevel):
         self.combo_csl = ctk.CTkComboBox(self, values=citation_styles, variable=self.csl_var)
         self.combo_csl.grid(row=4, column=1, padx=10, pady=10, sticky="ew")
 
+        # Citation Mode
+        ctk.CTkLabel(self, text="Citazioni").grid(row=5, column=0, padx=10, pady=10, sticky="w")
+
+        self.mode_var = ctk.StringVar(value=CITATION_MODES.get(self.manifest.citation_mode, CITATION_MODES["unified"]))
+        self.combo_mode = ctk.CTkComboBox(self, values=list(CITATION_MODES.values()), variable=self.mode_var, state="readonly")
+        self.combo_mode.grid(row=5, column=1, padx=10, pady=10, sticky="ew")
+
         # Save Button
         self.btn_save = ctk.CTkButton(self, text="Salva", command=self.on_save)
-        self.btn_save.grid(row=5, column=0, columnspan=2, pady=20)
+        self.btn_save.grid(row=6, column=0, columnspan=2, pady=20)
 
     def on_save(self):
         self.result = {
@@ -52,6 +66,7 @@ class SettingsDialog(ctk.CTkToplevel):
             "candidate": self.entry_candidate.get(),
             "supervisor": self.entry_supervisor.get(),
             "year": self.entry_year.get(),
-            "citation_style": self.csl_var.get()
+            "citation_style": self.csl_var.get(),
+            "citation_mode": next((mode for mode, label in CITATION_MODES.items() if label == self.mode_var.get()), "unified")
         }
         self.destroy()
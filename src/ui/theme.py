@@ -84,6 +84,10 @@ class Theme:
             cls._current_mode = mode
             ctk.set_appearance_mode(mode)
 
+    @classmethod
+    def get_mode(cls):
+        return cls._current_mode
+
     @classmethod
     def toggle_mode(cls):
         new_mode = cls.MODE_LIGHT if cls._current_mode == cls.MODE_DARK else cls.MODE_DARK
@@ -5,7 +5,7 @@ from src.utils.i18n import I18N
 from src.ui.theme import Theme
 
 class ToolbarFrame(ctk.CTkFrame):
-    def __init__(self, master, command_compile=None, command_focus=None, **kwargs):
+    def __init__(self, master, command_compile=None, command_focus=None, command_compile_draft=None, **kwargs):
         super().__init__(master, height=40, fg_color="transparent", corner_radius=0, **kwargs)
         
         self.editor = None # To be set by App
@@ -69,6 +69,9 @@ class ToolbarFrame(ctk.CTkFrame):
         
         # Actions
         btn("eye", self.on_toggle_preview, "Attiva/Disattiva Anteprima") 
+
+        if command_compile_draft:
+            btn("play", command_compile_draft, "Bozza: compila solo questo capitolo")
         
         if command_focus:
             # Use 'maximize' or generic icon for Focus
@@ -1,8 +1,83 @@
 import markdown2
+import re
+from collections import OrderedDict
 from src.ui.theme import Theme
 from pathlib import Path
+from typing import List
+
+# Constructs that tie blocks together: [label]: url and [^note]: text definitions
+_CROSS_BLOCK_RE = re.compile(r"^ {0,3}\[[^\]]+\]:", re.MULTILINE)
+_FENCE_RE = re.compile(r"^ {0,3}(```|~~~)")
+_LIST_ITEM_RE = re.compile(r"^ {0,3}(?:[*+-]|\d+[.)])\s")
+_IMAGE_RE = re.compile(r'!\[(.*?)\]\((.*?)\)')
+_HEADER_ID_RE = re.compile(r'(<h[1-6] id=")([^"]*)(")')
+
+def strip_front_matter(md_text: str) -> str:
+    """Drops a leading YAML front matter block (--- ... --- or ...), which the preview doesn't show."""
+    lines = md_text.split("\n")
+    if lines and lines[0].strip() == "---":
+        for i in range(1, len(lines)):
+            if lines[i].strip() in ("---", "..."):
+                return "\n".join(lines[i + 1:])
+    return md_text
+
+def dedupe_header_ids(html: str) -> str:
+    """Numbers repeated header ids the way markdown2 does within one document (intro, intro-2, ...)."""
+    seen = set()
+    counts = {}
+    def renumber(match):
+        header_id = unique = match.group(2)
+        while unique in seen:
+            counts[header_id] = counts.get(header_id, 1) + 1
+            unique = f"{header_id}-{counts[header_id]}"
+        seen.add(unique)
+        return match.group(1) + unique + match.group(3)
+    return _HEADER_ID_RE.sub(renumber, html)
+
+def split_blocks(md_text: str) -> List[str]:
+    """
+    Splits markdown into top-level blocks at blank lines, keeping together
+    what markdown renders as one: fenced code, and list items or indented
+    continuations separated by blank lines.
+    """
+    blocks: List[List[str]] = []
+    current: List[str] = []
+    fence = None
+    for line in md_text.split("\n"):
+        if fence:
+            current.append(line)
+            if line.strip().startswith(fence):
+                fence = None
+            continue
+        if not line.strip():
+            if current:
+                blocks.append(current)
+                current = []
+            continue
+        if not current and blocks:
+            previous = blocks[-1]
+            continues = line[:1] in (" ", "\t") and not _FENCE_RE.match(line)
+            if continues or (_LIST_ITEM_RE.match(line) and _LIST_ITEM_RE.match(previous[0])):
+                current = blocks.pop() + [""]
+        fence_match = _FENCE_RE.match(line)
+        if fence_match:
+            fence = fence_match.group(1)
+        current.append(line)
+    if current:
+        blocks.append(current)
+    return ["\n".join(block) for block in blocks]
 
 class HTMLRenderer:
+    # Rendered HTML per (project, block), least recently used first
+    BLOCK_CACHE_SIZE = 2000
+    _block_cache: "OrderedDict[tuple, str]" = OrderedDict()
+    # Style block per theme mode
+    _styles = {}
+
+    # GFM extras. Front matter is stripped beforehand rather than with the
+    # metadata extra, which also swallows "Key: value" lines opening a block
+    EXTRAS = ["tables", "fenced-code-blocks", "task_list", "header-ids"]
+
     @staticmethod
     def get_styles() -> str:
         """Generates a CSS <style> block based on the current Theme."""
@@ -93,9 +168,53 @@ class HTMLRenderer:
 
     @classmethod
     def render(cls, md_text: str, project_path: Path = None) -> str:
-        """Converts markdown to full HTML string with styles."""
-        import re
-        
+        """
+        Converts markdown to full HTML string with styles.
+        Each top-level block is rendered once and cached, so after an edit
+        only the changed blocks go through markdown2 (header ids repeated
+        across blocks are then numbered as in a whole-document render).
+        Documents with reference or footnote definitions, which span
+        blocks, are rendered whole.
+        """
+        md_text = strip_front_matter(md_text)
+        if _CROSS_BLOCK_RE.search(md_text):
+            html_content = cls._render_markdown(md_text, project_path)
+        else:
+            html_content = "\n".join(cls._render_block(block, project_path) for block in split_blocks(md_text))
+            html_content = dedupe_header_ids(html_content)
+
+        mode = Theme.get_mode()
+        if mode not in cls._styles:
+            cls._styles[mode] = cls.get_styles()
+
+        full_html = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            {cls._styles[mode]}
+        </head>
+        <body>
+            {html_content}
+        </body>
+        </html>
+        """
+        return full_html
+
+    @classmethod
+    def _render_block(cls, block: str, project_path: Path = None) -> str:
+        key = (str(project_path), block)
+        html = cls._block_cache.get(key)
+        if html is not None:
+            cls._block_cache.move_to_end(key)
+            return html
+        html = cls._render_markdown(block, project_path)
+        cls._block_cache[key] = html
+        if len(cls._block_cache) > cls.BLOCK_CACHE_SIZE:
+            cls._block_cache.popitem(last=False)
+        return html
+
+    @classmethod
+    def _render_markdown(cls, md_text: str, project_path: Path = None) -> str:
         # Pre-process image paths: ![alt](relative/path) -> ![alt](file:///absolute/path)
         processed_md = md_text
         if project_path:
@@ -109,22 +228,6 @@ class HTMLRenderer:
                 abs_path = (project_path / rel_path).resolve().as_posix()
                 return f'![{alt}](file:///{abs_path})'
             
-            processed_md = re.sub(r'!\[(.*?)\]\((.*?)\)', replace_path, md_text)
+            processed_md = _IMAGE_RE.sub(replace_path, md_text)
 
-        # Enable GFM extras
-        extras = ["tables", "fenced-code-blocks", "task_list", "header-ids", "metadata"]
-        
-        html_content = markdown2.markdown(processed_md, extras=extras)
-        
-        full_html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            {cls.get_styles()}
-        </head>
-        <body>
-            {html_content}
-        </body>
-        </html>
-        """
-        return full_html
+        return markdown2.markdown(processed_md, extras=cls.EXTRAS)
@@ -0,0 +1,82 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Tags produced by the tokenizer (configured on the editor's text widget)
+TAGS = ("h1", "h2", "h3", "md_marker", "bold", "italic", "link", "code")
+
+# Opening/closing line of a fenced code block
+FENCE_RE = re.compile(r"^ {0,3}```", re.MULTILINE)
+
+_HEADING_RE = re.compile(r"(#{1,3})\s+")
+# One alternation instead of a pass per construct; the leftmost match wins
+_INLINE_RE = re.compile(r"(?P<bold>\*\*(?P<bold_text>.+?)\*\*)"
+                        r"|(?P<italic>_(?P<italic_text>.+?)_)"
+                        r"|(?P<link>\[(?P<link_text>.+?)\]\(.+?\))")
+# Markers before the text of each inline construct
+_OPEN_LEN = {"bold": 2, "italic": 1, "link": 1}
+
+Span = Tuple[str, int, int]  # (tag, start column, end column)
+
+def tokenize_line(line: str) -> List[Span]:
+    """
+    Highlighting spans of one line outside code blocks, in a single scan:
+    headings (h1-h3), bold, italic and links, plus md_marker on the markup
+    characters. Bold and link text is scanned again for nested constructs.
+    """
+    spans: List[Span] = []
+    heading = _HEADING_RE.match(line)
+    if heading:
+        level = len(heading.group(1))
+        spans.append((f"h{level}", 0, len(line)))
+        # Only the '#'s and the space after them are elided
+        spans.append(("md_marker", 0, level + 1))
+    _tokenize_inline(line, 0, len(line), spans)
+    return spans
+
+def _tokenize_inline(line: str, start: int, end: int, spans: List[Span]):
+    for m in _INLINE_RE.finditer(line, start, end):
+        kind = m.lastgroup # The outer group closes last
+        text_start, text_end = m.start(f"{kind}_text"), m.end(f"{kind}_text")
+        spans.append((kind, text_start, text_end))
+        spans.append(("md_marker", m.start(), m.start() + _OPEN_LEN[kind]))
+        spans.append(("md_marker", text_end, m.end()))
+        if kind != "italic":
+            _tokenize_inline(line, text_start, text_end, spans)
+
+def tokenize_lines(lines: List[str], first_line: int = 1, in_code: bool = False) -> Tuple[Dict[str, List[Tuple[int, int, int]]], bool]:
+    """
+    Spans of consecutive lines, grouped by tag as (line number, start
+    column, end column), so each tag can be applied in one call. Fenced
+    code blocks (fences included) get only the code tag. `in_code` says
+    whether `lines[0]` (line number `first_line`) is inside a code block;
+    the state after the last line is returned along with the spans.
+    """
+    ranges: Dict[str, List[Tuple[int, int, int]]] = {tag: [] for tag in TAGS}
+    code = ranges["code"]
+    for number, line in enumerate(lines, first_line):
+        if FENCE_RE.match(line):
+            in_code = not in_code
+            code.append((number, 0, len(line)))
+        elif in_code:
+            code.append((number, 0, len(line)))
+        else:
+            for tag, start, end in tokenize_line(line):
+                ranges[tag].append((number, start, end))
+    return ranges, in_code
+
+def code_state_before(text: str) -> bool:
+    """Whether the line right after `text` starts inside a fenced code block."""
+    return len(FENCE_RE.findall(text)) % 2 == 1
+
+def extract_headings(text: str) -> List[Tuple[int, str, str]]:
+    """(level, title, "line.0" index) of the level 1-3 headings outside code blocks."""
+    headings = []
+    in_code = False
+    for number, line in enumerate(text.split("\n"), 1):
+        if FENCE_RE.match(line):
+            in_code = not in_code
+            continue
+        heading = None if in_code else _HEADING_RE.match(line)
+        if heading:
+            headings.append((len(heading.group(1)), line[heading.end():], f"{number}.0"))
+    return headings
@@ -16,6 +16,16 @@ def get_base_path() -> Path:
     # So base is 3 levels up: src/utils/ -> src/ -> APP_ROOT
     return Path(__file__).resolve().parent.parent.parent
 
+def get_cache_dir() -> Path:
+    """The per-user cache directory of the app (not created here)."""
+    if sys.platform == "win32":
+        root = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+    elif sys.platform == "darwin":
+        root = Path.home() / "Library" / "Caches"
+    else:
+        root = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(root) / "thesisflow"
+
 def get_bin_dir() -> Path:
     return get_base_path() / "bin"
 
@@ -23,30 +33,15 @@ def get_templates_dir() -> Path:
     return get_base_path() / "templates"
 
 def get_pandoc_exe() -> Path:
-    exe_name = "pandoc.exe" if sys.platform == "win32" else "pandoc"
-    # First check bundled bin
-    bundled = get_bin_dir() / exe_name
-    if bundled.exists():
-        return bundled
-    # Fallback to system path
-    system_path = shutil.which("pandoc")
-    if system_path:
-        return Path(system_path)
-    return bundled # Return bundled path even if missing, to avoid None crashes upstream, or handle there
+    """The pandoc binary: bundled in bin/, else on PATH (resolved once, see engine.toolchain)."""
+    from src.engine.toolchain import get_toolchain
+    return get_toolchain().exe("pandoc")
 
 def get_typst_exe() -> Path:
-    exe_name = "typst.exe" if sys.platform == "win32" else "typst"
-    bundled = get_bin_dir() / exe_name
-    if bundled.exists():
-        return bundled
-    # Fallback to system path
-    system_path = shutil.which("typst")
-    if system_path:
-        return Path(system_path)
-    return bundled
+    """The typst binary: bundled in bin/, else on PATH (resolved once, see engine.toolchain)."""
+    from src.engine.toolchain import get_toolchain
+    return get_toolchain().exe("typst")
 
 def get_resource_path(relative_path: str) -> Path:
     """Helper to get a resource path relative to the base path."""
     return get_base_path() / relative_path
-
-import shutil
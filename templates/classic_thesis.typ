@@ -24,7 +24,7 @@
 #show heading: set block(above: 1.4em, below: 1em)
 #set heading(numbering: "1.1")
 
-// Title Page
+// --- Front Page ---
 #align(center + horizon)[
   #text(2em, weight: "bold")[#title]
   
@@ -39,6 +39,7 @@
 ]
 
 #pagebreak()
+// ----------------
 
 // TOC
 #outline(depth: 3, indent: true)
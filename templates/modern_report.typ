@@ -28,7 +28,7 @@
 ]
 #set heading(numbering: "1.1")
 
-// Title Page
+// --- Front Page ---
 #align(center + horizon)[
   #rect(fill: primary_color, width: 100%, height: 4em, radius: 1em)[
     #align(center + horizon)[
@@ -47,6 +47,7 @@
 ]
 
 #pagebreak()
+// ----------------
 
 // TOC
 #outline(indent: auto)
@@ -0,0 +1,13 @@
+= Stato dell’arte
+<stato-dellarte>
+Le prime architetture orientate ai servizi sono descritte da
+#cite(<fowler2014>, form: "prose");, mentre una rassegna più recente si
+trova in @dragoni2017. Secondo #cite(<newman2015>, form: "prose") la
+decomposizione in servizi va guidata dal dominio
+(#cite(<evans2003>, form: "prose");), come discusso anche nella
+documentazione ufficiale
+(#link("https://kubernetes.io/docs/home/")[Kubernetes];).
+
+Per approfondimenti si veda il sito
+#link("https://opentelemetry.io")[del progetto #emph[OpenTelemetry];] e
+la specifica pubblicata dal W3C.
@@ -0,0 +1,19 @@
+== Risultati sperimentali
+<risultati-sperimentali>
+I risultati sono riassunti nella figura seguente.
+
+#figure(image("assets/latenza.png"),
+  caption: [
+    Latenza media al variare del numero di servizi coinvolti nella
+    richiesta, misurata su 10 ripetizioni
+  ]
+)
+
+Come si vede, la crescita è #emph[approssimativamente lineare] fino a
+otto servizi.
+
+#figure(image("assets/throughput.png"),
+  caption: [
+    Throughput
+  ]
+)
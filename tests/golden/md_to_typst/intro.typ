@@ -0,0 +1,24 @@
+= Introduzione
+<introduzione>
+Questa tesi analizza l’impatto delle architetture a microservizi sulle
+prestazioni dei sistemi distribuiti. Il lavoro nasce da un’esperienza di
+tirocinio presso un’azienda del settore e si propone di misurare, con
+metodi riproducibili, i costi nascosti della comunicazione tra servizi…
+e di proporre alcune contromisure.
+
+== Obiettivi
+<obiettivi>
+L’obiettivo principale è #emph[quantificare] la latenza introdotta dalla
+rete, mentre quello secondario è #strong[ridurla] senza modificare il
+codice applicativo. Come osservato dal Prof.~Rossi, e.g.~nei sistemi con
+molte dipendenze, la latenza di coda domina il tempo di risposta
+complessivo.
+
+== Struttura della tesi
+<struttura-della-tesi>
+Il capitolo 2 descrive lo stato dell’arte, il capitolo 3 la metodologia
+– con particolare attenzione agli strumenti di misura — e il capitolo 4
+i risultati.
+
+= Introduzione
+<introduzione-1>
@@ -0,0 +1,17 @@
+= Metodologia
+<metodologia>
+Gli esperimenti sono stati condotti in tre fasi:
+
++ preparazione dell’ambiente di prova, con cluster di dimensioni
+  crescenti e configurazioni di rete differenti;
++ esecuzione dei carichi di lavoro sintetici;
++ raccolta e analisi dei dati.
+
+Per ogni fase sono stati registrati i seguenti parametri:
+
+- tempo di risposta medio e al novantanovesimo percentile;
+- utilizzo della CPU e della memoria di ciascun nodo;
+- numero di richieste fallite, distinte per `codice_errore`.
+
+I file di configurazione usano chiavi come `max_connections` e nomi in
+snake\_case.
@@ -0,0 +1,14 @@
+= Modello analitico
+<modello-analitico>
+Sia $n$ il numero di servizi e $lambda$ il tasso di arrivo delle
+richieste. Il tempo di risposta atteso vale $T = frac(1, mu - lambda)$
+per ciascun servizio, con $mu > lambda$, e la latenza totale è la somma
+$L = sum_(i = 1)^n T_i$.
+
+$ sigma^2 = 1 / n sum_(i = 1)^n (x_i - m)^2 $
+
+Per $n arrow.r oo$ la distribuzione di $L$ tende a una normale con
+varianza $n sigma^2$, e la probabilità di superare la soglia $theta$ è
+$P (L > theta)$.
+
+$ E = m c^2 $
@@ -0,0 +1,13 @@
+= Casi limite di impaginazione
+<casi-limite-di-impaginazione>
+Questa riga di prova è lunga esattamente quanto serve perché la parola
+\-continua cada a inizio riga e venga protetta, così come i casi
+seguenti che hanno bisogno di alcune parole di riempimento prima di
+andare a capo: +più e anche =uguale e infine /barra che a inizio riga
+sarebbero markup per Typst. Le doppie barre \/\/ vengono sempre
+protette, come i caratteri \# e \@ nel testo (per esempio C\# e
+utente\@example.com), e gli a#emph[b];c diventano enfasi intraparola.
+Una parola lunghissima come
+supercalifragilistichespiralidosoesagerataeinfinitamente va su una riga
+da sola se non ci sta, insieme a #emph[\-enfasi che inizia con un
+trattino];.
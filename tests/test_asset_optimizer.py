@@ -0,0 +1,84 @@
+import pytest
+from PIL import Image
+from src.engine.asset_optimizer import AssetOptimizer, QUALITY_PRESETS
+
+@pytest.fixture
+def project(tmp_path):
+    assets = tmp_path / "assets"
+    assets.mkdir()
+    Image.new("RGB", (3000, 2000), "red").save(assets / "foto.jpg", quality=95)
+    Image.new("RGB", (400, 300), "blue").save(assets / "schema.png")
+    (assets / "logo.svg").write_text("<svg/>", encoding="utf-8")
+    return tmp_path
+
+def test_large_images_get_cached_variants(project):
+    """Oversized images are downscaled once; small ones and other formats keep the original."""
+    draft = QUALITY_PRESETS["draft"]
+    optimizer = AssetOptimizer(project, draft)
+    markdown = "![Foto](assets/foto.jpg)\n\n![Schema](assets/schema.png) ![Logo](assets/logo.svg) ![X](assets/missing.png)"
+
+    paths = optimizer.prepare(optimizer.find_references(markdown))
+    assert optimizer.written == 1
+    assert paths["assets/schema.png"] == "/assets/schema.png"
+    assert paths["assets/logo.svg"] == "/assets/logo.svg"
+    assert "assets/missing.png" not in paths
+
+    variant = project / paths["assets/foto.jpg"].lstrip("/")
+    assert variant.parent == project / ".thesis_data" / "assets" / "draft"
+    with Image.open(variant) as img:
+        assert img.size == (draft.max_width_px, round(2000 * draft.max_width_px / 3000))
+
+    rewritten = optimizer.rewrite(markdown)
+    assert f"![Foto]({paths['assets/foto.jpg']})" in rewritten
+    assert "![X](assets/missing.png)" in rewritten
+
+    # Same source and settings: nothing to do, also for a new optimizer
+    again = AssetOptimizer(project, draft)
+    assert again.prepare(["assets/foto.jpg"]) == {"assets/foto.jpg": paths["assets/foto.jpg"]}
+    assert again.written == 0
+
+    # The final quality has its own variants
+    final = AssetOptimizer(project, QUALITY_PRESETS["final"]).prepare(["assets/foto.jpg"])
+    assert final["assets/foto.jpg"] != paths["assets/foto.jpg"]
+
+    # A changed source replaces its old variant
+    Image.new("RGB", (3000, 2000), "green").save(project / "assets" / "foto.jpg")
+    changed = AssetOptimizer(project, draft).prepare(["assets/foto.jpg"])
+    assert changed["assets/foto.jpg"] != paths["assets/foto.jpg"]
+    assert not variant.exists()
+
+def test_same_named_assets_keep_their_variants(project):
+    """Assets with the same file name in different folders don't replace each other's variants."""
+    for folder, color in (("a", "red"), ("b", "green")):
+        (project / "assets" / folder).mkdir()
+        Image.new("RGB", (3000, 2000), color).save(project / "assets" / folder / "foto.jpg")
+    refs = ["assets/a/foto.jpg", "assets/b/foto.jpg"]
+
+    paths = AssetOptimizer(project, QUALITY_PRESETS["draft"]).prepare(refs)
+    assert paths[refs[0]] != paths[refs[1]]
+    assert all((project / paths[ref].lstrip("/")).exists() for ref in refs)
+
+    again = AssetOptimizer(project, QUALITY_PRESETS["draft"])
+    assert again.prepare(refs) == paths
+    assert again.written == 0
+
+def test_chapters_reference_variants(project_manager):
+    """With an optimizer, chapters are converted with the variant paths."""
+    from unittest.mock import Mock
+    project_manager.create_project("AssetsTest", "Me")
+    project_path = project_manager.current_project_path
+    Image.new("RGB", (4000, 3000), "red").save(project_path / "assets" / "foto.jpg")
+    chapter = project_manager.manifest.chapters[0]
+    project_manager.save_file_content(project_path / "chapters" / chapter.filename, "![Foto](assets/foto.jpg)")
+
+    converted = {}
+    pandoc = Mock()
+    pandoc.get_version.return_value = "pandoc 3.1"
+    pandoc.get_conversion_flags.return_value = ["--to", "typst"]
+    pandoc.try_fast_convert.side_effect = lambda md: converted.setdefault("md", md)
+    temp_dir = project_path / ".thesis_data" / "temp"
+    temp_dir.mkdir(parents=True)
+    optimizer = AssetOptimizer(project_path, QUALITY_PRESETS["final"])
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1, assets=optimizer)
+
+    assert converted["md"].startswith("![Foto](/.thesis_data/assets/final/foto-")
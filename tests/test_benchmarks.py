@@ -0,0 +1,42 @@
+import json
+import sys
+import pytest
+from benchmarks.synthetic import SyntheticSpec, generate_project
+
+def test_generate_project_shape(tmp_path):
+    """The generated project has the requested chapters, paragraphs, citations and images."""
+    spec = SyntheticSpec(chapters=3, paragraphs=2, words=10, citations=4, images=2, image_size=(64, 48))
+    pm = generate_project(tmp_path, "Synthetic", spec)
+    project_path = pm.current_project_path
+
+    assert [c.title for c in pm.manifest.chapters] == ["Capitolo 1", "Capitolo 2", "Capitolo 3"]
+    assert all(len(c.paragraphs) == 2 for c in pm.manifest.chapters)
+    markdown = "\n".join(pm._resolve_chapter_markdown(c) for c in pm.manifest.chapters)
+    assert all(f"[@ref{i:03d}]" in markdown for i in range(4))
+    assert markdown.count("![Figura") == 2
+    assert len(list((project_path / "assets").glob("*.png"))) == 2
+
+    # Same seed, same text
+    again = generate_project(tmp_path, "Synthetic2", spec)
+    assert "\n".join(again._resolve_chapter_markdown(c) for c in again.manifest.chapters) == markdown
+
+@pytest.mark.skipif(sys.platform == "win32", reason="The fake tools are POSIX shebang scripts")
+def test_pipeline_benchmark_smoke(tmp_path):
+    """Every scenario builds with the fake tools; the no-op build converts and rewrites nothing."""
+    from benchmarks.pipeline import main
+    output = tmp_path / "bench.json"
+    code = main(["--chapters", "3", "--paragraphs", "2", "--words", "20", "--citations", "2", "--jobs", "2",
+                 "--pandoc-latency", "0", "--typst-latency", "0", "--work-dir", str(tmp_path / "work"), "-o", str(output)])
+    assert code == 0
+
+    results = json.loads(output.read_text(encoding="utf-8"))
+    assert results["environment"]["pandoc"].startswith("pandoc")
+    scenarios = results["scenarios"]
+    assert set(scenarios) == {"cold", "noop", "edit", "serial"}
+    assert all(s["median_wall_s"] is not None for s in scenarios.values())
+
+    noop = scenarios["noop"]["runs"][0]
+    assert "pandoc" not in noop["stages"]
+    assert noop["write"]["files_rewritten"] == 0
+    edit = scenarios["edit"]["runs"][0]
+    assert edit["write"]["files_rewritten"] >= 1
@@ -0,0 +1,106 @@
+from unittest.mock import Mock
+from src.engine.build_cache import BuildCache
+
+def test_key_depends_on_inputs():
+    """Markdown, pandoc version and flags all contribute to the key."""
+    base = BuildCache.make_key("# A", "pandoc 3.1", ["--to", "typst"])
+    assert base == BuildCache.make_key("# A", "pandoc 3.1", ["--to", "typst"])
+    assert base != BuildCache.make_key("# B", "pandoc 3.1", ["--to", "typst"])
+    assert base != BuildCache.make_key("# A", "pandoc 3.2", ["--to", "typst"])
+    assert base != BuildCache.make_key("# A", "pandoc 3.1", ["--to", "typst", "--citeproc"])
+
+def test_put_get_and_persistence(tmp_path):
+    """Entries survive a reload of the index."""
+    cache = BuildCache(tmp_path / "cache")
+    assert cache.get("k1") is None
+    cache.put("k1", "= Title")
+    cache.mark_current("c1", "k1")
+    cache.save()
+
+    reloaded = BuildCache(tmp_path / "cache")
+    assert reloaded.get("k1") == "= Title"
+    assert reloaded.is_current("c1", "k1")
+    assert not reloaded.is_current("c1", "k2")
+
+def test_lru_eviction(tmp_path):
+    """The least recently used entry is evicted when over the size cap."""
+    cache = BuildCache(tmp_path / "cache", max_bytes=25)
+    cache.put("old", "x" * 10)
+    cache.put("new", "y" * 10)
+    cache.get("old")  # touch: "new" becomes the LRU entry
+    cache.put("third", "z" * 10)
+
+    assert cache.get("new") is None
+    assert cache.get("old") == "x" * 10
+    assert cache.get("third") == "z" * 10
+    assert cache.total_size() <= 25
+    assert not (cache.blobs_dir / "new.typ").exists()
+
+def test_build_by_another_manager_is_seen(project_manager):
+    """Outputs rewritten by another process's build are not taken as current (e.g. daemon after --no-daemon)."""
+    from src.engine.project_manager import ProjectManager
+    project_manager.create_project("Shared Cache", "Me")
+    project_path = project_manager.current_project_path
+    chapter = project_manager.manifest.chapters[0]
+    chapter_path = project_path / "chapters" / chapter.filename
+    temp_dir = project_path / ".thesis_data" / "temp"
+    temp_dir.mkdir(parents=True)
+
+    pandoc = Mock()
+    pandoc.get_version.return_value = "pandoc 3.1"
+    pandoc.get_conversion_flags.return_value = ["--to", "typst"]
+    pandoc.select_batchable.side_effect = lambda docs: [False] * len(docs)
+    pandoc.try_fast_convert.return_value = None
+    pandoc.convert_markdown_to_typst.side_effect = lambda md, path: path.write_text(md.upper(), encoding="utf-8")
+
+    project_manager.save_file_content(chapter_path, "first")
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1)
+
+    other = ProjectManager(projects_root=project_path.parent)
+    other.load_project(project_path)
+    other.save_file_content(chapter_path, "second")
+    other._convert_chapters(pandoc, temp_dir, jobs=1)
+
+    project_manager.save_file_content(chapter_path, "first")
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1)
+    assert (temp_dir / f"{chapter.id}.typ").read_text(encoding="utf-8") == "FIRST"
+
+def test_unchanged_chapter_skips_pandoc(project_manager):
+    """A second conversion of unchanged markdown does not call pandoc."""
+    from src.engine.output_writer import OutputWriter
+    project_manager.create_project("Cache Test", "Me")
+    chapter = project_manager.manifest.chapters[0]
+    chapter_path = project_manager.current_project_path / "chapters" / chapter.filename
+    temp_dir = project_manager.current_project_path / ".thesis_data" / "temp"
+    typ_path = temp_dir / f"{chapter.id}.typ"
+    temp_dir.mkdir(parents=True)
+
+    pandoc = Mock()
+    pandoc.get_version.return_value = "pandoc 3.1"
+    pandoc.get_conversion_flags.return_value = ["--to", "typst"]
+    pandoc.try_fast_convert.return_value = None
+    pandoc.convert_markdown_to_typst.side_effect = lambda md, path: path.write_text("= Out", encoding="utf-8")
+
+    project_manager.save_file_content(chapter_path, "# In")
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1)
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1)
+    assert pandoc.convert_markdown_to_typst.call_count == 1
+
+    # Output deleted: restored from the cache, still without pandoc
+    typ_path.unlink()
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1)
+    assert typ_path.read_text(encoding="utf-8") == "= Out"
+    assert pandoc.convert_markdown_to_typst.call_count == 1
+
+    # _restore_cached: a hit when the output on disk is current, a miss for an unknown key
+    cache = project_manager.get_build_cache()
+    key = cache.make_key("# In", "pandoc 3.1", ["--to", "typst"])
+    writer = OutputWriter()
+    assert project_manager._restore_cached(cache, chapter, key, typ_path, writer)
+    assert writer.rewritten == 0
+    assert not project_manager._restore_cached(cache, chapter, "unknown", typ_path, writer)
+
+    # Changed content: converted again
+    project_manager.save_file_content(chapter_path, "# Changed")
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1)
+    assert pandoc.convert_markdown_to_typst.call_count == 2
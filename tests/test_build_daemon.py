@@ -0,0 +1,109 @@
+import socket
+import sys
+import tempfile
+import threading
+import pytest
+from src.engine.build_daemon import BuildDaemon, BuildDaemonClient, default_socket_path
+from src.engine.compile_scheduler import CompileJob
+from src.engine.compiler import AsyncCompiler, CompilationCancelled, CompilationError
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Unix sockets")
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    socket_path = tmp_path / "d.sock"
+    monkeypatch.setenv("THESISFLOW_DAEMON_SOCKET", str(socket_path))
+    daemon = BuildDaemon(socket_path)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if BuildDaemonClient.connect(socket_path):
+            break
+        thread.join(0.02)
+    yield daemon
+    daemon.shutdown()
+    thread.join(5)
+    assert not socket_path.exists()
+
+@pytest.fixture
+def fake_tools(mocker):
+    pandoc = mocker.patch("src.engine.pandoc_wrapper.PandocWrapper").return_value
+    pandoc.get_version.return_value = "pandoc 3.1"
+    pandoc.get_conversion_flags.return_value = ["--to", "typst"]
+    pandoc.try_fast_convert.return_value = "= X\n"
+    release = threading.Event()
+    def fake_compile(self, project_path, written_at=None, input_file=None, output_file=None):
+        if (project_path / "SLOW").exists() and not release.wait(10):
+            raise AssertionError("not cancelled")
+        if self.on_output:
+            self.on_output("compiled")
+        pdf = project_path / "out.pdf"
+        pdf.write_bytes(b"%PDF")
+        return pdf
+    mocker.patch.object(AsyncCompiler, "compile_sync", fake_compile)
+    mocker.patch.object(AsyncCompiler, "cancel", lambda self: release.set())
+    return pandoc
+
+def test_builds_run_in_the_daemon(daemon, fake_tools, project_manager):
+    """run_build goes through the daemon: same result, metrics and output as in-process."""
+    project_manager.create_project("DaemonTest", "Me")
+    project_path = project_manager.current_project_path
+    job = CompileJob(project_path)
+    lines, stages = [], []
+
+    pdf = project_manager.run_build(job, on_output=lines.append, on_metrics=stages.append)
+    assert pdf == project_path / "out.pdf"
+    assert lines == ["[typst] compiled"]
+    assert [s.stage for s in job.metrics.stages] == [s.stage for s in stages]
+    assert "typst" in [s.stage for s in stages]
+
+    status = BuildDaemonClient.connect().status()
+    assert status["projects"] == [str(project_path.resolve())] and status["jobs"] == []
+
+    # Without a daemon, the same call builds in-process
+    project_manager.use_daemon = False
+    assert project_manager.run_build(CompileJob(project_path)) == pdf
+
+def test_cancelling_the_local_job_cancels_the_build(daemon, fake_tools, project_manager):
+    """Cancelling the client's job cancels the daemon's build."""
+    project_manager.create_project("DaemonCancel", "Me")
+    project_path = project_manager.current_project_path
+    (project_path / "SLOW").touch()
+    job = CompileJob(project_path)
+    threading.Timer(0.3, job.cancel).start()
+    with pytest.raises(CompilationCancelled):
+        project_manager.run_build(job)
+
+def test_fallback_socket_is_in_a_private_directory(tmp_path, monkeypatch):
+    """Without a runtime dir, the socket goes in a 0700 directory, and a foreign one is refused."""
+    monkeypatch.delenv("THESISFLOW_DAEMON_SOCKET", raising=False)
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    path = default_socket_path()
+    assert path.parent.parent == tmp_path and path.parent.stat().st_mode & 0o777 == 0o700
+
+    path.parent.chmod(0o755) # e.g. created by someone else beforehand
+    with pytest.raises(PermissionError):
+        default_socket_path()
+    assert BuildDaemonClient.connect() is None
+
+def test_client_ignores_sockets_others_can_use(daemon, tmp_path):
+    """A socket with group/other permissions isn't trusted."""
+    socket_path = tmp_path / "d.sock"
+    assert BuildDaemonClient.connect(socket_path)
+    socket_path.chmod(0o666)
+    assert BuildDaemonClient.connect(socket_path) is None
+    socket_path.chmod(0o600)
+
+def test_silent_daemon_times_out(tmp_path, monkeypatch):
+    """A daemon that stops answering mid-build fails the build instead of hanging it."""
+    socket_path = tmp_path / "hung.sock"
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(socket_path))
+    server.listen()
+    monkeypatch.setattr(BuildDaemonClient, "READ_TIMEOUT", 0.2)
+    try:
+        with pytest.raises(CompilationError):
+            BuildDaemonClient(socket_path).build(tmp_path)
+    finally:
+        server.close()
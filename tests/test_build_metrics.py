@@ -0,0 +1,78 @@
+import json
+import subprocess
+import sys
+import pytest
+from src.engine.build_metrics import BuildMetrics, MeasuredPopen, StageMetrics, format_stage, format_summary, run_child
+
+def test_measure_records_stage():
+    """measure() times the block and notifies the listener."""
+    seen = []
+    metrics = BuildMetrics(on_stage=seen.append)
+    with metrics.measure("write") as m:
+        m.bytes_written = 2048
+
+    assert seen == metrics.stages
+    assert seen[0].stage == "write" and seen[0].wall_s >= 0
+    assert seen[0].child_cpu_s is None
+    assert "2.0 KB" in format_stage(seen[0])
+
+@pytest.mark.skipif(sys.platform == "win32", reason="os.wait4 is Unix only")
+def test_measure_tracks_children():
+    """Each child is measured on its own and charged to the stages that ran it."""
+    import resource
+    metrics = BuildMetrics()
+    own_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+    big = [sys.executable, "-c", f"b = bytearray({own_mb + 64} * 1024 * 1024)"]
+    with metrics.measure("conversion", track_children=True):
+        with metrics.measure("pandoc", "Intro", track_children=True):
+            run_child([sys.executable, "-c", "sum(range(3_000_000))"])
+        with metrics.measure("typst", track_children=True):
+            run_child(big)
+        subprocess.run([sys.executable, "-c", "pass"]) # Not measured
+
+    pandoc, typst, conversion = metrics.stages
+    assert pandoc.child_cpu_s > 0
+    assert pandoc.peak_child_rss_kb is None # Not above this process's own
+    assert typst.peak_child_rss_kb > (own_mb + 64) * 1024
+    assert conversion.child_cpu_s == pytest.approx(pandoc.child_cpu_s + typst.child_cpu_s)
+    assert conversion.peak_child_rss_kb == typst.peak_child_rss_kb
+
+    # Children started before the stage don't show up in it
+    with metrics.measure("write", track_children=True):
+        pass
+    assert metrics.stages[-1].child_cpu_s == 0 and metrics.stages[-1].peak_child_rss_kb is None
+
+@pytest.mark.skipif(sys.platform == "win32", reason="os.wait4 is Unix only")
+def test_children_reaped_by_poll_are_measured():
+    """poll() reaps through wait4 too, and polling from another thread doesn't lose wait()'s status."""
+    import threading
+    metrics = BuildMetrics()
+    busy = [sys.executable, "-c", "sum(range(3_000_000)); raise SystemExit(3)"]
+    with metrics.measure("typst", track_children=True):
+        process = MeasuredPopen(busy)
+        while process.poll() is None:
+            pass
+    assert process.returncode == 3 and metrics.stages[-1].child_cpu_s > 0
+
+    for timeout in (None, 30):
+        process = MeasuredPopen(busy)
+        poller = threading.Thread(target=lambda: [process.poll() for _ in range(10_000)])
+        poller.start()
+        assert process.wait(timeout) == 3
+        poller.join()
+
+def test_metrics_log_and_summary(tmp_path):
+    """Each build is appended as one JSON line; the summary totals per stage."""
+    metrics = BuildMetrics()
+    metrics.add(StageMetrics("pandoc", "Intro", wall_s=0.5, bytes_written=10))
+    metrics.add(StageMetrics("pandoc", "Fine", wall_s=0.25, bytes_written=5))
+    metrics.append_to_log(tmp_path, "ok")
+    metrics.append_to_log(tmp_path, "error")
+
+    lines = (tmp_path / "build_metrics.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(l)["status"] for l in lines] == ["ok", "error"]
+    assert json.loads(lines[0])["stages"][1]["name"] == "Fine"
+
+    totals = metrics.summary()["pandoc"]
+    assert totals["count"] == 2 and totals["wall_s"] == 0.75 and totals["bytes_written"] == 15
+    assert "pandoc" in format_summary(metrics)
@@ -0,0 +1,82 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+from src import main_cli
+from src.engine.compiler import AsyncCompiler
+
+def test_cli_does_not_import_tk():
+    """The headless entry point must work without a display or Tk."""
+    code = "import sys, src.main_cli; print(any(m.startswith(('tkinter', 'customtkinter')) for m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         cwd=Path(__file__).parent.parent)
+    assert out.stdout.strip() == "False", out.stderr
+
+def test_cli_build_only_with_timings(project_manager, mocker, tmp_path, capsys):
+    """build --only converts the selected chapters and prints a JSON summary."""
+    project_manager.create_project("CliTest", "Me")
+    keep = project_manager.create_chapter("Kept")
+    project_path = project_manager.current_project_path
+
+    pandoc = mocker.patch("src.engine.pandoc_wrapper.PandocWrapper").return_value
+    pandoc.get_version.return_value = "pandoc 3.1"
+    pandoc.get_conversion_flags.return_value = ["--to", "typst"]
+    pandoc.try_fast_convert.return_value = None
+    pandoc.convert_markdown_to_typst.side_effect = lambda md, path: path.write_text("= X\n", encoding="utf-8")
+
+    def fake_compile(self, project_path, written_at=None):
+        pdf = project_path / "out.pdf"
+        pdf.write_bytes(b"%PDF")
+        return pdf
+    mocker.patch.object(AsyncCompiler, "compile_sync", fake_compile)
+
+    output = tmp_path / "dist" / "thesis.pdf"
+    capsys.readouterr() # Drop the project setup output
+    code = main_cli.main(["build", str(project_path), "--only", keep.id, "-j", "2",
+                          "--output", str(output), "--timings", "-"])
+
+    assert code == 0
+    summary = json.loads(capsys.readouterr().out)
+    assert summary["status"] == "ok" and summary["pdf"] == str(output)
+    assert summary["by_stage"]["pandoc"]["count"] == 1
+    assert output.read_bytes() == b"%PDF"
+    body = (project_path / ".thesis_data" / "temp" / "compiled_body.typ").read_text(encoding="utf-8")
+    assert body == f'#include "{keep.id}.typ"'
+
+def test_cli_build_unknown_chapter(project_manager, mocker):
+    """Unknown --only ids fail the build with a non-zero exit code."""
+    project_manager.create_project("CliFail", "Me")
+    pandoc = mocker.patch("src.engine.pandoc_wrapper.PandocWrapper").return_value
+    pandoc.get_version.return_value = "pandoc 3.1"
+    pandoc.get_conversion_flags.return_value = []
+
+    assert main_cli.main(["build", str(project_manager.current_project_path), "--only", "nope"]) == 1
+
+def test_batch_builder_isolates_failures(temp_project_dir, mocker):
+    """A broken project is reported without stopping the others."""
+    from src.engine.project_manager import ProjectManager
+    from src.engine.batch_builder import BatchBuilder, build_project_worker
+    pm = ProjectManager(projects_root=temp_project_dir)
+    good = pm.create_project("Good", "Me")
+    bad = pm.create_project("Bad", "Me")
+    (bad / ".thesis_data" / "manifest.json").write_text("{ not json", encoding="utf-8")
+
+    def fake_worker(project_path, jobs=1, incremental=True):
+        if Path(project_path).name == "Bad":
+            return build_project_worker(project_path, jobs, incremental)
+        return {"project": project_path, "name": "Good", "status": "ok", "duration_s": 0.1,
+                "pdf": "x.pdf", "error": None, "chapters": 2, "cache_hits": 1, "cache_hit_ratio": 0.5}
+
+    # Run the workers inline: the pool itself is exercised by the CLI
+    from concurrent.futures import ThreadPoolExecutor
+    mocker.patch("src.engine.batch_builder.ProcessPoolExecutor", ThreadPoolExecutor)
+    mocker.patch("src.engine.batch_builder.build_project_worker", fake_worker)
+
+    report = BatchBuilder(temp_project_dir, workers=2).run()
+
+    assert report["ok"] == 1 and report["failed"] == 1
+    by_name = {r["name"]: r for r in report["projects"]}
+    assert by_name["Good"]["cache_hit_ratio"] == 0.5
+    assert by_name["Bad"]["status"] == "error" and by_name["Bad"]["error"]
+    saved = json.loads((temp_project_dir / "build_report.json").read_text(encoding="utf-8"))
+    assert [r["name"] for r in saved["projects"]] == ["Bad", "Good"]
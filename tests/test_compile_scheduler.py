@@ -0,0 +1,108 @@
+import threading
+import pytest
+from pathlib import Path
+from src.engine.compile_scheduler import CompileJob, CompileScheduler
+
+def _blocking_run(started: threading.Event, release: threading.Event):
+    def run(job):
+        started.set()
+        release.wait(5)
+        job.check_cancelled()
+        return Path("out.pdf")
+    return run
+
+def test_scheduler_runs_single_job(tmp_path):
+    """A lone request runs and reports success."""
+    scheduler = CompileScheduler()
+    states, results = [], []
+    job = scheduler.submit(tmp_path, lambda job: Path("out.pdf"), results.append, results.append,
+                           on_state=lambda j: states.append(j.state))
+
+    assert job.wait(5)
+    assert states == [CompileJob.QUEUED, CompileJob.RUNNING, CompileJob.DONE]
+    assert results == [Path("out.pdf")]
+    assert scheduler.get_running(tmp_path) is None
+
+def test_scheduler_wait_returns_after_callbacks(tmp_path):
+    """wait() only returns once on_success has run, however slow it is."""
+    import time
+    results = []
+    job = CompileScheduler().submit(tmp_path, lambda job: Path("out.pdf"),
+                                    lambda result: (time.sleep(0.05), results.append(result)), results.append)
+    assert job.wait(5)
+    assert results == [Path("out.pdf")]
+
+def test_scheduler_supersedes_running_build(tmp_path):
+    """A new request cancels the running build, queued ones coalesce into the latest."""
+    scheduler = CompileScheduler()
+    started, release = threading.Event(), threading.Event()
+    successes, errors = [], []
+
+    first = scheduler.submit(tmp_path, _blocking_run(started, release), successes.append, errors.append)
+    assert started.wait(5)
+
+    ran = []
+    second = scheduler.submit(tmp_path, lambda job: ran.append("second"), successes.append, errors.append)
+    third = scheduler.submit(tmp_path, lambda job: ran.append("third") or Path("latest.pdf"), successes.append, errors.append)
+    assert first.is_cancelled() and second.state == CompileJob.CANCELLED
+
+    release.set()
+    assert first.wait(5) and second.wait(5) and third.wait(5)
+    assert first.state == CompileJob.CANCELLED
+    assert second.state == CompileJob.CANCELLED
+    assert third.state == CompileJob.DONE
+    # Only the latest request was built, and cancelled builds report nothing
+    assert ran == ["third"]
+    assert successes == [Path("latest.pdf")]
+    assert errors == []
+
+def test_scheduler_queues_without_cancelling(tmp_path):
+    """With cancel_running off, the running build finishes before the next starts."""
+    scheduler = CompileScheduler(cancel_running=False)
+    started, release = threading.Event(), threading.Event()
+    order = []
+
+    first = scheduler.submit(tmp_path, _blocking_run(started, release), order.append, order.append)
+    assert started.wait(5)
+    second = scheduler.submit(tmp_path, lambda job: Path("second.pdf"), order.append, order.append)
+    assert second.state == CompileJob.QUEUED
+
+    release.set()
+    assert second.wait(5)
+    assert first.state == CompileJob.DONE
+    assert order == [Path("out.pdf"), Path("second.pdf")]
+
+def test_scheduler_reports_errors(tmp_path):
+    """Failures of a build that was not cancelled reach on_error."""
+    scheduler = CompileScheduler()
+    errors = []
+
+    def run(job):
+        raise RuntimeError("boom")
+
+    job = scheduler.submit(tmp_path, run, lambda p: None, errors.append)
+    assert job.wait(5)
+    assert job.state == CompileJob.DONE
+    assert str(errors[0]) == "boom"
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning") # The SystemExit ends the thread
+def test_scheduler_survives_base_exceptions(tmp_path):
+    """A build dying with a BaseException still releases its waiters and starts the queued one."""
+    scheduler = CompileScheduler(cancel_running=False)
+    started, release = threading.Event(), threading.Event()
+
+    def run(job):
+        started.set()
+        release.wait(5)
+        raise SystemExit()
+
+    first = scheduler.submit(tmp_path, run, lambda p: None, lambda e: None)
+    assert started.wait(5)
+    second = scheduler.submit(tmp_path, lambda job: Path("second.pdf"), lambda p: None, lambda e: None)
+    release.set()
+    assert first.wait(5) and first.state == CompileJob.CANCELLED
+    assert second.wait(5) and second.result == Path("second.pdf")
+    assert scheduler.get_running(tmp_path) is None
+    for thread in threading.enumerate():
+        if thread.name.endswith("(_run)"):
+            thread.join(5)
@@ -1,60 +1,67 @@
-
+import sys
 import pytest
 from pathlib import Path
-from src.engine.compiler import CompilerEngine, CompilationError
 from src.utils.paths import get_pandoc_exe, get_typst_exe
 
 @pytest.fixture
-def integration_compiler(project_manager):
-    """Creates a CompilerEngine instance for integration testing."""
-    pm = project_manager
-    pm.create_project("Integration Test", "Me")
-    return CompilerEngine(pm.current_project_path, pm.manifest)
+def integration_pm(project_manager):
+    """A ProjectManager with a fresh project loaded, building in-process."""
+    project_manager.create_project("Integration Test", "Me")
+    project_manager.use_daemon = False
+    return project_manager
+
+@pytest.fixture
+def fake_tools(tmp_path):
+    """Points the toolchain at the benchmark's fake pandoc and typst."""
+    from benchmarks.fake_tools import install_fake_tools
+    from src.engine.toolchain import ToolchainRegistry, use_toolchain
+    if sys.platform == "win32":
+        pytest.skip("The fake tools are POSIX shebang scripts")
+    install_fake_tools(tmp_path / "bin", pandoc_latency=0, typst_latency=0)
+    previous = use_toolchain(ToolchainRegistry(tmp_path / "toolchain.json", [tmp_path / "bin"]))
+    yield
+    use_toolchain(previous)
 
 @pytest.mark.skipif(not get_pandoc_exe().exists(), reason="Pandoc not found")
 @pytest.mark.skipif(not get_typst_exe().exists(), reason="Typst not found")
-def test_compile_real_pdf(integration_compiler):
-    """Test the full compile flow with REAL Pandoc/Typst to PDF."""
-    
-    # 1. Create content
-    c1 = integration_compiler.manifest.chapters[0]
-    (integration_compiler.chapters_dir / c1.filename).write_text("# Intro\nThis is a real test.", encoding="utf-8")
-    
-    # 2. Compile
-    integration_compiler.compile("pdf")
-    
-    # 3. Verify Output
-    assert integration_compiler.output_pdf.exists()
-    assert integration_compiler.output_pdf.stat().st_size > 0
-
-def test_resolve_includes(integration_compiler):
+def test_compile_real_pdf(integration_pm):
+    """Test the full build with REAL Pandoc/Typst to PDF."""
+    c1 = integration_pm.manifest.chapters[0]
+    (integration_pm.current_project_path / "chapters" / c1.filename).write_text("# Intro\nThis is a real test.", encoding="utf-8")
+
+    pdf_path = integration_pm.build_project()
+    assert pdf_path.exists()
+    assert pdf_path.stat().st_size > 0
+
+def test_resolve_includes(integration_pm):
     """Test recursive include resolution."""
-    base_path = integration_compiler.chapters_dir
-    (base_path / "main.md").write_text("See {{ include: sub.md }}", encoding="utf-8")
-    (base_path / "sub.md").write_text("details", encoding="utf-8")
-    result = integration_compiler._resolve_includes("See {{ include: sub.md }}", base_path)
+    chapters_dir = integration_pm.current_project_path / "chapters"
+    (chapters_dir / "main.md").write_text("See {{ include: sub.md }}", encoding="utf-8")
+    (chapters_dir / "sub.md").write_text("details", encoding="utf-8")
+    result = integration_pm._resolve_includes(chapters_dir / "main.md")
     assert "See details" in result
 
-def test_concatenate_chapters(integration_compiler):
-    """Test concatenating multiple chapters."""
-    c1 = integration_compiler.manifest.chapters[0]
-    (integration_compiler.chapters_dir / c1.filename).write_text("Content 1", encoding="utf-8")
-    # Add another chapter manually
-    from src.engine.models import Chapter
-    c2 = Chapter(id="c2", title="C2", filename="c2.md")
-    integration_compiler.manifest.chapters.append(c2)
-    (integration_compiler.chapters_dir / "c2.md").write_text("Content 2", encoding="utf-8")
-    
-    full_text = integration_compiler._concatenate_chapters()
-    assert "Content 1" in full_text
-    assert "Content 2" in full_text
-
-def test_compile_missing_assets(integration_compiler):
-    """Test compilation when a referenced asset is missing."""
-    # This checks logical robustness (warning log), real pandoc might just ignore or warn.
-    base = integration_compiler.chapters_dir
-    (base / "main.md").write_text("See ![img](missing.png)", encoding="utf-8")
-    
-    # We expect no crash
-    integration_compiler.compile("pdf")
-    assert integration_compiler.output_pdf.exists()
+def test_resolve_chapter_markdown(integration_pm):
+    """A chapter's markdown is its file followed by its paragraphs, in order."""
+    pm = integration_pm
+    chapter = pm.manifest.chapters[0]
+    pm.save_file_content(pm.current_project_path / "chapters" / chapter.filename, "Content 1")
+    for title in ("Primo", "Secondo"):
+        paragraph = pm.create_paragraph(chapter, title)
+        path = pm.current_project_path / "chapters" / chapter.id / paragraph.filename
+        pm.save_file_content(path, f"## {title}\n\nText {title}")
+
+    full_text = pm._resolve_chapter_markdown(chapter)
+    assert full_text.startswith("Content 1")
+    assert full_text.index("Text Primo") < full_text.index("Text Secondo")
+
+def test_compile_missing_assets(integration_pm, fake_tools):
+    """A reference to a missing image doesn't stop the build."""
+    pm = integration_pm
+    chapter = pm.manifest.chapters[0]
+    pm.save_file_content(pm.current_project_path / "chapters" / chapter.filename, "See ![img](missing.png)")
+
+    pdf_path = pm.build_project()
+    assert pdf_path.exists()
+    compiled = (pm.current_project_path / ".thesis_data" / "temp" / f"{chapter.id}.typ").read_text(encoding="utf-8")
+    assert "missing.png" in compiled
@@ -0,0 +1,74 @@
+import pytest
+from pathlib import Path
+from src.engine.md_to_typst import FastTypstConverter, UnsupportedMarkdown
+
+# Golden files: <name>.md and the <name>.typ pandoc 3.5 writes for it with
+#   pandoc --from markdown+tex_math_dollars --to typst --citeproc
+GOLDEN_DIR = Path(__file__).parent / "golden" / "md_to_typst"
+GOLDEN_CASES = sorted(p.stem for p in GOLDEN_DIR.glob("*.md"))
+
+@pytest.fixture(scope="module")
+def converter():
+    """Options of pandoc 3.5, which generated the golden files."""
+    abbreviations = (GOLDEN_DIR / "abbreviations").read_text(encoding="utf-8").split()
+    return FastTypstConverter(abbreviations, smart_apostrophe=True, smart_dashes=True, math_comma=",")
+
+@pytest.mark.parametrize("name", GOLDEN_CASES)
+def test_fast_path_matches_golden(converter, name):
+    """The fast path writes exactly what pandoc wrote for the golden documents."""
+    markdown = (GOLDEN_DIR / f"{name}.md").read_text(encoding="utf-8")
+    expected = (GOLDEN_DIR / f"{name}.typ").read_text(encoding="utf-8")
+    assert converter.convert(markdown) == expected
+
+@pytest.mark.parametrize("markdown", [
+    "| a | b |\n|---|---|\n| 1 | 2 |",       # table
+    "```python\nprint(1)\n```",              # code block
+    "```{=typst}\n#pagebreak()\n```",        # raw block
+    "Testo[^1].\n\n[^1]: Nota.",             # footnote
+    "> citazione",                           # block quote
+    "<div>html</div>",                       # HTML
+    "Titolo\n======",                        # setext heading
+    "- uno\n  - annidato",                   # nested list
+    "3. parte da tre",                       # ordered list not starting at 1
+    "Vedi [@doe2020, p. 3].",                # citation locator
+    "Un'apostrofo iniziale 'citato'.",       # quotes
+    "$\\mathbb{R}$",                         # unknown TeX command
+    "riga con a capo forzato  \nseguito",    # hard line break
+])
+def test_fast_path_declines_unsupported(converter, markdown):
+    """Constructs outside the subset are left to pandoc."""
+    with pytest.raises(UnsupportedMarkdown):
+        converter.convert(markdown)
+
+def test_calibration_rejects_mismatch():
+    """A pandoc whose output the fast path can't reproduce disables it."""
+    from src.engine.md_to_typst import _CALIBRATION_PROBE
+    probe_output = FastTypstConverter(["e.g."]).convert(_CALIBRATION_PROBE)
+    options_output = "l’esempio – pagina, $a , b$\n\n"
+
+    assert FastTypstConverter.calibrate(lambda md: options_output + probe_output, ["e.g."]) is not None
+    assert FastTypstConverter.calibrate(lambda md: options_output + probe_output.replace("#emph", "#strong"), ["e.g."]) is None
+
+def _live_pandoc():
+    from src.engine.pandoc_wrapper import PandocWrapper
+    try:
+        pandoc = PandocWrapper()
+    except FileNotFoundError:
+        return None
+    return pandoc if pandoc.supports_server() else None
+
+@pytest.mark.skipif(_live_pandoc() is None, reason="needs pandoc 3 (Typst writer)")
+@pytest.mark.parametrize("name", GOLDEN_CASES)
+def test_fast_path_matches_installed_pandoc(name):
+    """Calibrated against the installed pandoc, supported documents convert identically."""
+    pandoc = _live_pandoc()
+    converter = pandoc.get_fast_converter()
+    if converter is None:
+        pytest.skip(f"fast path disabled for {pandoc.get_version()}")
+
+    markdown = (GOLDEN_DIR / f"{name}.md").read_text(encoding="utf-8")
+    try:
+        fast = converter.convert(markdown)
+    except UnsupportedMarkdown:
+        pytest.skip("not supported with this pandoc's options")
+    assert fast == pandoc.convert_text(markdown)
@@ -0,0 +1,37 @@
+from src.utils.md_tokenizer import tokenize_line, tokenize_lines, code_state_before
+
+def test_heading_and_inline_spans():
+    """Headings, bold, italic and links get their tag plus md_marker on the markup."""
+    spans = tokenize_line("## Titolo **forte** e _corsivo_ [link](http://x)")
+    assert ("h2", 0, 48) in spans
+    assert ("md_marker", 0, 3) in spans
+    assert ("bold", 12, 17) in spans and ("md_marker", 10, 12) in spans and ("md_marker", 17, 19) in spans
+    assert ("italic", 23, 30) in spans
+    assert ("link", 33, 37) in spans and ("md_marker", 37, 48) in spans
+
+def test_nested_inline_spans():
+    """Bold and link text is scanned again for nested constructs."""
+    spans = tokenize_line("**a _b_ c**")
+    assert ("bold", 2, 9) in spans
+    assert ("italic", 5, 6) in spans
+
+def test_plain_and_deep_headings():
+    """Plain text yields nothing; only levels 1-3 are headings."""
+    assert tokenize_line("testo semplice") == []
+    assert tokenize_line("#### Quattro") == []
+    assert tokenize_line("#senza spazio") == []
+
+def test_code_blocks_span_lines():
+    """Fenced code gets only the code tag and its state carries across calls."""
+    ranges, in_code = tokenize_lines(["**a**", "```python", "**no**", "# no"], first_line=10)
+    assert ranges["bold"] == [(10, 2, 3)]
+    assert ranges["code"] == [(11, 0, 9), (12, 0, 6), (13, 0, 4)]
+    assert in_code is True
+
+    ranges, in_code = tokenize_lines(["**no**", "```", "_si_"], first_line=14, in_code=in_code)
+    assert ranges["code"] == [(14, 0, 6), (15, 0, 3)]
+    assert ranges["italic"] == [(16, 1, 3)]
+    assert in_code is False
+
+    assert code_state_before("testo\n```\ncodice\n") is True
+    assert code_state_before("```\n```\n") is False
@@ -0,0 +1,25 @@
+from src.engine.output_writer import OutputWriter
+
+def test_writes_only_changed_files(tmp_path):
+    """Identical content leaves the file (and its mtime) alone; changes replace it."""
+    import os
+    path = tmp_path / "chapter.typ"
+    writer = OutputWriter()
+    assert writer.write(path, "= Uno\n")
+    os.utime(path, ns=(1, 1))
+
+    assert not writer.write(path, "= Uno\n")
+    assert path.stat().st_mtime_ns == 1
+    assert writer.write(path, "= Due\n")
+    assert path.read_text(encoding="utf-8") == "= Due\n"
+    assert (writer.rewritten, writer.unchanged, writer.bytes_written) == (2, 1, 12)
+
+    # Output written by another tool is compared the same way
+    staged = writer.staging_path(path)
+    staged.write_text("= Due\n", encoding="utf-8")
+    assert not writer.commit(staged, path)
+    assert not staged.exists()
+    staged.write_text("= Tre\n", encoding="utf-8")
+    assert writer.commit(staged, path)
+    assert path.read_text(encoding="utf-8") == "= Tre\n"
+    assert list(tmp_path.iterdir()) == [path]
@@ -0,0 +1,98 @@
+import sys
+import pytest
+from src.engine.page_preview import PagePreviewCache
+from src.engine.toolchain import ToolchainRegistry, use_toolchain
+
+# Writes one PNG per word of the input file, filled with the colour it names; logs the --pages it got
+FAKE_TYPST = '''#!{python}
+import sys
+from PIL import Image
+args = sys.argv[1:]
+if "--help" in args:
+    print("--pages <PAGES>  Which pages to export")
+    sys.exit(0)
+src, template = args[1], args[2]
+lines = open(src).read().split()
+if "BROKEN" in lines:
+    print("error: unexpected token", file=sys.stderr)
+    sys.exit(1)
+wanted = set(range(1, len(lines) + 1))
+if "--pages" in args:
+    spec = args[args.index("--pages") + 1]
+    open(sys.argv[0] + ".log", "a").write(spec + "\\n")
+    wanted = set()
+    for part in spec.split(","):
+        start, dash, end = part.partition("-")
+        wanted.update(range(int(start), int(end or len(lines)) + 1) if dash else [int(start)])
+for n, colour in enumerate(lines, 1):
+    if n in wanted:
+        Image.new("RGB", (60, 80), colour).save(template.replace("{{p}}", str(n)))
+'''
+
+@pytest.fixture
+def project(tmp_path, mocker):
+    exe = tmp_path / "typst"
+    exe.write_text(FAKE_TYPST.format(python=sys.executable), encoding="utf-8")
+    exe.chmod(0o755)
+    mocker.patch("src.engine.page_preview.get_typst_exe", return_value=exe)
+    previous = use_toolchain(ToolchainRegistry(tmp_path / "toolchain.json"))
+    project = tmp_path / "Tesi"
+    project.mkdir()
+    yield project
+    use_toolchain(previous)
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Uses a POSIX shebang script as fake typst")
+def test_render_reports_changed_pages(project):
+    """Pages are stored by content hash; a new render only flags the pages that changed."""
+    master = project / "master.typ"
+    master.write_text("white red white", encoding="utf-8")
+    cache = PagePreviewCache(project)
+
+    pages, changed = cache.render()
+    assert changed == [0, 1, 2]
+    assert pages[0].digest == pages[2].digest and (pages[0].width, pages[0].height) == (60, 80)
+    assert len(list(cache.pages_dir.glob("*.png"))) == 2
+
+    master.write_text("white blue white green", encoding="utf-8")
+    pages, changed = cache.render()
+    assert changed == [1, 3]
+    assert cache.load_index() == pages
+    # The red page is gone from the cache
+    assert sorted(p.stem for p in cache.pages_dir.glob("*.png")) == sorted({p.digest for p in pages})
+
+    master.write_text("BROKEN", encoding="utf-8")
+    from src.engine.compiler import CompilationError
+    with pytest.raises(CompilationError) as exc:
+        cache.render()
+    assert "unexpected token" in exc.value.details
+    assert cache.load_index() == pages
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Uses a POSIX shebang script as fake typst")
+def test_pages_on_screen_are_rendered_first(project):
+    """With `first`, typst renders those pages, then the others; on_first sees the old render patched."""
+    master = project / "master.typ"
+    master.write_text("white white white white white", encoding="utf-8")
+    cache = PagePreviewCache(project)
+    old, _ = cache.render()
+
+    master.write_text("white red blue white white black", encoding="utf-8")
+    seen = []
+    pages, changed = cache.render(first=range(1, 3), on_first=lambda pages, changed: seen.append((pages, changed)))
+    assert (project.parent / "typst.log").read_text().split() == ["2-3", "1-1,4-"]
+
+    (partial, partial_changed), = seen
+    assert partial_changed == [1, 2]
+    assert [p.digest for p in partial] == [old[0].digest, pages[1].digest, pages[2].digest, old[3].digest, old[4].digest]
+    assert len(pages) == 6 and changed == [1, 2, 5]
+    assert cache.load_index() == pages
+
+def test_preview_layout_and_visible_pages():
+    """Pages are scaled to the pane width and only those near the viewport are picked."""
+    from src.ui.pdf_preview import PdfPreviewPanel
+    layout = PdfPreviewPanel.compute_layout([(600, 800)] * 200, width=320, gap=10)
+    assert layout[0] == (10, 300, 400)
+    assert layout[1][0] == 420
+
+    assert list(PdfPreviewPanel.visible_range(layout, 0, 500)) == [0, 1]
+    assert list(PdfPreviewPanel.visible_range(layout, 415, 416)) == [] # In the gap
+    assert list(PdfPreviewPanel.visible_range(layout, 41001, 42000)) == [100, 101, 102]
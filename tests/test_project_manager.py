@@ -221,3 +221,275 @@ def test_paragraph_migration(project_manager):
     migrated_p = project_manager.manifest.chapters[0].paragraphs[0]
     assert migrated_p.title == "LooseSection"
     assert migrated_p.filename == "LooseSection.md"
+
+def _fake_pandoc(convert):
+    from unittest.mock import Mock
+    pandoc = Mock()
+    pandoc.get_version.return_value = "pandoc 3.1"
+    pandoc.get_conversion_flags.return_value = ["--to", "typst"]
+    pandoc.convert_markdown_to_typst.side_effect = convert
+    pandoc.select_batchable.side_effect = lambda docs: [False] * len(docs)
+    pandoc.try_fast_convert.return_value = None
+    return pandoc
+
+def test_parallel_conversion_keeps_order(project_manager):
+    """Includes follow manifest order regardless of completion order."""
+    import time
+    project_manager.create_project("ParallelTest", "Me")
+    for i in range(5):
+        project_manager.create_chapter(f"Chapter {i}")
+
+    def convert(md, path):
+        # The first chapter finishes last
+        if "Introduzione" in md: time.sleep(0.05)
+        path.write_text(md, encoding="utf-8")
+
+    temp_dir = project_manager.current_project_path / ".thesis_data" / "temp"
+    temp_dir.mkdir(parents=True)
+    progress = []
+    includes = project_manager._convert_chapters(_fake_pandoc(convert), temp_dir,
+                                                 on_progress=lambda msg, frac: progress.append(frac), jobs=4)
+
+    assert includes == [f'#include "{c.id}.typ"' for c in project_manager.manifest.chapters]
+    assert len(progress) == 6
+    assert progress == sorted(progress)
+
+def test_parallel_conversion_reports_failed_chapter(project_manager):
+    """A failing chapter is reported and stops the build."""
+    from src.engine.compiler import ChapterConversionError
+    project_manager.create_project("FailTest", "Me")
+    bad = project_manager.create_chapter("Broken")
+    project_manager.save_file_content(project_manager.current_project_path / "chapters" / bad.filename, "BROKEN")
+
+    def convert(md, path):
+        if "BROKEN" in md:
+            raise RuntimeError("Pandoc failed: boom")
+        path.write_text(md, encoding="utf-8")
+
+    temp_dir = project_manager.current_project_path / ".thesis_data" / "temp"
+    temp_dir.mkdir(parents=True)
+    with pytest.raises(ChapterConversionError) as exc:
+        project_manager._convert_chapters(_fake_pandoc(convert), temp_dir, jobs=2)
+    assert exc.value.chapter.id == bad.id
+    assert "boom" in exc.value.details
+
+def test_batched_conversion_single_process(project_manager):
+    """Batchable cache misses go through convert_batch instead of one process each."""
+    project_manager.create_project("BatchTest", "Me")
+    for i in range(3):
+        project_manager.create_chapter(f"Chapter {i}")
+
+    pandoc = _fake_pandoc(lambda md, path: path.write_text(md, encoding="utf-8"))
+    pandoc.select_batchable.side_effect = lambda docs: [True] * len(docs)
+    pandoc.convert_batch.side_effect = lambda docs: {doc_id: f"batched {doc_id}\n" for doc_id, _ in docs}
+
+    temp_dir = project_manager.current_project_path / ".thesis_data" / "temp"
+    temp_dir.mkdir(parents=True)
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1)
+
+    assert pandoc.convert_batch.call_count == 1
+    assert pandoc.convert_markdown_to_typst.call_count == 0
+    for c in project_manager.manifest.chapters:
+        assert (temp_dir / f"{c.id}.typ").read_text(encoding="utf-8") == f"batched {c.id}\n"
+
+    # Batch failure falls back to per-chapter conversion
+    pandoc.convert_batch.side_effect = RuntimeError("Pandoc failed")
+    for c in project_manager.manifest.chapters:
+        project_manager.save_file_content(project_manager.current_project_path / "chapters" / c.filename, f"changed {c.id}")
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1)
+    assert pandoc.convert_markdown_to_typst.call_count == 4
+
+def test_conversion_records_stage_metrics(project_manager):
+    """Chapter conversion times markdown resolution and each pandoc run."""
+    from src.engine.build_metrics import BuildMetrics
+    project_manager.create_project("MetricsTest", "Me")
+    project_manager.create_chapter("Chapter 1")
+
+    temp_dir = project_manager.current_project_path / ".thesis_data" / "temp"
+    temp_dir.mkdir(parents=True)
+    pandoc = _fake_pandoc(lambda md, path: path.write_text("= Out\n", encoding="utf-8"))
+    metrics = BuildMetrics()
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1, metrics=metrics)
+
+    count = len(project_manager.manifest.chapters)
+    stages = [m.stage for m in metrics.stages]
+    assert stages.count("resolve") == count
+    assert stages.count("pandoc") == count
+    assert all(m.bytes_written == 6 for m in metrics.stages if m.stage == "pandoc")
+
+    # Second run: everything comes from the cache
+    metrics = BuildMetrics()
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1, metrics=metrics)
+    assert [m.stage for m in metrics.stages].count("cache") == count
+
+def test_fast_path_skips_pandoc(project_manager):
+    """Chapters the in-process converter supports never reach pandoc."""
+    from src.engine.build_metrics import BuildMetrics
+    project_manager.create_project("FastTest", "Me")
+    hard = project_manager.create_chapter("Tables")
+    project_manager.save_file_content(project_manager.current_project_path / "chapters" / hard.filename, "| a |\n|---|")
+
+    temp_dir = project_manager.current_project_path / ".thesis_data" / "temp"
+    temp_dir.mkdir(parents=True)
+    pandoc = _fake_pandoc(lambda md, path: path.write_text("= Pandoc\n", encoding="utf-8"))
+    pandoc.try_fast_convert.side_effect = lambda md: None if "|" in md else "= Fast\n"
+    metrics = BuildMetrics()
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1, metrics=metrics)
+
+    assert pandoc.convert_markdown_to_typst.call_count == 1
+    for c in project_manager.manifest.chapters:
+        expected = "= Pandoc\n" if c.id == hard.id else "= Fast\n"
+        assert (temp_dir / f"{c.id}.typ").read_text(encoding="utf-8") == expected
+    assert [m.stage for m in metrics.stages].count("fast") == len(project_manager.manifest.chapters) - 1
+
+def test_draft_master_drops_front_page_and_bibliography():
+    """The draft master includes draft_body.typ and leaves out what the options exclude."""
+    from src.engine.draft_master import DraftOptions, make_draft_master
+    master = (Path(__file__).parent.parent / "templates" / "classic_thesis.typ").read_text(encoding="utf-8")
+    master += '\n#bibliography("references.bib")\n'
+
+    draft = make_draft_master(master, DraftOptions())
+    assert '#include ".thesis_data/temp/draft_body.typ"' in draft
+    assert "compiled_body.typ" not in draft
+    assert "#candidate" not in draft and "#outline" in draft
+    # Hidden, not removed: native Typst citations still need it
+    assert draft.startswith("#show bibliography: none\n") and "#bibliography" in draft
+
+    full = make_draft_master(master, DraftOptions(front_page=True, bibliography=True))
+    assert "#candidate" in full and "#show bibliography" not in full
+
+    with pytest.raises(ValueError):
+        make_draft_master("#include \"other.typ\"", DraftOptions())
+
+def test_draft_build_compiles_selected_chapter(project_manager, mocker):
+    """A draft build compiles only the chosen chapter into its own PDF, reusing the cache."""
+    from src.engine.compiler import AsyncCompiler
+    from src.engine.draft_master import DraftOptions
+    project_manager.create_project("DraftTest", "Me")
+    chapter = project_manager.create_chapter("Solo questo")
+    project_path = project_manager.current_project_path
+
+    pandoc = _fake_pandoc(lambda md, path: path.write_text("= X\n", encoding="utf-8"))
+    mocker.patch("src.engine.pandoc_wrapper.PandocWrapper", return_value=pandoc)
+    compiled = []
+    def fake_compile(self, project_path, written_at=None, input_file=None, output_file=None):
+        compiled.append((input_file, self.use_watch))
+        output_file.write_bytes(b"%PDF")
+        return output_file
+    mocker.patch.object(AsyncCompiler, "compile_sync", fake_compile)
+
+    temp_dir = project_path / ".thesis_data" / "temp"
+    temp_dir.mkdir(parents=True)
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1)
+    pandoc.convert_markdown_to_typst.reset_mock()
+
+    pdf = project_manager.build_project(chapter_ids=[chapter.id], use_watch=True, draft=DraftOptions())
+
+    assert pdf == project_path / "DraftTest.draft.pdf"
+    assert compiled == [(project_path / ".draft_master.typ", False)]
+    assert pandoc.convert_markdown_to_typst.call_count == 0 # Served from the cache
+    assert (temp_dir / "draft_body.typ").read_text(encoding="utf-8") == f'#include "{chapter.id}.typ"'
+    assert not (temp_dir / "compiled_body.typ").exists()
+    assert "draft_body.typ" in (project_path / ".draft_master.typ").read_text(encoding="utf-8")
+
+def test_citations_resolved_in_one_pass(project_manager):
+    """Citing chapters share one citeproc run; each chapter is cached on its own citation context."""
+    from src.engine.build_metrics import BuildMetrics
+    from src.engine.pandoc_wrapper import REFS_ID
+    project_manager.create_project("CiteTest", "Me")
+    project_path = project_manager.current_project_path
+    (project_path / "references.bib").write_text("@book{doe, title={T}}\n@book{roe, title={U}}", encoding="utf-8")
+    first = project_manager.manifest.chapters[0]
+    second = project_manager.create_chapter("Secondo")
+    project_manager.create_chapter("Senza citazioni")
+    for chapter, text in ((first, "Vedi [@doe]."), (second, "Ancora @doe.")):
+        project_manager.save_file_content(project_path / "chapters" / chapter.filename, text)
+
+    pandoc = _fake_pandoc(lambda md, path: path.write_text("= Plain\n", encoding="utf-8"))
+    pandoc.convert_cited.side_effect = lambda docs, bib, csl: {**{d: f"= Cited {d}\n" for d, _ in docs}, REFS_ID: "#block[Doe]\n"}
+    temp_dir = project_path / ".thesis_data" / "temp"
+    temp_dir.mkdir(parents=True)
+
+    # Building one chapter still numbers citations over the whole thesis: the others cite through stand-ins
+    includes = project_manager._convert_chapters(pandoc, temp_dir, jobs=1, chapter_ids=[second.id])
+    docs, bib, csl = pandoc.convert_cited.call_args.args
+    assert docs == [(f"{first.id}-citations", "[@{doe}]"), (second.id, "Ancora @doe.")]
+    assert bib == project_path / "references.bib" and csl.name == "ieee.csl"
+    assert includes == [f'#include "{second.id}.typ"', '#include "bibliography.typ"']
+    assert (temp_dir / f"{second.id}.typ").read_text(encoding="utf-8") == f"= Cited {second.id}\n"
+    assert not (temp_dir / f"{first.id}.typ").exists()
+
+    # Full build: only the chapter not converted yet goes through citeproc, the other is a cache hit
+    metrics = BuildMetrics()
+    includes = project_manager._convert_chapters(pandoc, temp_dir, jobs=1, with_bibliography=False, metrics=metrics)
+    assert pandoc.convert_cited.call_args.args[0] == [(first.id, "Vedi [@doe]."), (f"{second.id}-citations", "[@{doe}]")]
+    assert [m.name for m in metrics.stages if m.stage == "cache"] == [second.title]
+    assert pandoc.convert_markdown_to_typst.call_count == 1
+    assert includes == [f'#include "{c.id}.typ"' for c in project_manager.manifest.chapters]
+    assert (temp_dir / "bibliography.typ").read_text(encoding="utf-8").endswith("]\n\n#block[Doe]\n")
+
+    # Warm build: no citeproc run at all
+    metrics = BuildMetrics()
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1, metrics=metrics)
+    assert pandoc.convert_cited.call_count == 2
+    assert [m.stage for m in metrics.stages].count("cache") == 3
+
+    # Editing the prose of a chapter only reconverts that chapter...
+    project_manager.save_file_content(project_path / "chapters" / second.filename, "Ancora @doe, riletto.")
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1)
+    assert [d for d, _ in pandoc.convert_cited.call_args.args[0]] == [f"{first.id}-citations", second.id]
+    # ...while a new first citation renumbers the chapters after it
+    project_manager.save_file_content(project_path / "chapters" / first.filename, "Vedi [@roe; @doe].")
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1)
+    assert [d for d, _ in pandoc.convert_cited.call_args.args[0]] == [first.id, second.id]
+
+def test_typst_citation_mode_writes_bibliography(project_manager):
+    """In the "typst" mode the generated body ends with the #bibliography call, not the template."""
+    from src.engine.output_writer import OutputWriter
+    project_manager.create_project("TypstCite", "Me")
+    project_path = project_manager.current_project_path
+    temp_dir = project_path / ".thesis_data" / "temp"
+    temp_dir.mkdir(parents=True)
+    project_manager.update_settings({"supervisor": 'Prof. "Rossi"', "citation_mode": "typst"})
+    assert project_manager.manifest.citation_mode == "typst"
+    chapter = project_manager.manifest.chapters[0]
+    project_manager.save_file_content(project_path / "chapters" / chapter.filename, "Vedi @doe.")
+    pandoc = _fake_pandoc(lambda md, path: path.write_text("= Plain\n", encoding="utf-8"))
+
+    project_manager._write_metadata(temp_dir, OutputWriter())
+    metadata = (temp_dir / "metadata.typ").read_text(encoding="utf-8")
+    assert '#let supervisor = "Prof. \\"Rossi\\""' in metadata
+    assert "bibliography" not in metadata
+
+    # Nothing to cite yet
+    includes = project_manager._convert_chapters(pandoc, temp_dir, jobs=1)
+    assert includes == [f'#include "{chapter.id}.typ"']
+
+    (project_path / "references.bib").write_text("@book{doe, title={T}}", encoding="utf-8")
+    assert project_manager._citation_files() is None # No citeproc pass
+    includes = project_manager._convert_chapters(pandoc, temp_dir, jobs=1, with_bibliography=False)
+    assert includes == [f'#include "{chapter.id}.typ"', '#include "bibliography.typ"']
+    bibliography = (temp_dir / "bibliography.typ").read_text(encoding="utf-8")
+    assert bibliography.startswith('#bibliography("/references.bib", title: "Bibliografia"')
+    assert 'style: "/.thesis_data/temp/citation_style.csl"' in bibliography
+    assert (temp_dir / "citation_style.csl").read_text(encoding="utf-8").lstrip().startswith("<?xml")
+
+def test_noop_build_rewrites_nothing(project_manager):
+    """A second build with the same sources leaves every generated file untouched."""
+    from src.engine.output_writer import OutputWriter
+    project_manager.create_project("NoopTest", "Me")
+    project_manager.create_chapter("Secondo")
+    temp_dir = project_manager.current_project_path / ".thesis_data" / "temp"
+    temp_dir.mkdir(parents=True)
+    pandoc = _fake_pandoc(lambda md, path: path.write_text("= X\n", encoding="utf-8"))
+
+    first = OutputWriter()
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1, writer=first)
+    assert first.rewritten == 2
+    mtimes = {p.name: p.stat().st_mtime_ns for p in temp_dir.iterdir()}
+
+    # Even a full conversion that produces the same Typst
+    again = OutputWriter()
+    project_manager._convert_chapters(pandoc, temp_dir, jobs=1, use_cache=False, writer=again)
+    assert (again.rewritten, again.unchanged) == (0, 2)
+    assert {p.name: p.stat().st_mtime_ns for p in temp_dir.iterdir()} == mtimes
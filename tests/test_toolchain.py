@@ -0,0 +1,73 @@
+import sys
+import pytest
+from src.engine.toolchain import ToolchainRegistry
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Uses POSIX shebang scripts as fake tools")
+
+# Logs every invocation next to itself
+FAKE_PANDOC = '''#!{python}
+import sys
+open(sys.argv[0] + ".log", "a").write(" ".join(sys.argv[1:]) + "\\n")
+if sys.argv[1] == "--version":
+    print("pandoc 3.1.11\\nFeatures: +server\\nUser data directory: /data/pandoc")
+elif sys.argv[1] == "--list-output-formats":
+    print("html\\ntypst")
+'''
+
+def test_probes_are_persisted(tmp_path, mocker):
+    """Version and features are probed once, then read back until the binary changes."""
+    exe = tmp_path / "pandoc"
+    exe.write_text(FAKE_PANDOC.format(python=sys.executable), encoding="utf-8")
+    exe.chmod(0o755)
+    log = tmp_path / "pandoc.log"
+    mocker.patch("src.engine.toolchain.find_tool", side_effect=lambda name, search_dirs=(): exe if name == "pandoc" else tmp_path / name)
+    cache = tmp_path / "toolchain.json"
+
+    registry = ToolchainRegistry(cache)
+    info = registry.get("pandoc")
+    assert (info.version, info.features) == ("pandoc 3.1.11", {"server": True, "typst": True})
+    assert info.data_dir == "/data/pandoc"
+    assert registry.get("pandoc") is info
+    assert not registry.get("typst").exists
+    assert len(log.read_text().splitlines()) == 2
+
+    # A new process (registry) doesn't run pandoc again
+    again = ToolchainRegistry(cache)
+    assert again.resolve_async().join() is None
+    assert again.get("pandoc") == info
+    assert len(log.read_text().splitlines()) == 2
+
+    # An updated binary is probed again
+    exe.write_text(FAKE_PANDOC.format(python=sys.executable).replace("3.1.11", "3.6"), encoding="utf-8")
+    assert ToolchainRegistry(cache).get("pandoc").version == "pandoc 3.6"
+
+def test_bad_saved_probe_is_a_miss(tmp_path, mocker):
+    """An entry from another version of toolchain.json is probed again instead of crashing."""
+    import json
+    exe = tmp_path / "pandoc"
+    exe.write_text(FAKE_PANDOC.format(python=sys.executable), encoding="utf-8")
+    exe.chmod(0o755)
+    mocker.patch("src.engine.toolchain.find_tool", side_effect=lambda name, search_dirs=(): exe if name == "pandoc" else tmp_path / name)
+    cache = tmp_path / "toolchain.json"
+    stale = {"name": "pandoc", "path": str(exe), "mtime_ns": exe.stat().st_mtime_ns, "version": "pandoc 3.1.11", "legacy": 1}
+    cache.write_text(json.dumps({"pandoc": stale}), encoding="utf-8")
+
+    info = ToolchainRegistry(cache).get("pandoc")
+    assert info.features["server"] and info.data_dir == "/data/pandoc"
+    assert "legacy" not in json.loads(cache.read_text(encoding="utf-8"))["pandoc"]
+
+    cache.write_text("[]", encoding="utf-8")
+    assert ToolchainRegistry(cache).get("pandoc").version == "pandoc 3.1.11"
+
+def test_default_cache_is_per_user(tmp_path, monkeypatch, mocker):
+    """Without an explicit path, probes go to the user's cache dir, created on first save."""
+    exe = tmp_path / "pandoc"
+    exe.write_text(FAKE_PANDOC.format(python=sys.executable), encoding="utf-8")
+    exe.chmod(0o755)
+    mocker.patch("src.engine.toolchain.find_tool", return_value=exe)
+    monkeypatch.setattr(sys, "platform", "linux")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    registry = ToolchainRegistry()
+    assert registry.cache_path == tmp_path / "cache" / "thesisflow" / "toolchain.json"
+    registry.get("pandoc")
+    assert registry.cache_path.exists()
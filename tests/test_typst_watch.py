@@ -0,0 +1,88 @@
+import sys
+import time
+import pytest
+from src.engine.typst_watch import TypstWatchProcess
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Uses a POSIX shebang script as fake typst")
+
+FAKE_TYPST = '''#!{python}
+import os, sys, time
+src = sys.argv[2]
+def compile_once():
+    print("[00:00:00] compiling ...", flush=True)
+    text = open(src).read()
+    if "BROKEN" in text:
+        print("[00:00:00] compiled with errors", flush=True)
+        print("error: unexpected token", flush=True)
+    else:
+        open(sys.argv[3], "w").write(text)
+        print("[00:00:00] compiled successfully in 1.00ms", flush=True)
+    if "CRASH" in text:
+        sys.exit(1)
+print("watching " + src, flush=True)
+last = os.stat(src).st_mtime_ns
+compile_once()
+while True:
+    time.sleep(0.02)
+    m = os.stat(src).st_mtime_ns
+    if m != last:
+        last = m
+        compile_once()
+'''
+
+@pytest.fixture
+def watcher(tmp_path):
+    exe = tmp_path / "typst"
+    exe.write_text(FAKE_TYPST.format(python=sys.executable), encoding="utf-8")
+    exe.chmod(0o755)
+    master = tmp_path / "master.typ"
+    master.write_text("= Hello", encoding="utf-8")
+    w = TypstWatchProcess(exe, master, tmp_path / "out.pdf", tmp_path)
+    w.TRIGGER_TIMEOUT = 0.2
+    yield w
+    w.shutdown()
+
+def test_watch_compiles_after_write(watcher):
+    """Waiting returns the compilation that follows the last write."""
+    event = watcher.wait_for_compile(time.time() - 1, timeout=10)
+    assert event.ok
+
+    watcher.input_file.write_text("= Updated", encoding="utf-8")
+    event = watcher.wait_for_compile(time.time(), timeout=10)
+    assert event.ok
+    assert watcher.output_file.read_text() == "= Updated"
+
+def test_watch_reports_errors(watcher):
+    """Diagnostics printed after a failed status are attached to the event."""
+    watcher.input_file.write_text("BROKEN", encoding="utf-8")
+    event = watcher.wait_for_compile(time.time(), timeout=10)
+    assert not event.ok
+    assert any("unexpected token" in line for line in event.lines)
+
+def test_watch_restarts_after_crash(watcher):
+    """A dead watch process is restarted on the next wait."""
+    watcher.wait_for_compile(time.time() - 1, timeout=10)
+    watcher._process.kill()
+    watcher._process.wait()
+
+    event = watcher.wait_for_compile(time.time(), timeout=10)
+    assert event.ok
+    assert watcher.is_running()
+
+def test_watch_cancel(watcher):
+    """cancel() interrupts a pending wait."""
+    import threading
+    watcher.wait_for_compile(time.time() - 1, timeout=10)
+    watcher.TRIGGER_TIMEOUT = 60
+    threading.Timer(0.2, watcher.cancel).start()
+    with pytest.raises(InterruptedError):
+        watcher.wait_for_compile(time.time() + 30, timeout=10)
+
+def test_watch_settled_event(watcher):
+    """An idle watch process reports its last compilation as up to date."""
+    assert watcher.settled_event() is None # Not started
+    event = watcher.wait_for_compile(time.time() - 1, timeout=10)
+    assert watcher.settled_event() is event
+
+    watcher.shutdown()
+    assert watcher.settled_event() is None
@@ -46,3 +46,85 @@ def test_bibtex_empty_fields():
     data = CitationDialog.parse_bibtex(bibtex)
     assert data["fields"]["title"] == ""
     assert data["fields"]["year"] == ""
+
+def test_output_buffer_is_bounded():
+    """Pending console lines are capped; one drain is scheduled per batch."""
+    from src.ui.console import OutputBuffer
+    buffer = OutputBuffer(max_lines=3)
+    assert buffer.push("a") is True
+    assert all(buffer.push(line) is False for line in "bcde")
+    assert buffer.drain() == ["... 2 righe omesse ...", "c", "d", "e"]
+    assert buffer.push("f") is True
+    assert buffer.drain() == ["f"]
+
+def test_dirty_lines_follow_edits():
+    """The pending range shifts with later edits; backticks flag a block change."""
+    from src.ui.components.edit_tracker import DirtyLines
+    dirty = DirtyLines()
+    assert dirty.take() is None
+
+    dirty.inserted(10, "abc")
+    dirty.inserted(2, "x\ny\n")     # Two lines added above: line 10 is now 12
+    assert dirty.take() == (2, 12, False)
+
+    dirty.inserted(20, "z")
+    dirty.deleted(5, 8, "a\nb\nc\nd")  # Three lines removed above: line 20 is now 17
+    assert dirty.take() == (5, 17, False)
+
+    dirty.inserted(30, "q")
+    dirty.deleted(25, 40, "...")       # The edited line was deleted with the rest
+    assert dirty.take() == (25, 25, False)
+
+    dirty.inserted(3, "```")
+    assert dirty.take() == (3, 3, True)
+
+def test_dirty_lines_revision_counts_edits():
+    """Every edit bumps the revision, also once the range has been taken."""
+    from src.ui.components.edit_tracker import DirtyLines
+    dirty = DirtyLines()
+    dirty.inserted(1, "a")
+    dirty.deleted(1, 1, "a")
+    dirty.take()
+    assert dirty.revision == 2
+    dirty.mark_all(5)
+    assert dirty.revision == 3
+    assert dirty.take() == (1, 5, True)
+
+def test_highlight_analysis_and_batches():
+    """The worker tokenizes the requested lines with the right code block state; visible lines go first."""
+    from src.ui.components.highlight_worker import HighlightRequest, analyze, plan_batch
+    text = "# Titolo\n```\n**codice**\n```\n**forte** parole\n## Fine"
+    result = analyze(HighlightRequest(7, text, [(3, 3), (5, 6)], outline=True))
+    assert result.spans["code"] == [(3, 0, 10)]
+    assert result.spans["bold"] == [(5, 2, 7)]
+    assert result.spans["h2"] == [(6, 0, 7)]
+    assert result.headings == [(1, "Titolo", "1.0"), (2, "Fine", "6.0")]
+    assert result.words == 9
+
+    assert plan_batch([(1, 1000)], (400, 450), 100) == [(400, 450), (1, 49)]
+    assert plan_batch([(1, 10), (500, 600)], (550, 560), 30) == [(550, 560), (1, 10), (500, 508)]
+
+def test_highlight_worker_latest_wins():
+    """Requests queued while the worker is busy collapse into the latest one."""
+    import threading
+    from src.ui.components.highlight_worker import HighlightRequest, HighlightWorker
+    busy, release, done = threading.Event(), threading.Event(), threading.Event()
+    revisions = []
+
+    def on_result(result):
+        revisions.append(result.revision)
+        if result.revision == 1:
+            busy.set()
+            release.wait(5)
+        else:
+            done.set()
+
+    worker = HighlightWorker(on_result)
+    worker.submit(HighlightRequest(1, "a", [(1, 1)]))
+    assert busy.wait(5)
+    worker.submit(HighlightRequest(2, "b", [(1, 1)]))
+    worker.submit(HighlightRequest(3, "c", [(1, 1)]))
+    release.set()
+    assert done.wait(5)
+    worker.shutdown()
+    assert revisions == [1, 3]
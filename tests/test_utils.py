@@ -1,4 +1,5 @@
 
+import re
 import pytest
 from src.utils.paths import get_base_path, get_pandoc_exe, get_typst_exe
 from src.utils.logger import get_logger
@@ -18,3 +19,42 @@ def test_logger_singleton():
     l2 = get_logger()
     assert l1 is l2
     assert l1.name == "ThesisFlow"
+
+def test_split_blocks_keeps_markdown_units():
+    """Blocks split at blank lines, but fenced code and loose lists stay whole."""
+    from src.utils.html_renderer import split_blocks
+    md = "# Title\n\nText\nmore\n\n```\na\n\nb\n```\n\n- one\n\n- two\n\n    cont\n\nEnd"
+    assert split_blocks(md) == ["# Title", "Text\nmore", "```\na\n\nb\n```", "- one\n\n- two\n\n    cont", "End"]
+
+def test_html_renderer_block_cache(mocker):
+    """Only the edited block goes through markdown2 again; the styles are built once per mode."""
+    import markdown2
+    from collections import OrderedDict
+    from src.utils.html_renderer import HTMLRenderer
+    mocker.patch.object(HTMLRenderer, "_block_cache", OrderedDict())
+    mocker.patch.object(HTMLRenderer, "_styles", {})
+    convert = mocker.spy(markdown2, "markdown")
+    styles = mocker.spy(HTMLRenderer, "get_styles")
+
+    first = HTMLRenderer.render("---\ntitle: X\n---\n# Title\n\nOne\n\nTwo")
+    assert convert.call_count == 3 and "title: X" not in first
+    second = HTMLRenderer.render("# Title\n\nOne edited\n\nTwo")
+    assert convert.call_count == 4
+    assert "<p>One edited</p>" in second and "<p>Two</p>" in second
+    assert styles.call_count == 1
+
+    # Reference definitions span blocks: the whole document is rendered
+    html = HTMLRenderer.render("See [the docs][d].\n\n[d]: https://example.com")
+    assert convert.call_count == 5
+    assert 'href="https://example.com"' in html
+
+def test_html_renderer_header_ids_are_unique():
+    """Headings repeated in different blocks get the ids a whole-document render would give."""
+    import markdown2
+    from src.utils.html_renderer import HTMLRenderer
+    md = "# Intro\n\nText\n\n# Intro\n\n## Intro\n\n# Intro 2"
+    html = HTMLRenderer.render(md)
+    ids = re.findall(r'<h\d id="([^"]*)"', html)
+    assert ids == ["intro", "intro-2", "intro-3", "intro-2-2"]
+    assert len(set(ids)) == len(ids)
+    assert ids[:3] == re.findall(r'<h\d id="([^"]*)"', markdown2.markdown(md, extras=HTMLRenderer.EXTRAS))[:3]
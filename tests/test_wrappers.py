@@ -1,3 +1,4 @@
+import sys
 
 import pytest
 from pathlib import Path
@@ -35,7 +36,7 @@ def test_pandoc_wrapper_init_error(mocker):
 def test_pandoc_conversion_command(mock_pandoc_exe, mocker):
     """Test that correct command is built and executed."""
     wrapper = PandocWrapper()
-    mock_run = mocker.patch("subprocess.run")
+    mock_run = mocker.patch("src.engine.pandoc_wrapper.run_child")
     mock_run.return_value.returncode = 0
     
     wrapper.convert_markdown_to_typst("MD Content", Path("out.typ"))
@@ -62,3 +63,207 @@ def test_typst_wrapper_compile(mock_typst_exe, mocker):
     assert "compile" in cmd
     assert "in.typ" in str(cmd)
     assert "out.pdf" in str(cmd)
+
+def test_pandoc_batch_split(mock_pandoc_exe, mocker):
+    """Batched output is split back per document on the raw Typst markers."""
+    wrapper = PandocWrapper()
+    mock_run = mocker.patch("src.engine.pandoc_wrapper.run_child")
+    mock_run.return_value.returncode = 0
+
+    def fake_pandoc(cmd, input, **kwargs):
+        # Raw typst blocks come out verbatim (pandoc doesn't separate them
+        # from the next block), the rest is "converted"
+        blocks = input.strip().split("\n\n")
+        out = [b.split("\n")[1] + "\n" if b.startswith("```{=typst}") else b.upper() + "\n\n" for b in blocks]
+        return Mock(returncode=0, stdout="".join(out).rstrip("\n") + "\n")
+    mock_run.side_effect = fake_pandoc
+
+    result = wrapper.convert_batch([("c1", "# One\n\nText."), ("c2", "# Two")])
+
+    assert result == {"c1": "# ONE\n\nTEXT.\n", "c2": "# TWO\n"}
+    sent = mock_run.call_args.kwargs["input"]
+    assert "```{=typst}\n// thesisflow-doc: " in sent
+    assert "--output" not in mock_run.call_args.args[0]
+
+def test_pandoc_batch_split_mismatch():
+    """Swallowed markers (e.g. an unclosed code fence) reject the batch."""
+    output = "// thesisflow-doc: n1 c1\n```\nunclosed\n\n```{=typst}\n// thesisflow-doc: n1 c2\n```\n"
+    assert PandocWrapper.split_batch_output(output, ["c1", "c2"], "n1") is None
+
+    # Empty documents get the single newline the CLI would write
+    output = "// thesisflow-doc: n1 c1\n= One\n\n// thesisflow-doc: n1 c2\n"
+    assert PandocWrapper.split_batch_output(output, ["c1", "c2"], "n1") == {"c1": "= One\n", "c2": "\n"}
+
+def test_pandoc_select_batchable(mock_pandoc_exe):
+    """Documents whose output would change when concatenated are excluded."""
+    wrapper = PandocWrapper()
+    flags = wrapper.select_batchable([
+        ("a", "# Intro\n\nPlain text."),
+        ("b", "# Intro\n\nSame heading id as a."),
+        ("c", "# Notes\n\nText[^1].\n\n[^1]: A footnote."),
+        ("d", "# Cites\n\nAs shown by @smith2020."),
+        ("e", "# Other\n\nMail me at a@b.com."),
+    ])
+    assert flags == [True, False, False, False, True]
+
+def _pandoc_probe(mocker, version, server):
+    from src.engine.toolchain import ToolInfo
+    toolchain = mocker.patch("src.engine.toolchain.get_toolchain")
+    toolchain.return_value.probe.return_value = ToolInfo("pandoc", "/mock/pandoc", 1, version, {"server": server})
+
+def test_pandoc_server_requires_pandoc3(mock_pandoc_exe, mocker, monkeypatch):
+    """Pandoc 2.x has no server mode: the subprocess path is used."""
+    monkeypatch.setenv("THESISFLOW_PANDOC_SERVER", "1")
+    _pandoc_probe(mocker, "pandoc 2.19.2", server=False)
+    popen = mocker.patch("subprocess.Popen")
+    wrapper = PandocWrapper(use_server=True)
+    assert wrapper.server is None
+    popen.assert_not_called()
+
+def test_pandoc_server_is_opt_in(mock_pandoc_exe, mocker, monkeypatch):
+    """pandoc server listens on every interface, so it only starts when asked for."""
+    monkeypatch.delenv("THESISFLOW_PANDOC_SERVER", raising=False)
+    _pandoc_probe(mocker, "pandoc 3.1.11", server=True)
+    popen = mocker.patch("subprocess.Popen")
+    assert PandocWrapper(use_server=True).server is None
+    popen.assert_not_called()
+
+def test_pandoc_server_slow_start_is_retried(mocker):
+    """A server that doesn't answer in time is tried again; one that exits is not."""
+    from src.engine.pandoc_server import PandocServer
+    server = PandocServer(Path("/mock/pandoc"))
+    popen = mocker.patch("subprocess.Popen")
+    mocker.patch.object(server, "_wait_ready", return_value=False)
+    popen.return_value.poll.return_value = None # Still starting
+    assert not server.start()
+    assert not server.start()
+    assert popen.call_count == 2
+
+    popen.return_value.poll.return_value = 2 # "server" taken as an input file
+    assert not server.start()
+    assert not server.start()
+    assert popen.call_count == 3
+
+def test_pandoc_wrapper_uses_server(mock_pandoc_exe, mocker, monkeypatch, tmp_path):
+    """With a running server, conversions don't spawn pandoc."""
+    from src.engine.pandoc_server import PandocServer
+    monkeypatch.setenv("THESISFLOW_PANDOC_SERVER", "1")
+    _pandoc_probe(mocker, "pandoc 3.1.11", server=True)
+    mocker.patch.object(PandocServer, "start", return_value=True)
+    convert = mocker.patch.object(PandocServer, "convert", return_value="= Hi\n")
+    mock_run = mocker.patch("src.engine.pandoc_wrapper.run_child")
+
+    wrapper = PandocWrapper(use_server=True)
+    out = tmp_path / "out.typ"
+    wrapper.convert_markdown_to_typst("# Hi", out)
+
+    assert out.read_text(encoding="utf-8") == "= Hi\n"
+    options = convert.call_args.args[1]
+    assert options["from"] == "markdown+tex_math_dollars" and options["to"] == "typst"
+    mock_run.assert_not_called()
+
+    # Server gone: falls back to a one-off process
+    convert.side_effect = ConnectionError("down")
+    mock_run.return_value.returncode = 0
+    wrapper.convert_markdown_to_typst("# Hi", out)
+    mock_run.assert_called_once()
+
+def test_pandoc_fast_path_needs_default_flags(mock_pandoc_exe, mocker):
+    """Extra pandoc flags (e.g. a bibliography) disable the in-process fast path."""
+    mocker.patch.object(PandocWrapper, "get_version", return_value="pandoc 3.5")
+    mocker.patch.object(PandocWrapper, "get_conversion_flags",
+                        return_value=["--from", "markdown+tex_math_dollars", "--to", "typst", "--bibliography", "refs.bib"])
+    mock_run = mocker.patch("src.engine.pandoc_wrapper.run_child")
+
+    wrapper = PandocWrapper(use_fast_path=True)
+    assert wrapper.try_fast_convert("Plain text.") is None
+    mock_run.assert_not_called()
+    assert PandocWrapper(use_fast_path=False).try_fast_convert("Plain text.") is None
+
+def test_pandoc_without_citeproc(mock_pandoc_exe):
+    """Without citeproc (native Typst citations) citing documents can share a pandoc process."""
+    documents = [("a", "Vedi [@doe]."), ("b", "Ancora @doe.")]
+    assert "--citeproc" in PandocWrapper().get_conversion_flags()
+    assert PandocWrapper().select_batchable(documents) == [False, False]
+
+    wrapper = PandocWrapper(citeproc=False)
+    assert "--citeproc" not in wrapper.get_conversion_flags()
+    assert wrapper.get_server_options()["citeproc"] is False
+    assert wrapper.select_batchable(documents) == [True, True]
+
+def test_citation_keys_in_order():
+    """Citation keys come out in order with repeats; e-mails and trailing punctuation are left out."""
+    from src.engine.pandoc_wrapper import citation_keys
+    text = "Vedi [@doe, p. 3; @roe2020]. Scrivi a x@y.com, poi @doe: e @{due parole}."
+    assert citation_keys(text) == ["doe", "roe2020", "doe", "due parole"]
+
+def test_pandoc_convert_cited_single_pass(mock_pandoc_exe, mocker):
+    """All documents go through one citeproc run with the bibliography, then are split back."""
+    from src.engine.pandoc_wrapper import REFS_ID
+    wrapper = PandocWrapper()
+    mock_run = mocker.patch("src.engine.pandoc_wrapper.run_child")
+
+    def fake_pandoc(cmd, input, **kwargs):
+        blocks = input.strip().split("\n\n")
+        out = [b.split("\n")[1] + "\n" if b.startswith("```{=typst}") else b.upper() + "\n\n" for b in blocks]
+        return Mock(returncode=0, stdout="".join(out).rstrip("\n") + "\n")
+    mock_run.side_effect = fake_pandoc
+
+    result = wrapper.convert_cited([("c1", "Vedi [@a][^1].\n\n[^1]: Nota."), ("c2", "Poi @b[^1].")],
+                                   Path("refs.bib"), Path("ieee.csl"))
+
+    assert mock_run.call_count == 1
+    cmd = mock_run.call_args.args[0]
+    assert cmd[cmd.index("--to") + 1] == "typst-citations"
+    assert cmd[cmd.index("--bibliography") + 1] == "refs.bib" and cmd[cmd.index("--csl") + 1] == "ieee.csl"
+    assert set(result) == {"c1", "c2", REFS_ID}
+    assert "[^c1-1]" in mock_run.call_args.kwargs["input"] and "[^c2-1]" in mock_run.call_args.kwargs["input"]
+    assert result[REFS_ID] == "::: {#REFS}\n:::\n"
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Uses a POSIX shebang script as fake typst")
+def test_typst_output_streamed(tmp_path, mocker):
+    """typst's diagnostics reach on_output while it is still running."""
+    from src.engine.compiler import AsyncCompiler, CompilationError
+    release = tmp_path / "release"
+    exe = tmp_path / "typst"
+    exe.write_text(f'''#!{sys.executable}
+import os, sys, time
+print("warning: unknown font family", file=sys.stderr, flush=True)
+while not os.path.exists({str(release)!r}):
+    time.sleep(0.01)
+print("error: unexpected token", file=sys.stderr, flush=True)
+sys.exit(1)
+''', encoding="utf-8")
+    exe.chmod(0o755)
+    mocker.patch("src.engine.compiler.get_typst_exe", return_value=exe)
+    (tmp_path / "master.typ").write_text("= Hi", encoding="utf-8")
+
+    lines = []
+    def on_output(line):
+        lines.append(line)
+        release.touch() # Only lets typst finish once the first line arrived
+    with pytest.raises(CompilationError) as exc:
+        AsyncCompiler(on_output=on_output).compile_sync(tmp_path)
+    assert lines == ["⚠️ warning: unknown font family", "❌ error: unexpected token"]
+    assert "❌ error: unexpected token" in exc.value.details
+
+def test_pandoc_warnings_forwarded(mock_pandoc_exe, mocker):
+    """Pandoc's messages go to on_output, from the CLI and from the server."""
+    from src.engine.pandoc_server import PandocServer
+    mock_run = mocker.patch("src.engine.pandoc_wrapper.run_child")
+    mock_run.return_value = Mock(returncode=0, stdout="x\n", stderr="[WARNING] Citeproc: citation doe not found\n")
+    wrapper = PandocWrapper()
+    lines = []
+    wrapper.on_output = lines.append
+    wrapper.convert_text("[@doe]")
+    assert lines == ["[WARNING] Citeproc: citation doe not found"]
+
+    response = Mock(**{"read.return_value": b'{"output": "x", "messages": [{"verbosity": "WARNING", "message": "Could not fetch resource"}]}'})
+    response.__enter__ = Mock(return_value=response)
+    response.__exit__ = Mock(return_value=False)
+    mocker.patch("src.engine.pandoc_server._opener.open", return_value=response)
+    server = PandocServer(Path("/mock/pandoc"))
+    mocker.patch.object(server, "start", return_value=True)
+    messages = []
+    assert server.convert("![](x.png)", {}, lambda verbosity, message: messages.append((verbosity, message))) == "x\n"
+    assert messages == [("WARNING", "Could not fetch resource")]